@@ -17,10 +17,13 @@ import pickle
 import time
 from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
-from functools import wraps
 from loguru import logger
 
 from strategies.base_strategy import BaseStrategy
+from backtest.prefetch import PrefetchPipeline
+from trader.risk_engine import RiskEngine
+from utils.xt_session import get_session
+from utils.memoize import get_memo_stats
 from backtest.performance import (
     calculate_returns,
     calculate_drawdown,
@@ -33,34 +36,6 @@ class BacktestError(Exception):
     """回测过程中的异常"""
     pass
 
-# 定义重试装饰器
-def retry_on_error(max_attempts: int = 3, delay: float = 1.0):
-    """函数执行失败时进行重试的装饰器
-    
-    Args:
-        max_attempts: 最大重试次数
-        delay: 重试间隔时间(秒)
-        
-    Returns:
-        装饰后的函数
-    """
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            attempts = 0
-            while attempts < max_attempts:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    if attempts == max_attempts:
-                        logger.error(f"函数 {func.__name__} 执行失败，已重试 {attempts} 次: {str(e)}")
-                        raise
-                    logger.warning(f"函数 {func.__name__} 执行失败，正在进行第 {attempts} 次重试: {str(e)}")
-                    time.sleep(delay)
-        return wrapper
-    return decorator
-
 class BacktestEngine:
     """回测引擎类"""
 
@@ -87,6 +62,17 @@ class BacktestEngine:
         self.equity = self.initial_capital
         self.last_checkpoint_date = None
         
+        # 事前风控：与实盘共用 trading.risk 限额；持仓数、单票和总仓位限额只在 trading.risk 中显式配置时生效
+        # （不改变既有回测结果）；委托即时成交，不限委托频率和挂单金额，不检查整手，不模拟T+1
+        risk_config = (config.get('trading') or {}).get('risk') or {}
+        position_limits = {name: risk_config.get(name)
+                           for name in ('max_positions', 'single_position_limit', 'max_gross_exposure')}
+        self.risk = RiskEngine.from_config(config, cash_buffer=1 + self.commission_rate + self.slippage,
+                                           max_orders_per_second=None, max_open_order_value=None,
+                                           lot_size=1, t_plus_one=False, **position_limits)
+        self.risk.sync(self.cash, self.equity, {})
+        self.trading_calendar = None
+        
         # 交易记录
         self.trades = []
         self.daily_returns = []
@@ -94,6 +80,7 @@ class BacktestEngine:
         # 性能优化
         self.data_cache = {}
         self.checkpoint_interval = self.backtest_config.get('checkpoint_interval', 20)  # 默认每20个交易日保存一次检查点
+        self.prefetch_depth = self.backtest_config.get('prefetch_depth', 2)  # 后台预取的交易日数，0表示同步获取
         
         # 创建缓存目录
         self.cache_dir = os.path.join(os.getcwd(), 'backtest', 'cache')
@@ -106,7 +93,8 @@ class BacktestEngine:
             'execution_time': 0,
             'data_fetch_time': 0,
             'signal_generation_time': 0,
-            'order_execution_time': 0
+            'order_execution_time': 0,
+            'risk_rejections': 0
         }
         
     def get_checkpoint_path(self, strategy_name: str) -> str:
@@ -187,6 +175,7 @@ class BacktestEngine:
             self.positions = checkpoint['positions']
             self.cash = checkpoint['cash']
             self.equity = checkpoint['equity']
+            self.risk.sync(self.cash, self.equity, self.positions)
             self.trades = checkpoint['trades']
             self.daily_returns = checkpoint['daily_returns']
             self.stats = checkpoint.get('stats', self.stats)
@@ -198,7 +187,6 @@ class BacktestEngine:
             logger.error(f"恢复回测状态失败: {str(e)}")
             raise BacktestError(f"恢复回测状态失败: {str(e)}")
     
-    @retry_on_error(max_attempts=3, delay=1.0)
     def run(self, strategy: BaseStrategy) -> Dict[str, Any]:
         """运行回测
 
@@ -219,10 +207,11 @@ class BacktestEngine:
                 logger.info(f"从检查点恢复回测 - 日期: {self.current_date}")
             
             # 获取回测区间的交易日历
-            trading_dates = strategy.data_fetcher.get_trading_dates(
+            trading_dates = sorted(strategy.data_fetcher.get_trading_dates(
                 self.start_date,
                 self.end_date
-            )
+            ))
+            self.trading_calendar = trading_dates
             
             # 确定起始索引
             start_idx = 0
@@ -232,52 +221,69 @@ class BacktestEngine:
                     logger.info("检查点已是最后一个交易日，回测已完成")
                     return self._calculate_performance()
             
-            # 遍历每个交易日
-            for i, date in enumerate(trading_dates[start_idx:], start_idx):
-                self.current_date = date
-                logger.debug(f"回测日期: {date} ({i+1}/{len(trading_dates)})")
-                
-                try:
-                    # 获取当日行情数据
-                    data_fetch_start = time.time()
-                    data = self._get_daily_data(strategy)
-                    self.stats['data_fetch_time'] += time.time() - data_fetch_start
-                    
-                    if not data:
-                        logger.warning(f"日期 {date} 没有行情数据，跳过")
-                        continue
-                    
-                    # 运行策略
-                    signal_start = time.time()
-                    strategy.on_bar(data)
-                    self.stats['signal_generation_time'] += time.time() - signal_start
-                    
-                    # 更新回测状态
-                    self._update_backtest_status(data)
+            # 遍历每个交易日：后台线程预取后续交易日数据，与策略计算重叠
+            pipeline = PrefetchPipeline(
+                lambda d: self._get_daily_data(strategy, d),
+                trading_dates[start_idx:],
+                depth=self.prefetch_depth
+            )
+            try:
+                for i, item in enumerate(pipeline, start_idx):
+                    date = item.date
+                    self.current_date = date
+                    logger.debug(f"回测日期: {date} ({i+1}/{len(trading_dates)})")
                     
-                    # 定期保存检查点
-                    if (i + 1) % self.checkpoint_interval == 0 or i == len(trading_dates) - 1:
-                        self.save_checkpoint(strategy.name)
+                    try:
+                        # 获取当日行情数据（已由预取线程加载）
+                        data = item.result()
+                        self.stats['data_fetch_time'] += item.load_time
                         
-                except Exception as e:
-                    logger.error(f"回测日期 {date} 处理失败: {str(e)}")
-                    # 如果有检查点，可以从上一个检查点恢复
-                    if self.last_checkpoint_date:
-                        logger.warning(f"尝试从上一个检查点恢复: {self.last_checkpoint_date}")
-                        checkpoint = self.load_checkpoint(strategy.name)
-                        if checkpoint:
-                            self.restore_from_checkpoint(checkpoint)
+                        if not data:
+                            logger.warning(f"日期 {date} 没有行情数据，跳过")
                             continue
-                    raise
+                        
+                        # 运行策略
+                        signal_start = time.time()
+                        strategy.on_bar(data)
+                        self.stats['signal_generation_time'] += time.time() - signal_start
+                        
+                        # 更新回测状态
+                        self._update_backtest_status(data)
+                        
+                        # 定期保存检查点
+                        if (i + 1) % self.checkpoint_interval == 0 or i == len(trading_dates) - 1:
+                            self.save_checkpoint(strategy.name)
+                            
+                    except Exception as e:
+                        logger.error(f"回测日期 {date} 处理失败: {str(e)}")
+                        # 如果有检查点，可以从上一个检查点恢复
+                        if self.last_checkpoint_date:
+                            logger.warning(f"尝试从上一个检查点恢复: {self.last_checkpoint_date}")
+                            checkpoint = self.load_checkpoint(strategy.name)
+                            if checkpoint:
+                                self.restore_from_checkpoint(checkpoint)
+                                continue
+                        raise
+            finally:
+                pipeline.stop()
+                self.stats['prefetch'] = pipeline.get_stats()
+                logger.info(f"数据预取统计 - 平均队列深度: {self.stats['prefetch']['avg_queue_depth']:.2f}, "
+                            f"等待数据: {self.stats['prefetch']['stall_time']:.2f}秒 "
+                            f"({self.stats['prefetch']['stall_count']}次), "
+                            f"预取等待: {self.stats['prefetch']['producer_wait_time']:.2f}秒, "
+                            f"瓶颈: {self.stats['prefetch']['bound']}")
                 
             # 计算回测绩效
             results = self._calculate_performance()
             
             # 记录执行时间
             self.stats['execution_time'] = time.time() - start_time
+            self.stats['xtdata'] = get_session('xtdata').get_stats()
+            self.stats['memo'] = get_memo_stats()
             results['stats'] = self.stats
             
-            logger.info(f"回测完成 - 策略: {strategy.name}, 耗时: {self.stats['execution_time']:.2f}秒")
+            logger.info(f"回测完成 - 策略: {strategy.name}, 耗时: {self.stats['execution_time']:.2f}秒, "
+                        f"风控拒绝委托: {self.stats.get('risk_rejections', 0)} 笔")
             return results
             
         except Exception as e:
@@ -338,30 +344,33 @@ class BacktestEngine:
             logger.warning(f"读取缓存数据失败 - 代码: {code}, 日期: {date}, 错误: {str(e)}")
         return None
     
-    @retry_on_error(max_attempts=2, delay=0.5)
-    def _get_daily_data(self, strategy: BaseStrategy) -> Dict[str, Any]:
+    def _get_daily_data(self, strategy: BaseStrategy, date: Optional[str] = None) -> Dict[str, Any]:
         """获取当日市场数据
 
+        可在预取线程中调用，除 date 参数外不依赖回测过程中的可变状态。
+
         Args:
             strategy: 策略实例
+            date: 交易日，默认当前回测日期
 
         Returns:
             Dict[str, Any]: 市场数据字典
         """
+        date = date or self.current_date
         try:
             data = {}
-            history_length = strategy.config['data']['history_length']
+            history_length = strategy.history_length
             
             # 检查数据缓存
             for code in strategy.universe:
-                cached_data = self._get_cached_data(code, self.current_date, history_length)
+                cached_data = self._get_cached_data(code, date, history_length)
                 if cached_data:
                     data[code] = cached_data[code]
             
             # 获取未缓存的数据
             missing_codes = [code for code in strategy.universe if code not in data]
             if missing_codes:
-                logger.debug(f"获取未缓存数据 - 代码数量: {len(missing_codes)}, 日期: {self.current_date}")
+                logger.debug(f"获取未缓存数据 - 代码数量: {len(missing_codes)}, 日期: {date}")
                 
                 # 尝试批量获取数据
                 try:
@@ -376,9 +385,9 @@ class BacktestEngine:
                         if code in batch_data:
                             data[code] = batch_data[code]
                             # 缓存数据
-                            self._cache_daily_data(code, self.current_date, history_length, {code: batch_data[code]})
+                            self._cache_daily_data(code, date, history_length, {code: batch_data[code]})
                         else:
-                            logger.warning(f"批量获取数据失败 - 代码: {code}, 日期: {self.current_date}")
+                            logger.warning(f"批量获取数据失败 - 代码: {code}, 日期: {date}")
                             
                 except Exception as e:
                     logger.error(f"批量获取数据失败: {str(e)}，将回退到单个获取")
@@ -397,15 +406,12 @@ class BacktestEngine:
                             if hist_data and code in hist_data:
                                 data[code] = hist_data[code]
                                 # 缓存数据
-                                self._cache_daily_data(code, self.current_date, history_length, {code: hist_data[code]})
+                                self._cache_daily_data(code, date, history_length, {code: hist_data[code]})
                         except Exception as code_e:
                             logger.error(f"获取单个数据失败 - 代码: {code}, 错误: {str(code_e)}")
             
-            # 验证数据完整性
-            for code in list(data.keys()):
-                if not strategy.data_fetcher.validate_data(data, code):
-                    logger.warning(f"数据验证失败，移除无效数据 - 代码: {code}")
-                    del data[code]
+            # 整体数据质量检查：跳过最新K线不可用的股票，修复历史坏行
+            data = strategy.data_fetcher.clean_data(data, self.trading_calendar)
             
             return data
         
@@ -427,6 +433,8 @@ class BacktestEngine:
                     close_price = data[code]['close'][-1]
                     market_value = pos * close_price
                     portfolio_value += market_value
+                    self.risk.mark_price(code, close_price)
+            self.risk.set_total_asset(portfolio_value)
             
             # 计算日收益率
             daily_return = (portfolio_value - self.equity) / self.equity
@@ -502,27 +510,27 @@ class BacktestEngine:
             slippage_cost = price * volume * self.slippage
             total_cost = price * volume + commission + slippage_cost
             
+            # 事前风控：资金、持仓数、单票和总仓位、可卖数量
+            self.risk.mark_price(code, price)
+            reason = self.risk.check(code, direction, volume, price)
+            if reason:
+                self.stats['risk_rejections'] = self.stats.get('risk_rejections', 0) + 1
+                logger.warning(reason)
+                return False
+            
             if direction == 'buy':
-                # 检查资金是否足够
-                if total_cost > self.cash:
-                    logger.warning(f"资金不足 - 所需: {total_cost:.2f}, 现有: {self.cash:.2f}")
-                    return False
-                
                 # 更新持仓和资金
                 self.positions[code] = self.positions.get(code, 0) + volume
                 self.cash -= total_cost
                 
             else:  # sell
-                # 检查持仓是否足够
-                if code not in self.positions or self.positions[code] < volume:
-                    logger.warning(f"持仓不足 - 代码: {code}, 所需: {volume}, 现有: {self.positions.get(code, 0)}")
-                    return False
-                
                 # 更新持仓和资金
                 self.positions[code] -= volume
                 if self.positions[code] == 0:
                     del self.positions[code]
                 self.cash += total_cost
+            self.risk.on_fill(code, direction, volume, price)
+            self.risk.sync(self.cash, self.risk.total_asset)
             
             # 记录交易
             self.trades.append({
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""数据预取模块
+
+此模块实现回测的生产者/消费者流水线，包括：
+1. 后台线程提前获取和预处理后续交易日的数据
+2. 有界队列限制预取深度
+3. 队列深度和等待时间统计，用于判断回测是I/O瓶颈还是计算瓶颈
+"""
+
+import time
+import queue
+import threading
+from typing import Dict, Any, List, Callable, Iterator, Optional
+
+from loguru import logger
+
+
+class PrefetchItem:
+    """预取结果"""
+
+    def __init__(self, date: str, data: Any = None, error: Optional[BaseException] = None,
+                 load_time: float = 0.0):
+        """初始化预取结果
+
+        Args:
+            date: 交易日
+            data: 数据
+            error: 加载时发生的异常
+            load_time: 加载耗时（秒）
+        """
+        self.date = date
+        self.data = data
+        self.error = error
+        self.load_time = load_time
+
+    def result(self) -> Any:
+        """获取数据，加载失败时在消费者线程重新抛出异常
+
+        Returns:
+            Any: 数据
+        """
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+
+class PrefetchPipeline:
+    """后台预取流水线
+
+    后台线程按顺序加载交易日数据放入有界队列，消费者（策略）处理第N天时，
+    第N+1天及之后（至多 depth 天）的数据已在加载。depth 为 0 时退化为同步加载。
+    """
+
+    _END = object()
+
+    def __init__(self, loader: Callable[[str], Any], dates: List[str], depth: int = 2):
+        """初始化流水线
+
+        Args:
+            loader: 数据加载函数，参数为交易日
+            dates: 交易日列表
+            depth: 最大预取深度
+        """
+        self.loader = loader
+        self.dates = list(dates)
+        self.depth = max(int(depth), 0)
+        self._queue = queue.Queue(maxsize=max(self.depth, 1))
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            'consumed': 0,
+            'load_time': 0.0,
+            'stall_time': 0.0,         # 消费者等待数据的总时间
+            'stall_count': 0,          # 消费者取数时队列为空的次数
+            'producer_wait_time': 0.0,  # 生产者因队列已满而等待的总时间
+            'queue_depth_sum': 0,
+            'max_queue_depth': 0
+        }
+
+    def start(self) -> None:
+        """启动后台预取线程"""
+        if self.depth == 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._produce, name='backtest-prefetch', daemon=True)
+        self._thread.start()
+        logger.debug(f"启动数据预取线程 - 深度: {self.depth}, 交易日数: {len(self.dates)}")
+
+    def stop(self) -> None:
+        """停止后台预取线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            # 清空队列，唤醒可能阻塞在 put 上的生产者
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _load(self, date: str) -> PrefetchItem:
+        """加载单个交易日的数据
+
+        Args:
+            date: 交易日
+
+        Returns:
+            PrefetchItem: 预取结果
+        """
+        start = time.time()
+        try:
+            data = self.loader(date)
+            return PrefetchItem(date, data, load_time=time.time() - start)
+        except Exception as e:
+            logger.error(f"预取数据失败 - 日期: {date}, 错误: {str(e)}")
+            return PrefetchItem(date, error=e, load_time=time.time() - start)
+
+    def _produce(self) -> None:
+        """生产者线程主循环"""
+        for date in self.dates:
+            if self._stop_event.is_set():
+                return
+            item = self._load(date)
+            if not self._put(item):
+                return
+        self._put(self._END)
+
+    def _put(self, item: Any) -> bool:
+        """放入队列，队列已满时等待并统计等待时间
+
+        Args:
+            item: 队列元素
+
+        Returns:
+            bool: 是否放入成功（被停止时返回False）
+        """
+        wait_start = time.time()
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                self.stats['producer_wait_time'] += time.time() - wait_start
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self) -> Iterator[PrefetchItem]:
+        """按交易日顺序迭代预取结果
+
+        Yields:
+            PrefetchItem: 预取结果
+        """
+        if self.depth == 0:
+            for date in self.dates:
+                item = self._load(date)
+                self._record(item, item.load_time, stalled=True)
+                yield item
+            return
+
+        self.start()
+        while True:
+            depth = self._queue.qsize()
+            stalled = depth == 0
+            wait_start = time.time()
+            item = self._queue.get()
+            if item is self._END:
+                return
+            self._record(item, time.time() - wait_start, stalled, depth)
+            yield item
+
+    def _record(self, item: PrefetchItem, wait_time: float, stalled: bool, depth: int = 0) -> None:
+        """记录统计信息
+
+        Args:
+            item: 预取结果
+            wait_time: 消费者等待时间
+            stalled: 取数时队列是否为空
+            depth: 取数时的队列深度
+        """
+        self.stats['consumed'] += 1
+        self.stats['load_time'] += item.load_time
+        self.stats['stall_time'] += wait_time
+        self.stats['stall_count'] += int(stalled)
+        self.stats['queue_depth_sum'] += depth
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], depth)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取流水线统计信息
+
+        Returns:
+            Dict[str, Any]: 统计信息，bound 为 'io' 表示策略经常等待数据，
+                'compute' 表示预取线程经常等待策略
+        """
+        stats = dict(self.stats)
+        consumed = max(stats['consumed'], 1)
+        stats['avg_queue_depth'] = stats.pop('queue_depth_sum') / consumed
+        stats['stall_ratio'] = stats['stall_count'] / consumed
+        stats['bound'] = 'io' if stats['stall_time'] >= stats['producer_wait_time'] else 'compute'
+        return stats
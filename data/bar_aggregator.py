@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""多周期K线聚合模块
+
+此模块把1分钟K线或分笔聚合为更长周期的K线，包括：
+1. 周期划分按A股交易时段对齐（9:30-11:30、13:00-15:00），午休不产生K线，
+   60分钟K线为 10:30、11:30、14:00、15:00
+2. 历史数据整段向量化聚合（每个周期一次 reduceat）
+3. 实盘逐条增量聚合，同一分钟K线的重复推送替换而不是累加
+4. 按（股票, 周期）缓存聚合结果，追加基础数据时只重算最后一个未完成的周期
+
+K线时间为周期结束时间（与 xtdata 分钟K线一致），日线为交易日零点，周线为该周最后一个交易日零点。
+9:30 的集合竞价K线并入第一个周期。
+"""
+
+import threading
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from data.panel import to_datetime64, TZ_OFFSET_MS, MS_PER_DAY
+
+MS_PER_MINUTE = 60 * 1000
+
+# 交易时段（距零点的分钟数）
+MORNING_OPEN = 9 * 60 + 30
+AFTERNOON_OPEN = 13 * 60
+SESSION_LENGTH = 120
+
+# 周期名称到分钟数的映射，日线和周线使用特殊值
+DAILY = -1
+WEEKLY = -2
+TIMEFRAMES = {
+    '1m': 1, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '1h': 60, '120m': 120,
+    '1d': DAILY, '1w': WEEKLY
+}
+
+OHLCV_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+
+def parse_timeframe(timeframe: str) -> int:
+    """解析周期名称
+
+    Args:
+        timeframe: 周期名称，如 '5m'、'60m'、'1d'、'1w'
+
+    Returns:
+        int: 周期分钟数，日线为 DAILY，周线为 WEEKLY
+
+    Raises:
+        ValueError: 不支持的周期
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"不支持的周期: {timeframe}")
+    return TIMEFRAMES[timeframe]
+
+
+def _local_ms(times: Any) -> np.ndarray:
+    """把时间键转换为北京时间的毫秒数"""
+    return to_datetime64(times).astype(np.int64)
+
+
+def trading_elapsed_ms(times: Any) -> np.ndarray:
+    """每个时间点在当日已经过的连续竞价时长（毫秒）
+
+    开盘前为 0，午休为上午收盘时的 120 分钟，收盘后为 240 分钟。
+
+    Args:
+        times: 时间键
+
+    Returns:
+        np.ndarray: int64 毫秒数
+    """
+    of_day = _local_ms(times) % MS_PER_DAY
+    morning = np.clip(of_day - MORNING_OPEN * MS_PER_MINUTE, 0, SESSION_LENGTH * MS_PER_MINUTE)
+    afternoon = np.clip(of_day - AFTERNOON_OPEN * MS_PER_MINUTE, 0, SESSION_LENGTH * MS_PER_MINUTE)
+    return morning + afternoon
+
+
+def bucket_keys(times: Any, timeframe: str) -> np.ndarray:
+    """每条记录所属周期的键
+
+    分钟周期的键为周期结束时间（毫秒时间戳），日线为交易日零点，周线为该周周一零点。
+
+    Args:
+        times: 时间键（升序）
+        timeframe: 周期名称
+
+    Returns:
+        np.ndarray: int64 周期键
+    """
+    minutes = parse_timeframe(timeframe)
+    local = _local_ms(times)
+    day = local - local % MS_PER_DAY
+    if minutes == DAILY:
+        return day - TZ_OFFSET_MS
+    if minutes == WEEKLY:
+        # 1970-01-01 为周四
+        weekday = (day // MS_PER_DAY + 3) % 7
+        return day - weekday * MS_PER_DAY - TZ_OFFSET_MS
+
+    span = minutes * MS_PER_MINUTE
+    elapsed = trading_elapsed_ms(times)
+    index = np.maximum((elapsed + span - 1) // span, 1)
+    end = np.minimum(index * minutes, 2 * SESSION_LENGTH)
+    clock = np.where(end <= SESSION_LENGTH, MORNING_OPEN + end, AFTERNOON_OPEN + end - SESSION_LENGTH)
+    return day + clock * MS_PER_MINUTE - TZ_OFFSET_MS
+
+
+def ticks_to_bars(ticks: Dict[str, Any], state: Optional[Tuple[int, float, float]] = None
+                  ) -> Tuple[Dict[str, np.ndarray], Optional[Tuple[int, float, float]]]:
+    """把分笔转换为每笔一条的K线记录，成交量和成交额由当日累计值差分得到
+
+    Args:
+        ticks: 分笔字段（time、lastPrice、volume、amount 为当日累计）
+        state: 上一笔的（交易日, 累计成交量, 累计成交额），用于增量转换
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], Optional[Tuple[int, float, float]]]: K线记录和最后一笔的状态
+    """
+    times = np.asarray(ticks['time'], dtype=np.int64)
+    price = np.asarray(ticks['lastPrice'], dtype=np.float64)
+    volume = np.asarray(ticks['volume'], dtype=np.float64)
+    amount = np.asarray(ticks['amount'], dtype=np.float64)
+    if len(times) == 0:
+        return {'time': times, **{f: price for f in OHLCV_FIELDS}}, state
+
+    days = _local_ms(times) // MS_PER_DAY
+    prev_days = np.empty_like(days)
+    prev_volume = np.empty_like(volume)
+    prev_amount = np.empty_like(amount)
+    prev_days[1:], prev_volume[1:], prev_amount[1:] = days[:-1], volume[:-1], amount[:-1]
+    if state is None:
+        prev_days[0], prev_volume[0], prev_amount[0] = days[0] - 1, 0.0, 0.0
+    else:
+        prev_days[0], prev_volume[0], prev_amount[0] = state
+    # 新交易日的第一笔使用累计值本身
+    new_day = days != prev_days
+    bar_volume = np.where(new_day, volume, np.maximum(volume - prev_volume, 0.0))
+    bar_amount = np.where(new_day, amount, np.maximum(amount - prev_amount, 0.0))
+
+    # 开盘前价格为 0 的快照不参与聚合
+    valid = price > 0
+    bars = {'time': times[valid], 'open': price[valid], 'high': price[valid], 'low': price[valid],
+            'close': price[valid], 'volume': bar_volume[valid], 'amount': bar_amount[valid]}
+    return bars, (int(days[-1]), float(volume[-1]), float(amount[-1]))
+
+
+def aggregate(bars: Dict[str, Any], timeframe: str) -> Dict[str, np.ndarray]:
+    """把K线（或 ticks_to_bars 的结果）整段聚合为指定周期
+
+    Args:
+        bars: 字段到序列的映射，按时间升序，至少包含 time 和 close
+        timeframe: 周期名称
+
+    Returns:
+        Dict[str, np.ndarray]: 聚合后的K线，time 为 int64 毫秒时间戳
+    """
+    times = np.asarray(bars['time'])
+    close = np.asarray(bars['close'], dtype=np.float64)
+    valid = ~np.isnan(close)
+    if not valid.all():
+        times, close = times[valid], close[valid]
+    if len(times) == 0:
+        return {'time': np.empty(0, dtype=np.int64), **{f: np.empty(0) for f in OHLCV_FIELDS}}
+
+    def field(name: str, fallback: np.ndarray) -> np.ndarray:
+        values = np.asarray(bars[name], dtype=np.float64) if name in bars else fallback
+        return values if valid.all() else values[valid]
+
+    keys = bucket_keys(times, timeframe)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    zeros = np.zeros_like(close)
+
+    result = {
+        'time': keys[starts],
+        'open': field('open', close)[starts],
+        'high': np.maximum.reduceat(field('high', close), starts),
+        'low': np.minimum.reduceat(field('low', close), starts),
+        'close': close[ends],
+        'volume': np.add.reduceat(field('volume', zeros), starts),
+        'amount': np.add.reduceat(field('amount', zeros), starts)
+    }
+    if parse_timeframe(timeframe) == WEEKLY:
+        # 周线时间为该周最后一个交易日
+        last = _local_ms(times[ends])
+        result['time'] = last - last % MS_PER_DAY - TZ_OFFSET_MS
+    return result
+
+
+class BarAggregator:
+    """单只股票单一周期的实盘增量聚合
+
+    输入逐条的1分钟K线或分笔（已由 ticks_to_bars 转换），同一时间的K线重复推送时替换上一条。
+    """
+
+    def __init__(self, timeframe: str):
+        """初始化聚合器
+
+        Args:
+            timeframe: 周期名称
+        """
+        parse_timeframe(timeframe)
+        self.timeframe = timeframe
+        self._key = None
+        self._closed: Optional[Dict[str, float]] = None
+        self._last: Optional[Dict[str, float]] = None
+
+    @staticmethod
+    def _combine(first: Optional[Dict[str, float]], second: Dict[str, float]) -> Dict[str, float]:
+        if first is None:
+            return dict(second)
+        return {
+            'time': second['time'],
+            'open': first['open'],
+            'high': max(first['high'], second['high']),
+            'low': min(first['low'], second['low']),
+            'close': second['close'],
+            'volume': first['volume'] + second['volume'],
+            'amount': first['amount'] + second['amount']
+        }
+
+    def _label(self, bar: Dict[str, float]) -> Dict[str, float]:
+        """把周期内的聚合值转换为带周期时间的K线"""
+        result = dict(bar)
+        result['time'] = int(aggregate({f: [bar[f]] for f in bar}, self.timeframe)['time'][0])
+        return result
+
+    def current(self) -> Optional[Dict[str, float]]:
+        """当前未完成周期的K线"""
+        if self._last is None:
+            return None
+        return self._label(self._combine(self._closed, self._last))
+
+    def update(self, record: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        """输入一条记录
+
+        Args:
+            record: 包含 time、close 以及可选 open、high、low、volume、amount 的K线（字典或结构化记录）
+
+        Returns:
+            Optional[Dict[str, float]]: 进入新周期时返回上一个已完成周期的K线，否则返回None
+        """
+        names = getattr(getattr(record, 'dtype', None), 'names', None) or record
+        bar = {'time': int(record['time']), 'close': float(record['close'])}
+        for field in ('open', 'high', 'low'):
+            bar[field] = float(record[field]) if field in names else bar['close']
+        for field in ('volume', 'amount'):
+            bar[field] = float(record[field]) if field in names else 0.0
+        key = int(bucket_keys(np.array([bar['time']]), self.timeframe)[0])
+
+        completed = None
+        if self._key is not None and key != self._key:
+            completed = self.current()
+            self._closed = None
+            self._last = None
+        elif self._last is not None and bar['time'] != self._last['time']:
+            self._closed = self._combine(self._closed, self._last)
+        self._key = key
+        self._last = bar
+        return completed
+
+
+class TimeframeCache:
+    """按（股票, 周期）缓存的聚合结果
+
+    基础数据（1分钟K线或分笔）每只股票只保存一份，各周期首次请求时整段聚合，
+    之后追加基础数据时只从最后一个周期的起点重新聚合。
+    """
+
+    def __init__(self, max_base_rows: int = 0):
+        """初始化缓存
+
+        Args:
+            max_base_rows: 每只股票保留的基础数据行数，0 表示不限制
+        """
+        self.max_base_rows = max_base_rows
+        self._base: Dict[str, Dict[str, np.ndarray]] = {}
+        self._tick_state: Dict[str, Tuple[int, float, float]] = {}
+        self._derived: Dict[Tuple[str, str], Tuple[Dict[str, np.ndarray], int]] = {}
+        self._lock = threading.RLock()
+
+    def _normalize(self, code: str, data: Any) -> Dict[str, np.ndarray]:
+        """把K线或分笔转换为统一的K线记录并按时间排序"""
+        if 'lastPrice' in data:
+            bars, self._tick_state[code] = ticks_to_bars(data, self._tick_state.get(code))
+        else:
+            bars = {'time': np.asarray(data['time'])}
+            for field in OHLCV_FIELDS:
+                if field in data:
+                    bars[field] = np.asarray(data[field], dtype=np.float64)
+        bars['time'] = (_local_ms(bars['time']) - TZ_OFFSET_MS).astype(np.int64)
+        if len(bars['time']) > 1 and not np.all(bars['time'][1:] >= bars['time'][:-1]):
+            order = np.argsort(bars['time'], kind='stable')
+            bars = {field: values[order] for field, values in bars.items()}
+        return bars
+
+    def set_base(self, code: str, data: Any) -> None:
+        """设置股票的基础数据，已有的聚合结果失效
+
+        Args:
+            code: 股票代码
+            data: 1分钟K线或分笔（字段到序列的映射，或 xtdata 返回的 DataFrame）
+        """
+        with self._lock:
+            self._tick_state.pop(code, None)
+            self._base[code] = self._trim(self._normalize(code, data))
+            for key in [key for key in self._derived if key[0] == code]:
+                del self._derived[key]
+
+    def append_base(self, code: str, data: Any) -> int:
+        """追加基础数据
+
+        时间晚于已有最后一条的记录被追加；与最后一条时间相同的K线（未完成分钟的重复推送）替换最后一条。
+
+        Args:
+            code: 股票代码
+            data: 1分钟K线或分笔
+
+        Returns:
+            int: 新增或替换的行数
+        """
+        with self._lock:
+            base = self._base.get(code)
+            if base is None:
+                self.set_base(code, data)
+                return len(self._base[code]['time'])
+
+            new = self._normalize(code, data)
+            last_time = base['time'][-1] if len(base['time']) else np.iinfo(np.int64).min
+            is_tick = 'lastPrice' in data
+            keep = new['time'] > last_time if is_tick else new['time'] >= last_time
+            if not keep.any():
+                return 0
+            new = {field: values[keep] for field, values in new.items()}
+            # 分钟K线：最后一条被新推送替换
+            stop = len(base['time']) - 1 if not is_tick and new['time'][0] == last_time else len(base['time'])
+            fields = [field for field in base if field in new]
+            base = {field: np.concatenate([base[field][:stop], new[field]]) for field in fields}
+            dropped = max(len(base['time']) - self.max_base_rows, 0) if self.max_base_rows else 0
+            self._base[code] = self._trim(base)
+
+            # 各周期只从最后一个周期的起点重新聚合
+            for (cached_code, timeframe), (bars, start) in list(self._derived.items()):
+                if cached_code == code:
+                    self._derived[(code, timeframe)] = self._extend(code, timeframe, bars, max(start - dropped, 0))
+            return len(new['time'])
+
+    def _trim(self, base: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        if self.max_base_rows and len(base['time']) > self.max_base_rows:
+            return {field: values[-self.max_base_rows:] for field, values in base.items()}
+        return base
+
+    def _extend(self, code: str, timeframe: str, bars: Dict[str, np.ndarray],
+                start: int) -> Tuple[Dict[str, np.ndarray], int]:
+        """从基础数据第 start 行（bars 最后一个周期的起点）起重新聚合，替换 bars 的最后一个周期
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], int]: 聚合结果、最后一个周期在基础数据中的起点
+        """
+        base = {field: values[start:] for field, values in self._base[code].items()}
+        tail = aggregate(base, timeframe)
+        keep = max(len(bars['time']) - 1, 0)
+        merged = {field: np.concatenate([bars[field][:keep], tail[field]]) for field in tail}
+        if len(base['time']) == 0:
+            return merged, start
+        keys = bucket_keys(base['time'], timeframe)
+        return merged, start + int(np.searchsorted(keys, keys[-1]))
+
+    def get(self, code: str, timeframe: str, count: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """获取股票某个周期的K线
+
+        Args:
+            code: 股票代码
+            timeframe: 周期名称
+            count: 只返回最后若干根，默认全部
+
+        Returns:
+            Optional[Dict[str, np.ndarray]]: 字段到数组的映射，没有基础数据时返回None
+        """
+        with self._lock:
+            if code not in self._base:
+                return None
+            entry = self._derived.get((code, timeframe))
+            if entry is None:
+                empty = {field: np.empty(0) for field in OHLCV_FIELDS}
+                empty['time'] = np.empty(0, dtype=np.int64)
+                entry = self._derived[(code, timeframe)] = self._extend(code, timeframe, empty, 0)
+            bars = entry[0]
+        if count:
+            return {field: values[-count:] for field, values in bars.items()}
+        return bars
+
+    def get_many(self, codes: Sequence[str], timeframes: Sequence[str],
+                 count: Optional[int] = None) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """获取多只股票多个周期的K线
+
+        Args:
+            codes: 股票代码列表
+            timeframes: 周期名称列表
+            count: 每个周期只返回最后若干根
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, np.ndarray]]]: 周期到多股票数据字典的映射
+        """
+        result = {}
+        for timeframe in timeframes:
+            result[timeframe] = {}
+            for code in codes:
+                bars = self.get(code, timeframe, count)
+                if bars is not None:
+                    result[timeframe][code] = bars
+        return result
+
+    def last_time(self, code: str) -> Optional[int]:
+        """基础数据最后一条的时间（毫秒时间戳）"""
+        base = self._base.get(code)
+        if base is None or len(base['time']) == 0:
+            return None
+        return int(base['time'][-1])
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._base.clear()
+            self._tick_state.clear()
+            self._derived.clear()
+        logger.debug("多周期K线缓存已清空")
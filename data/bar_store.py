@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""按股票追加写入的数据存储模块
+
+此模块实现只追加的逐股票记录存储，包括：
+1. 每只股票一个定长记录二进制文件，新K线直接追加到文件末尾
+2. 按需只读取尾部若干行
+3. 记录每只股票行数和最后更新日期的清单文件
+4. 数据版本：文件被重写时更新，只追加时不变，供派生数据判断是否失效
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from data.dtypes import CompactSchema, to_compact_time_keys
+from data.panel import to_time_keys, to_date_codes, to_datetime64
+
+
+class BarStore:
+    """只追加的逐股票记录存储
+
+    每只股票的记录类型（字段和数据类型）记录在清单中；
+    追加的记录类型与已有记录不一致时（如指标参数变化），该股票的文件被重写。
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, root: str, compact: Optional[CompactSchema] = None):
+        """初始化存储
+
+        Args:
+            root: 存储目录
+            compact: 紧凑数据类型，启用时时间键为 int32、价格可编码为整数价格
+        """
+        self.root = root
+        self.compact = compact or CompactSchema()
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """加载清单文件
+
+        Returns:
+            Dict[str, Any]: 股票代码到存储信息的映射
+        """
+        path = os.path.join(self.root, self.MANIFEST)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取存储清单失败，将根据数据文件重建: {str(e)}")
+        return {}
+
+    def flush_manifest(self) -> None:
+        """原子写入清单文件"""
+        path = os.path.join(self.root, self.MANIFEST)
+        tmp_path = path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, path)
+
+    def get_path(self, code: str) -> str:
+        """获取数据文件路径
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            str: 数据文件路径
+        """
+        return os.path.join(self.root, f"{code}.bin")
+
+    def get_dtype(self, code: str) -> Optional[np.dtype]:
+        """获取股票的记录类型
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            Optional[np.dtype]: 记录类型，不存在时返回None
+        """
+        entry = self.manifest.get(code)
+        if not entry:
+            return None
+        return np.dtype([tuple(field) for field in entry['dtype']])
+
+    def rows(self, code: str) -> int:
+        """获取已存储的完整记录行数
+
+        以数据文件大小为准，忽略写入中断留下的不完整记录。
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            int: 行数
+        """
+        dtype = self.get_dtype(code)
+        path = self.get_path(code)
+        if dtype is None or not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // dtype.itemsize
+
+    def last_time(self, code: str) -> Optional[int]:
+        """获取最后一条记录的时间键
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            Optional[int]: 时间键，不存在时返回None
+        """
+        entry = self.manifest.get(code)
+        return entry.get('last_time') if entry else None
+
+    def last_date(self, code: str) -> Optional[int]:
+        """获取最后一条记录的日期（YYYYMMDD）
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            Optional[int]: 日期编码，不存在时返回None
+        """
+        entry = self.manifest.get(code)
+        return entry.get('last_date') if entry else None
+
+    def data_version(self, code: str) -> Optional[str]:
+        """获取数据版本
+
+        只追加新K线时版本不变，已有记录被重写时版本变化。
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            Optional[str]: 数据版本，不存在时返回None
+        """
+        entry = self.manifest.get(code)
+        return entry.get('version', '') if entry else None
+
+    def _to_records(self, stock_data: Any) -> np.ndarray:
+        """把字段到序列的映射转换为记录数组
+
+        Args:
+            stock_data: 字段到序列的映射或DataFrame（time 为索引或列）
+
+        Returns:
+            np.ndarray: 按时间升序的记录数组
+        """
+        if isinstance(stock_data, pd.DataFrame):
+            columns = {'time': stock_data['time'].values if 'time' in stock_data.columns
+                       else stock_data.index.values}
+            for column in stock_data.columns:
+                if column != 'time' and stock_data[column].dtype.kind in 'fiub':
+                    columns[column] = stock_data[column].values
+        else:
+            columns = {f: np.asarray(v) for f, v in stock_data.items()
+                       if f == 'time' or np.asarray(v).dtype.kind in 'fiub'}
+
+        if self.compact.enabled:
+            times = to_compact_time_keys(columns.pop('time'))
+        else:
+            times = to_time_keys(columns.pop('time'))
+        descr = [('time', times.dtype.str)] + [(f, v.dtype.str) for f, v in columns.items()]
+        records = np.empty(len(times), dtype=descr)
+        records['time'] = times
+        for field, values in columns.items():
+            records[field] = values
+        return records[np.argsort(records['time'], kind='stable')]
+
+    def append(self, code: str, stock_data: Any, updated: Optional[str] = None) -> int:
+        """追加新记录（写入时间晚于已有最后一条的记录）
+
+        与已有最后一条时间相同的记录（盘中仍在形成的K线或被修正的最后一根K线）改写最后一条；
+        更早的记录被忽略。
+
+        Args:
+            code: 股票代码
+            stock_data: 字段到序列的映射或DataFrame
+            updated: 更新日期，默认当前时间
+
+        Returns:
+            int: 写入的行数（追加的行数，最后一条被改写时加一）。
+                第 rows(code) - 返回值 行起的数据发生了变化
+        """
+        records = self._to_records(stock_data)
+        if len(records) == 0:
+            return 0
+
+        path = self.get_path(code)
+        dtype = self.get_dtype(code)
+        last_time = self.last_time(code)
+        mode = 'ab'
+        if dtype is None or dtype != records.dtype or not os.path.exists(path):
+            if dtype is not None:
+                logger.info(f"记录类型变化，重写存储 - 代码: {code}")
+            mode = 'wb'
+            last_time = None
+        else:
+            # 截断写入中断留下的不完整记录
+            size = os.path.getsize(path)
+            if size % dtype.itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(size - size % dtype.itemsize)
+            # 追加后未来得及写清单时，以数据文件中的最后一条记录为准
+            rows = self.rows(code)
+            if rows and rows != self.manifest[code].get('rows'):
+                last_time = int(self.read(code, tail=1)['time'][0])
+
+        revised = None
+        if last_time is not None:
+            same = records[records['time'] == last_time]
+            records = records[records['time'] > last_time]
+            if len(same) and same[-1:].tobytes() != self.read(code, tail=1).tobytes():
+                revised = same[-1:]
+            if len(records) == 0 and revised is None:
+                return 0
+
+        if revised is not None:
+            with open(path, 'r+b') as f:
+                f.seek((self.rows(code) - 1) * dtype.itemsize)
+                revised.tofile(f)
+        if len(records):
+            with open(path, mode) as f:
+                records.tofile(f)
+        last = records[-1:] if len(records) else revised
+
+        with self._lock:
+            if mode == 'ab':
+                version = self.manifest[code].get('version', '')
+            else:
+                version = f"{time.time_ns():x}"
+            self.manifest[code] = {
+                'dtype': [list(field) for field in last.dtype.descr],
+                'version': version,
+                'rows': self.rows(code) if mode == 'ab' else len(records),
+                'last_time': int(last['time'][0]),
+                'last_date': int(to_date_codes(last['time'])[0]),
+                'updated': updated or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+        return len(records) + (revised is not None)
+
+    def read(self, code: str, tail: Optional[int] = None) -> Optional[np.ndarray]:
+        """读取记录
+
+        Args:
+            code: 股票代码
+            tail: 只读取最后若干行，默认全部
+
+        Returns:
+            Optional[np.ndarray]: 记录数组，不存在时返回None
+        """
+        dtype = self.get_dtype(code)
+        path = self.get_path(code)
+        if dtype is None or not os.path.exists(path):
+            return None
+        rows = os.path.getsize(path) // dtype.itemsize
+        start = 0 if tail is None else max(rows - tail, 0)
+        return np.fromfile(path, dtype=dtype, count=rows - start, offset=start * dtype.itemsize)
+
+    def read_dict(self, code: str, tail: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """以字段到数组的映射读取记录
+
+        Args:
+            code: 股票代码
+            tail: 只读取最后若干行，默认全部
+
+        Returns:
+            Optional[Dict[str, np.ndarray]]: 字段到数组的映射
+        """
+        records = self.read(code, tail)
+        if records is None:
+            return None
+        return {field: records[field] for field in records.dtype.names}
+
+    def read_frame(self, code: str, tail: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """以DataFrame读取记录，时间作为索引
+
+        Args:
+            code: 股票代码
+            tail: 只读取最后若干行，默认全部
+
+        Returns:
+            Optional[pd.DataFrame]: 数据框
+        """
+        records = self.read(code, tail)
+        if records is None:
+            return None
+        if self.compact.enabled:
+            index = pd.Index(records['time'], name='datetime')
+        else:
+            index = pd.DatetimeIndex(to_datetime64(records['time']), name='datetime')
+        columns = {field: records[field] for field in records.dtype.names if field != 'time'}
+        return self.compact.decode_ticks(pd.DataFrame(columns, index=index))
+
+    def append_frame(self, code: str, df: pd.DataFrame, updated: Optional[str] = None) -> int:
+        """追加DataFrame中的新行，紧凑模式下价格编码为整数价格
+
+        Args:
+            code: 股票代码
+            df: 以时间为索引的数据框
+            updated: 更新日期
+
+        Returns:
+            int: 写入的行数（含被改写的最后一条）
+        """
+        return self.append(code, self.compact.encode_ticks(df), updated)
+
+    def codes(self) -> List[str]:
+        """获取已存储的股票代码
+
+        Returns:
+            List[str]: 股票代码列表
+        """
+        return list(self.manifest.keys())
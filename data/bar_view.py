@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""轻量K线视图模块
+
+此模块为策略热路径提供不依赖 pandas 的K线访问接口，包括：
+1. BarView：单只股票的字段数组，按属性访问字段（bars.close），按负下标访问最近的K线（bars[-1].close）
+2. Bar：单根K线，只保存数组引用和行号，读取字段时才取值
+3. BarSet：标的池中每只股票的 BarView，以及跨股票取最新值的辅助方法
+
+所有字段都是 NumPy 一维数组，视图和切片不复制数据，单次访问开销在微秒级。
+"""
+
+from typing import Dict, List, Any, Iterator, Optional, Sequence
+
+import numpy as np
+
+from data.panel import to_date_codes
+
+
+class Bar:
+    """单根K线，按属性或键读取字段值"""
+
+    __slots__ = ('_fields', '_index')
+
+    def __init__(self, fields: Dict[str, np.ndarray], index: int):
+        """初始化K线
+
+        Args:
+            fields: 字段名到一维数组的映射
+            index: 行号（非负）
+        """
+        self._fields = fields
+        self._index = index
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._fields[name][self._index]
+        except KeyError:
+            raise AttributeError(f"K线没有字段: {name}") from None
+
+    def __getitem__(self, name: str) -> Any:
+        return self._fields[name][self._index]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._fields
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """读取字段值，字段不存在时返回默认值"""
+        values = self._fields.get(name)
+        return default if values is None else values[self._index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字段到值的字典"""
+        return {name: values[self._index] for name, values in self._fields.items()}
+
+    def __repr__(self) -> str:
+        return f"Bar({self.to_dict()})"
+
+
+class BarView:
+    """单只股票的K线视图
+
+    Attributes:
+        code: 股票代码
+        fields: 字段名到一维数组的映射，所有数组长度相同，time 为 int64 时间键
+    """
+
+    __slots__ = ('code', 'fields', '_length')
+
+    def __init__(self, code: str, fields: Dict[str, np.ndarray]):
+        """初始化视图
+
+        Args:
+            code: 股票代码
+            fields: 字段名到一维数组的映射
+        """
+        self.code = code
+        self.fields = fields
+        self._length = len(next(iter(fields.values()))) if fields else 0
+
+    @classmethod
+    def from_dict(cls, code: str, stock_data: Any, fields: Optional[Sequence[str]] = None) -> 'BarView':
+        """从字段到序列的映射（或 xtdata 返回的 DataFrame）创建视图
+
+        Args:
+            code: 股票代码
+            stock_data: 字段到序列的映射
+            fields: 需要的字段，默认全部
+
+        Returns:
+            BarView: K线视图
+        """
+        names = fields if fields is not None else list(stock_data.keys())
+        return cls(code, {name: np.asarray(stock_data[name]) for name in names if name in stock_data})
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise AttributeError(f"K线视图没有字段: {name}") from None
+
+    def __getitem__(self, key: Any) -> Any:
+        """按字段名取数组，按整数取单根K线（支持负下标），按切片取子视图"""
+        if isinstance(key, str):
+            return self.fields[key]
+        if isinstance(key, slice):
+            return BarView(self.code, {name: values[key] for name, values in self.fields.items()})
+        index = int(key)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"K线下标越界: {key}, 长度: {self._length}")
+        return Bar(self.fields, index)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    def __iter__(self) -> Iterator[Bar]:
+        for index in range(self._length):
+            yield Bar(self.fields, index)
+
+    @property
+    def names(self) -> List[str]:
+        """字段名列表"""
+        return list(self.fields)
+
+    @property
+    def empty(self) -> bool:
+        """是否没有K线"""
+        return self._length == 0
+
+    def value(self, name: str, index: int = -1, default: float = np.nan) -> Any:
+        """读取某根K线的字段值，K线不足或字段不存在时返回默认值
+
+        Args:
+            name: 字段名
+            index: K线下标，-1 为最新一根
+            default: 默认值
+
+        Returns:
+            Any: 字段值
+        """
+        values = self.fields.get(name)
+        if values is None or not -self._length <= index < self._length:
+            return default
+        return values[index]
+
+    def tail(self, n: int) -> 'BarView':
+        """最近 n 根K线的子视图（不复制数据）"""
+        return self[max(self._length - n, 0):]
+
+    def date_codes(self) -> np.ndarray:
+        """每根K线的日期编码（YYYYMMDD）"""
+        return to_date_codes(self.fields['time'])
+
+    def add(self, name: str, values: np.ndarray) -> None:
+        """增加派生字段，长度必须与现有字段一致"""
+        values = np.asarray(values)
+        if self.fields and len(values) != self._length:
+            raise ValueError(f"字段长度不一致 - {name}: {len(values)}, 期望: {self._length}")
+        self.fields[name] = values
+        self._length = len(values)
+
+    def to_frame(self) -> Any:
+        """转换为以时间为索引的 DataFrame，用于调试或兼容旧代码（不在热路径使用）"""
+        import pandas as pd
+        from data.panel import to_datetime64
+        columns = {name: values for name, values in self.fields.items() if name != 'time'}
+        index = pd.DatetimeIndex(to_datetime64(self.fields['time']), name='datetime') if 'time' in self.fields else None
+        return pd.DataFrame(columns, index=index)
+
+    def __repr__(self) -> str:
+        return f"BarView({self.code}, {self._length} bars, fields={self.names})"
+
+
+class BarSet:
+    """标的池的K线视图集合，按股票代码访问 BarView"""
+
+    def __init__(self, views: Dict[str, BarView]):
+        """初始化集合
+
+        Args:
+            views: 股票代码到K线视图的映射
+        """
+        self.views = views
+
+    def __getitem__(self, code: str) -> BarView:
+        return self.views[code]
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.views
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.views)
+
+    def __len__(self) -> int:
+        return len(self.views)
+
+    def get(self, code: str) -> Optional[BarView]:
+        """获取股票的K线视图，不存在时返回None"""
+        return self.views.get(code)
+
+    def items(self):
+        return self.views.items()
+
+    @property
+    def codes(self) -> List[str]:
+        """股票代码列表"""
+        return list(self.views)
+
+    def latest(self, name: str, lag: int = 0, codes: Optional[Sequence[str]] = None) -> np.ndarray:
+        """每只股票倒数第 lag+1 根K线的字段值
+
+        Args:
+            name: 字段名
+            lag: 0 表示最新一根，1 表示前一根
+            codes: 股票代码，默认集合中的全部股票
+
+        Returns:
+            np.ndarray: 每只股票一个值，K线不足或股票不存在时为 NaN
+        """
+        codes = self.codes if codes is None else codes
+        result = np.full(len(codes), np.nan)
+        for i, code in enumerate(codes):
+            view = self.views.get(code)
+            if view is not None:
+                result[i] = view.value(name, -1 - lag)
+        return result
+
+    def last_time(self) -> Optional[int]:
+        """所有股票中最新一根K线的时间键"""
+        times = [view.fields['time'][-1] for view in self.views.values() if len(view) and 'time' in view]
+        return int(max(times)) if times else None
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""每日增量更新模块
+
+此模块负责收盘后的增量数据更新，包括：
+1. 按清单中的最后日期只获取新K线并追加到逐股票存储
+2. 只在新K线加预热区间上重新计算技术指标
+3. 更新清单中的最后更新日期
+
+每晚的更新耗时与一天的数据量成正比，而不是与历史长度成正比。
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from loguru import logger
+
+from data.bar_store import BarStore
+from data.data_fetcher import DataFetcher
+from data.data_processor import DataProcessor
+
+
+class DailyUpdater:
+    """每日增量更新器"""
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        data_fetcher: Optional[DataFetcher] = None,
+        data_processor: Optional[DataProcessor] = None
+    ):
+        """初始化更新器
+
+        Args:
+            config: 配置参数字典，读取 data.update 段
+            data_fetcher: 数据获取器，默认新建
+            data_processor: 数据处理器，默认新建
+        """
+        self.config = config
+        update_config = config['data'].get('update') or {}
+        self.period = update_config.get('period', '1d')
+        self.batch_size = update_config.get('batch_size', 200)
+
+        self.data_fetcher = data_fetcher or DataFetcher(config)
+        self.data_processor = data_processor or DataProcessor(config)
+
+        store_dir = update_config.get('store_dir') or os.path.join(
+            config.get('data_dir', 'data'), 'store', self.period)
+        self.bar_store = BarStore(store_dir, self.data_processor.compact)
+
+    def run(self, codes: Optional[List[str]] = None) -> Dict[str, int]:
+        """执行增量更新
+
+        Args:
+            codes: 股票代码列表，默认使用交易标的池
+
+        Returns:
+            Dict[str, int]: 每只股票新增的K线数
+        """
+        codes = list(codes or self.data_fetcher.universe)
+        updated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        summary = {}
+
+        # 按最后日期分组，同一起始日期的股票批量获取
+        groups = defaultdict(list)
+        for code in codes:
+            groups[self.bar_store.last_date(code)].append(code)
+
+        try:
+            for last_date, group in groups.items():
+                start_time = str(last_date) if last_date else ''
+                for i in range(0, len(group), self.batch_size):
+                    batch = group[i:i + self.batch_size]
+                    data = self.data_fetcher.get_bars_since(batch, start_time, self.period)
+                    for code in batch:
+                        summary[code] = self._update_code(code, data.get(code), updated)
+        finally:
+            self.bar_store.flush_manifest()
+            self.data_processor.flush_cache()
+
+        total = sum(summary.values())
+        logger.info(f"增量更新完成 - 股票数: {len(codes)}, 新增K线: {total}, "
+                    f"有更新的股票: {sum(1 for n in summary.values() if n)}")
+        return summary
+
+    def _update_code(self, code: str, stock_data: Any, updated: str) -> int:
+        """更新单只股票
+
+        Args:
+            code: 股票代码
+            stock_data: 新获取的K线数据
+            updated: 更新时间
+
+        Returns:
+            int: 写入的K线数（含改写的最后一根）
+        """
+        try:
+            if stock_data is None or len(stock_data) == 0:
+                logger.warning(f"增量数据为空 - 代码: {code}")
+                return 0
+
+            previous_time = self.bar_store.last_time(code)
+            appended = self.bar_store.append(code, stock_data, updated)
+
+            # 处理结果落后于K线存储（如上次处理失败）时，补算全部未处理的K线
+            processed_time = self.data_processor.store.last_time(code)
+            if processed_time is None or previous_time is None or processed_time < previous_time:
+                tail = None
+            elif appended:
+                tail = appended + self.data_processor.get_warmup_length()
+            else:
+                return 0
+
+            bars = self.bar_store.read_dict(code, tail)
+            self.data_processor.update_cache({code: bars}, flush=False)
+            return appended
+
+        except Exception as e:
+            logger.error(f"增量更新失败 - 代码: {code}, 错误: {str(e)}")
+            return 0
@@ -15,38 +15,23 @@ import pickle
 import functools
 from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
 from loguru import logger
 
 from xtquant import xtdata
 from xtquant.xttype import StockAccount
 
-def retry(max_attempts: int = 3, delay: float = 1.0):
-    """重试装饰器
-
-    Args:
-        max_attempts: 最大尝试次数
-        delay: 重试延迟时间（秒）
-
-    Returns:
-        Callable: 装饰后的函数
-    """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            attempts = 0
-            while attempts < max_attempts:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    if attempts == max_attempts:
-                        logger.error(f"函数 {func.__name__} 执行失败，已重试 {attempts} 次: {str(e)}")
-                        raise
-                    logger.warning(f"函数 {func.__name__} 执行失败，正在重试 ({attempts}/{max_attempts}): {str(e)}")
-                    time.sleep(delay * attempts)  # 指数退避
-        return wrapper
-    return decorator
-
+from data.data_quality import DataQualityScanner, QualityReport, QUALITY_MISSING_FIELD
+from data.dtypes import CompactSchema
+from data.ring_buffer import RingBuffer, record_dtype
+from data.market_bus import MarketBus
+from data.bar_aggregator import TimeframeCache
+from data.reference_data import ReferenceDataStore
+from data.panel import to_date_codes
+from data.data_processor import config_history_length, live_vwap_spec
+from utils.indicator_graph import parse_spec
+from utils.xt_session import get_session
 
 def cache_data(cache_dir: str, expire_seconds: int = 86400):
     """数据缓存装饰器
@@ -98,15 +83,19 @@ def cache_data(cache_dir: str, expire_seconds: int = 86400):
 class DataFetcher:
     """数据获取类"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], history_length: Optional[int] = None):
         """初始化数据获取器
 
         Args:
             config: 配置参数字典
+            history_length: 历史K线数（策略按指标和查看的K线数推断），默认使用 data.history_length
         """
         self.config = config
         self.universe = config['data']['universe']
-        self.history_length = config['data']['history_length']
+        # 未指定且 data.history_length 为 0 时按配置的指标推断
+        self.history_length = history_length or config['data']['history_length']
+        if not self.history_length:
+            self.history_length = config_history_length(config)
         
         # 缓存设置
         self.data_dir = config.get('data_dir', 'data')
@@ -114,21 +103,73 @@ class DataFetcher:
         self.cache_expire = config.get('cache_expire', 86400)  # 默认缓存1天
         os.makedirs(self.cache_dir, exist_ok=True)
         
+        # 数据质量检查
+        self.quality_scanner = DataQualityScanner(config)
+        
+        # 紧凑数据类型（float32价格、int32成交量和时间键）
+        self.compact = CompactSchema.from_config(config)
+        
+        # xtdata 调用会话（限流、熔断、截止时间重试）
+        self.session = get_session('xtdata', config)
+        
+        # 实时行情环形缓冲区，由订阅回调写入
+        # 行情来源 data.feed.mode：local 本进程订阅；publish 作为行情进程写入共享内存总线；
+        # bus 映射行情进程的总线，不再自行下载和订阅
+        ring_config = config['data'].get('ring_buffer') or {}
+        feed_config = config['data'].get('feed') or {}
+        self.quote_period = ring_config.get('period', '1d')
+        self.feed_mode = feed_config.get('mode', 'local')
+        self.ring_buffer = None
+        self.market_bus = None
+        if self.feed_mode == 'bus':
+            self.market_bus = MarketBus.attach(feed_config.get('name', 'qmt_market'),
+                                               feed_config.get('attach_timeout', 30))
+            self.ring_buffer = self.market_bus.ring
+        elif self.universe and (ring_config.get('enabled', True) or self.feed_mode == 'publish'):
+            capacity = ring_config.get('capacity') or self.history_length
+            # 配置了按交易日锚定或滚动窗口的 VWAP 时，K线推送同时增量更新 VWAP
+            vwap_spec = live_vwap_spec(config) if self.quote_period != 'tick' else None
+            vwap_period = parse_spec(vwap_spec)[1][0] if vwap_spec and vwap_spec != 'session_vwap' else None
+            dtype = record_dtype(self.quote_period, self.compact, vwap=vwap_spec is not None)
+            if self.feed_mode == 'publish':
+                self.market_bus = MarketBus.create(feed_config.get('name', 'qmt_market'),
+                                                   self.universe, capacity, dtype, vwap_period)
+                self.ring_buffer = self.market_bus.ring
+            else:
+                self.ring_buffer = RingBuffer(self.universe, capacity, dtype, vwap_period=vwap_period)
+        
+        # 多周期K线缓存：基础周期数据每只股票获取一次，各周期由本地聚合得到
+        timeframe_config = config['data'].get('timeframes') or {}
+        self.base_period = timeframe_config.get('base_period', '1m')
+        self.base_count = timeframe_config.get('base_count', -1)
+        self.timeframes = TimeframeCache(timeframe_config.get('max_base_rows', 0))
+        
+        # 股本、上市日期和ST历史的本地参考数据，用于按时点计算换手率和市值
+        self.reference = ReferenceDataStore(os.path.join(self.data_dir, 'reference'))
+        
         # 初始化数据连接
         self._init_connection()
         
-    @retry(max_attempts=3, delay=2.0)
     def _init_connection(self) -> None:
         """初始化与行情服务器的连接"""
+        if self.feed_mode == 'bus':
+            logger.info("使用共享行情总线，跳过历史数据下载和行情订阅")
+            return
         try:
             # 下载本地历史数据
             for code in self.universe:
-                xtdata.download_history_data(code, period='1d', incrementally=True)
+                self.session.call('download_history_data', xtdata.download_history_data,
+                                  code, period='1d', incrementally=True)
             logger.info("历史数据下载完成")
             
-            # 订阅实时行情
+            # 用历史数据预热环形缓冲区后订阅实时行情，推送直接写入缓冲区
+            callback = None
+            if self.ring_buffer is not None:
+                self._seed_ring_buffer()
+                callback = self.ring_buffer.on_quote
             for code in self.universe:
-                xtdata.subscribe_quote(code, period='1d')
+                self.session.call('subscribe_quote', xtdata.subscribe_quote, code,
+                                  period=self.quote_period, callback=callback)
             time.sleep(1)  # 等待订阅完成
             logger.info("实时行情订阅完成")
             
@@ -139,6 +180,58 @@ class DataFetcher:
             logger.error(f"数据连接初始化失败: {str(e)}")
             raise
     
+    def _seed_ring_buffer(self) -> None:
+        """用最近的历史数据预热环形缓冲区"""
+        try:
+            data = self.session.call(
+                'get_market_data_ex',
+                xtdata.get_market_data_ex,
+                field_list=[],
+                stock_list=self.universe,
+                period=self.quote_period,
+                count=self.ring_buffer.capacity
+            )
+            for code, stock_data in (data or {}).items():
+                self.ring_buffer.extend(code, stock_data)
+            logger.info(f"行情缓冲区预热完成 - 股票数: {len(self.ring_buffer.ready_codes())}")
+        except Exception as e:
+            logger.warning(f"行情缓冲区预热失败，仅使用实时推送: {str(e)}")
+    
+    def run_feed(self) -> None:
+        """作为行情进程运行：保持订阅并把推送写入共享内存总线，直到进程退出"""
+        if self.market_bus is None or not self.market_bus.owner:
+            raise RuntimeError("行情进程需要 data.feed.mode = publish")
+        try:
+            logger.info(f"行情进程运行中 - 总线: {self.market_bus.name}, 股票数: {len(self.universe)}")
+            xtdata.run()
+        finally:
+            self.market_bus.close()
+    
+    def get_window_data(self, codes: Optional[List[str]] = None, n: Optional[int] = None,
+                        consistent: bool = True) -> Dict[str, Dict[str, Any]]:
+        """从环形缓冲区获取最近N条记录，不访问行情服务器
+
+        Args:
+            codes: 股票代码列表，默认交易标的池
+            n: 记录数，默认全部已有记录
+            consistent: 是否按 seqlock 读取一致的副本（默认）；为False时返回缓冲区的零拷贝视图，
+                其中最后一条会被时间相同的推送原地改写
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 多股票数据字典，没有数据的股票被省略
+        """
+        ring = self.ring_buffer
+        if ring is None:
+            return {}
+        data = {}
+        for code in codes or self.universe:
+            row = ring.code_index.get(code)
+            if row is None or ring.counts[row] == 0:
+                continue
+            window = ring.snapshot(code, n) if consistent else ring.window(code, n)
+            data[code] = {name: window[name] for name in ring.dtype.names}
+        return data
+    
     def _check_connection_status(self) -> bool:
         """检查连接状态
 
@@ -148,7 +241,9 @@ class DataFetcher:
         try:
             # 简单测试API是否可用
             test_code = self.universe[0] if self.universe else "000001.SZ"
-            test_data = xtdata.get_market_data_ex(
+            test_data = self.session.call(
+                'get_market_data_ex',
+                xtdata.get_market_data_ex,
                 field_list=["close"],
                 stock_list=[test_code],
                 period='1d',
@@ -159,7 +254,6 @@ class DataFetcher:
             logger.error(f"连接状态检查失败: {str(e)}")
             return False
     
-    @retry(max_attempts=3, delay=1.0)
     @cache_data(cache_dir=os.path.join(os.getcwd(), 'data', 'cache', 'history'))
     def get_history_data(self, code: str, period: str = '1d', count: int = -1) -> Dict[str, Any]:
         """获取历史K线数据
@@ -174,22 +268,23 @@ class DataFetcher:
         """
         try:
             logger.debug(f"获取历史数据 - 代码: {code}, 周期: {period}, 条数: {count}")
-            data = xtdata.get_market_data_ex(
+            data = self.session.call(
+                'get_market_data_ex',
+                xtdata.get_market_data_ex,
                 field_list=[],
                 stock_list=[code],
                 period=period,
                 count=count
             )
-            if not data or not data.get(code):
+            if not data or code not in data or len(data[code]) == 0:
                 logger.warning(f"获取历史数据为空 - 代码: {code}")
                 return {}
                 
-            return data
+            return self.compact.convert(data)
         except Exception as e:
             logger.error(f"获取历史数据失败 - 代码: {code}, 错误: {str(e)}")
             return {}
     
-    @retry(max_attempts=3, delay=0.5)
     def get_realtime_data(self, code: str) -> Dict[str, Any]:
         """获取实时行情数据
 
@@ -201,22 +296,23 @@ class DataFetcher:
         """
         try:
             logger.debug(f"获取实时行情 - 代码: {code}")
-            data = xtdata.get_market_data_ex(
+            data = self.session.call(
+                'get_market_data_ex',
+                xtdata.get_market_data_ex,
                 field_list=[],
                 stock_list=[code],
                 period='1d',
                 count=1
             )
-            if not data or not data.get(code):
+            if not data or code not in data or len(data[code]) == 0:
                 logger.warning(f"获取实时行情为空 - 代码: {code}")
                 return {}
                 
-            return data
+            return self.compact.convert(data)
         except Exception as e:
             logger.error(f"获取实时行情失败 - 代码: {code}, 错误: {str(e)}")
             return {}
     
-    @retry(max_attempts=3, delay=1.0)
     @cache_data(cache_dir=os.path.join(os.getcwd(), 'data', 'cache', 'calendar'))
     def get_trading_dates(self, start_date: str, end_date: str) -> List[str]:
         """获取交易日历
@@ -239,7 +335,7 @@ class DataFetcher:
             print(start,end)
             
             # 获取交易日历
-            dates = xtdata.get_trading_dates("SH", start, end)
+            dates = self.session.call('get_trading_dates', xtdata.get_trading_dates, "SH", start, end)
             
             # 转换为字符串格式
             # date_strs = [date.strftime("%Y%m%d") for date in dates]
@@ -253,7 +349,6 @@ class DataFetcher:
             logger.error(f"获取交易日历失败: {str(e)}")
             return []
     
-    @retry(max_attempts=3, delay=2.0)
     @cache_data(cache_dir=os.path.join(os.getcwd(), 'data', 'cache', 'batch'))
     def get_batch_history_data(self, codes: List[str], period: str = '1d', count: int = -1) -> Dict[str, Dict[str, Any]]:
         """批量获取历史K线数据
@@ -268,7 +363,9 @@ class DataFetcher:
         """
         try:
             logger.debug(f"批量获取历史数据 - 代码数量: {len(codes)}, 周期: {period}, 条数: {count}")
-            data = xtdata.get_market_data_ex(
+            data = self.session.call(
+                'get_market_data_ex',
+                xtdata.get_market_data_ex,
                 field_list=[],
                 stock_list=codes,
                 period=period,
@@ -280,14 +377,94 @@ class DataFetcher:
             if missing_codes:
                 logger.warning(f"部分股票数据获取失败: {missing_codes}")
                 
-            return data
+            return self.compact.convert(data)
         except Exception as e:
             logger.error(f"批量获取历史数据失败: {str(e)}")
             return {}
-    
+
+    def get_bars_since(self, codes: List[str], start_time: str = '', period: str = '1d') -> Dict[str, Dict[str, Any]]:
+        """增量下载并获取指定日期（含）之后的K线，不经过整体缓存
+
+        Args:
+            codes: 股票代码列表
+            start_time: 起始日期 YYYYMMDD，为空表示全部历史
+            period: 周期，默认日线
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 多股票K线数据字典
+        """
+        try:
+            logger.debug(f"增量获取数据 - 代码数量: {len(codes)}, 起始: {start_time or '全部'}, 周期: {period}")
+            for code in codes:
+                self.session.call('download_history_data', xtdata.download_history_data,
+                                  code, period=period, start_time=start_time, incrementally=True)
+            data = self.session.call(
+                'get_market_data_ex',
+                xtdata.get_market_data_ex,
+                field_list=[],
+                stock_list=codes,
+                period=period,
+                start_time=start_time,
+                count=-1
+            )
+            return self.compact.convert(data)
+        except Exception as e:
+            logger.error(f"增量获取数据失败: {str(e)}")
+            return {}
+
+    def get_timeframe_bars(self, codes: List[str], timeframes: List[str], count: Optional[int] = None,
+                           refresh: bool = True) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """获取多个周期的K线，所有周期共用一份基础周期数据
+
+        首次请求的股票一次性获取基础周期（data.timeframes.base_period，默认1分钟）历史；
+        之后刷新时，基础周期与行情缓冲区周期相同则直接读取缓冲区，否则从最后一条所在日期起增量获取。
+        各周期只重算最后一个未完成的周期，不再单独调用 xtdata。
+
+        Args:
+            codes: 股票代码列表
+            timeframes: 周期名称列表，如 ['5m', '30m', '1d']
+            count: 每个周期只返回最后若干根，默认全部
+            refresh: 是否先追加最新的基础周期数据
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, Any]]]: 周期到多股票数据字典的映射
+        """
+        try:
+            missing = [code for code in codes if self.timeframes.last_time(code) is None]
+            if missing:
+                data = self.session.call(
+                    'get_market_data_ex',
+                    xtdata.get_market_data_ex,
+                    field_list=[],
+                    stock_list=missing,
+                    period=self.base_period,
+                    count=self.base_count
+                )
+                for code, stock_data in (data or {}).items():
+                    self.timeframes.set_base(code, stock_data)
+                logger.debug(f"多周期基础数据获取完成 - 周期: {self.base_period}, 股票数: {len(data or {})}")
+
+            cached = [code for code in codes if code not in missing]
+            if refresh and cached:
+                if self.ring_buffer is not None and self.quote_period == self.base_period:
+                    data = self.get_window_data(cached)
+                else:
+                    last_times = [self.timeframes.last_time(code) for code in cached]
+                    start_time = str(int(to_date_codes([min(last_times)])[0]))
+                    data = self.get_bars_since(cached, start_time, self.base_period)
+                for code, stock_data in data.items():
+                    self.timeframes.append_base(code, stock_data)
+
+            return self.timeframes.get_many(codes, timeframes, count)
+        except Exception as e:
+            logger.error(f"获取多周期K线失败: {str(e)}")
+            return {}
+
     def validate_data(self, data: Dict[str, Any], code: str) -> bool:
         """验证数据有效性
 
+        单只股票的字段检查，批量数据请使用 scan_quality / clean_data。
+
         Args:
             data: 数据字典
             code: 股票代码
@@ -298,17 +475,42 @@ class DataFetcher:
         if not data or code not in data:
             return False
             
-        stock_data = data[code]
-        required_fields = ['time', 'open', 'high', 'low', 'close', 'volume']
-        
-        # 检查必要字段是否存在且非空
-        for field in required_fields:
-            if field not in stock_data or len(stock_data[field]) == 0:
-                logger.warning(f"数据验证失败 - 代码: {code}, 缺少字段: {field}")
-                return False
+        report = self.quality_scanner.scan({code: data[code]})
+        if report.symbol_flags[0] & QUALITY_MISSING_FIELD:
+            logger.warning(f"数据验证失败 - 代码: {code}, 缺少字段: {report.panel.missing_fields.get(code)}")
+            return False
         
         return True
     
+    def scan_quality(self, data: Dict[str, Any], calendar: Optional[List[Any]] = None) -> QualityReport:
+        """对多只股票的数据做一次性质量检查
+
+        Args:
+            data: 多股票K线数据字典
+            calendar: 交易日历，提供时检查缺口
+
+        Returns:
+            QualityReport: 质量位图及统计
+        """
+        return self.quality_scanner.scan(data, calendar)
+    
+    def clean_data(self, data: Dict[str, Any], calendar: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """检查并清理多只股票的数据
+
+        最新K线不可用的股票被跳过，历史中的坏行和重复行被删除。
+
+        Args:
+            data: 多股票K线数据字典
+            calendar: 交易日历，提供时检查缺口
+
+        Returns:
+            Dict[str, Any]: 清理后的数据字典
+        """
+        if not data:
+            return data
+        report = self.quality_scanner.scan(data, calendar)
+        return self.quality_scanner.clean(data, report)
+    
     def get_stock_list(self) -> List[str]:
         """获取股票列表
 
@@ -317,7 +519,7 @@ class DataFetcher:
         """
         try:
             # 获取沪深A股列表
-            sh_list = xtdata.get_stock_list_in_sector('沪深A股')
+            sh_list = self.session.call('get_stock_list_in_sector', xtdata.get_stock_list_in_sector, '沪深A股')
             return sh_list
         except Exception as e:
             logger.error(f"获取股票列表失败: {str(e)}")
@@ -333,12 +535,143 @@ class DataFetcher:
             Dict[str, Any]: 股票信息字典
         """
         try:
-            info = xtdata.get_instrument_detail(code)
+            info = self.session.call('get_instrument_detail', xtdata.get_instrument_detail, code)
             return info
         except Exception as e:
             logger.error(f"获取股票信息失败 - 代码: {code}, 错误: {str(e)}")
             return {}
-    
+
+    def get_sector_membership(self, codes: Optional[List[str]] = None,
+                              prefix: Optional[str] = None) -> Dict[str, str]:
+        """获取股票所属行业，用于横截面行业中性化
+
+        行业来自 xtdata 板块列表中名称以 prefix 开头的板块（如申万一级 "SW1"），
+        一只股票属于多个板块时取第一个。
+
+        Args:
+            codes: 股票代码列表，默认交易标的池
+            prefix: 行业板块名称前缀，默认 data.sector.prefix
+
+        Returns:
+            Dict[str, str]: 股票代码到行业名称的映射（去掉前缀），不属于任何行业的股票不在其中
+        """
+        sector_config = self.config['data'].get('sector') or {}
+        prefix = prefix if prefix is not None else sector_config.get('prefix', 'SW1')
+        codes = set(codes if codes is not None else self.universe)
+        membership = {}
+        try:
+            if sector_config.get('download', True):
+                self.session.call('download_sector_data', xtdata.download_sector_data)
+            sectors = self.session.call('get_sector_list', xtdata.get_sector_list) or []
+            for sector in sorted(s for s in sectors if s.startswith(prefix)):
+                stocks = self.session.call('get_stock_list_in_sector', xtdata.get_stock_list_in_sector, sector) or []
+                name = sector[len(prefix):] or sector
+                for code in stocks:
+                    if code in codes and code not in membership:
+                        membership[code] = name
+            logger.info(f"获取行业分类完成 - 行业数: {len(set(membership.values()))}, "
+                        f"股票数: {len(membership)}/{len(codes)}")
+        except Exception as e:
+            logger.error(f"获取行业分类失败: {str(e)}")
+        return membership
+
+    def get_float_shares(self, codes: Optional[List[str]] = None) -> Dict[str, float]:
+        """获取流通股本，与收盘价相乘得到流通市值，用于市值加权和市值中性化
+
+        Args:
+            codes: 股票代码列表，默认交易标的池
+
+        Returns:
+            Dict[str, float]: 股票代码到流通股本的映射，获取失败的股票不在其中
+        """
+        shares = {}
+        for code in (codes if codes is not None else self.universe):
+            info = self.get_stock_info(code) or {}
+            volume = info.get('FloatVolume')
+            if volume:
+                shares[code] = float(volume)
+        return shares
+
+    def get_reference_data(self, codes: Optional[List[str]] = None, refresh: bool = False) -> ReferenceDataStore:
+        """获取股本变动、上市日期和ST历史并写入本地参考数据存储
+
+        只获取没有参考数据或超过 data.reference.max_age_days 天未更新的股票。
+        股本变动以公告日和变动日中较晚的一天为生效日期，保证回测时不会提前使用未公告的股本。
+
+        Args:
+            codes: 股票代码列表，默认交易标的池
+            refresh: 是否忽略更新日期全部重新获取
+
+        Returns:
+            ReferenceDataStore: 参考数据存储
+        """
+        codes = list(codes if codes is not None else self.universe)
+        reference_config = self.config['data'].get('reference') or {}
+        stale = codes if refresh else self.reference.stale_codes(codes, reference_config.get('max_age_days', 7))
+        if not stale:
+            return self.reference
+
+        financial = {}
+        try:
+            self.session.call('download_financial_data', xtdata.download_financial_data, stale, table_list=['Capital'])
+            financial = self.session.call('get_financial_data', xtdata.get_financial_data, stale,
+                                          table_list=['Capital']) or {}
+        except Exception as e:
+            logger.warning(f"获取股本变动失败，使用合约信息中的当前股本: {str(e)}")
+
+        today = int(datetime.now().strftime('%Y%m%d'))
+        for code in stale:
+            try:
+                info = self.get_stock_info(code) or {}
+                list_date = int(info.get('OpenDate') or 0) or None
+                capital = self._parse_capital((financial.get(code) or {}).get('Capital'))
+                if capital is None and info.get('FloatVolume'):
+                    # 没有变动历史时只能把当前股本视为自上市起生效
+                    capital = {'date': [list_date or 19900101],
+                               'float_shares': [float(info['FloatVolume'])],
+                               'total_shares': [float(info.get('TotalVolume') or np.nan)]}
+                self.reference.update(code, capital=capital, list_date=list_date,
+                                      st_periods=self._get_st_periods(code, info, today))
+            except Exception as e:
+                logger.error(f"获取参考数据失败 - 代码: {code}, 错误: {str(e)}")
+        self.reference.flush()
+        logger.info(f"参考数据更新完成 - 股票数: {len(stale)}")
+        return self.reference
+
+    @staticmethod
+    def _parse_capital(table: Any) -> Optional[Dict[str, List[Any]]]:
+        """把 xtdata 股本表转换为股本变动记录
+
+        公告日缺失时按变动日生效，变动日缺失或无法解析的记录被丢弃。
+
+        Args:
+            table: Capital 表（DataFrame），含 m_timetag（变动日）、m_anntime（公告日）、
+                   circulating_capital（流通股本）和 total_capital（总股本）
+
+        Returns:
+            Optional[Dict[str, List[Any]]]: 股本变动，没有记录时返回None
+        """
+        if table is None or len(table) == 0 or 'm_timetag' not in table:
+            return None
+        to_codes = lambda values: pd.to_numeric(pd.Series(values).astype(str).str[:8], errors='coerce').values
+        dates = to_codes(table['m_timetag'])
+        valid = ~np.isnan(dates)
+        if 'm_anntime' in table:
+            dates = np.fmax(dates, to_codes(table['m_anntime']))
+        if not valid.any():
+            return None
+        return {'date': dates[valid].astype(np.int64),
+                'float_shares': np.asarray(table['circulating_capital'], dtype=np.float64)[valid],
+                'total_shares': np.asarray(table['total_capital'], dtype=np.float64)[valid]}
+
+    def _get_st_periods(self, code: str, info: Dict[str, Any], today: int) -> List[List[int]]:
+        """获取ST区间，xtdata 不支持历史ST数据时按当前名称从今天开始计"""
+        get_his_st_data = getattr(xtdata, 'get_his_st_data', None)
+        if get_his_st_data is not None:
+            history = self.session.call('get_his_st_data', get_his_st_data, code) or {}
+            return [[int(start), int(end)] for periods in history.values() for start, end in periods]
+        return [[today, 0]] if 'ST' in str(info.get('InstrumentName', '')) else []
+
     def is_trading_time(self) -> bool:
         """判断当前是否为交易时段
 
@@ -12,66 +12,227 @@
 import numpy as np
 import pandas as pd
 import os
-import pickle
 from functools import lru_cache
-from typing import Dict, List, Any, Optional, Tuple, Union, Callable
+from typing import Dict, List, Any, Optional, Tuple, Union, Callable, Sequence
 from loguru import logger
 
-from utils.indicators import (
-    calculate_ma,
-    calculate_rsi,
-    calculate_macd,
-    calculate_bollinger_bands,
-    calculate_vwap
+from data.bar_store import BarStore
+from data.bar_view import BarView, BarSet
+from data.feature_store import FeatureStore
+from data.dtypes import CompactSchema, to_compact_time_keys
+from data.panel import BarPanel, BAR_FIELDS, bars_per_session, to_datetime64, to_time_keys, to_date_codes
+from data.ring_buffer import VWAP_FIELD
+from utils.memoize import memoize
+from utils.indicator_graph import (
+    IndicatorGraph, SOURCE_FIELDS, evaluate_indicators, estimate_lookback, parse_spec, normalize_spec
 )
+from utils.parallel import ParallelExecutor
+
+
+# 配置未指定参数时各指标的默认参数
+DEFAULT_INDICATOR_PARAMS = {
+    'MA': {'periods': [5, 10, 20, 60]},
+    'RSI': {'period': 14},
+    'MACD': {'fast_period': 12, 'slow_period': 26, 'signal_period': 9},
+    'BOLL': {'period': 20, 'std_dev': 2},
+    'VWAP': {'period': 14, 'anchor': 'rolling'}
+}
+
+
+def indicator_params(config: Dict[str, Any], indicator: str) -> Dict[str, Any]:
+    """获取指标参数，配置的参数覆盖默认参数
 
-def memoize_dataframe(func: Callable) -> Callable:
-    """DataFrame结果缓存装饰器
-    
     Args:
-        func: 需要缓存结果的函数
-        
+        config: 配置参数字典
+        indicator: 指标名称
+
     Returns:
-        Callable: 包装后的函数
+        Dict[str, Any]: 指标参数
     """
-    cache = {}
-    
-    def wrapper(*args, **kwargs):
-        # 创建缓存键
-        key = str(args) + str(kwargs)
-        
-        # 检查缓存
-        if key in cache:
-            logger.debug(f"使用缓存数据: {func.__name__}")
-            return cache[key].copy()
-            
-        # 计算结果
-        result = func(*args, **kwargs)
-        
-        # 缓存结果
-        if isinstance(result, pd.DataFrame) and not result.empty:
-            cache[key] = result.copy()
-            
-        return result
-        
-    return wrapper
+    indicator_config = config.get('indicators', {}).get(indicator, {})
+    return {**DEFAULT_INDICATOR_PARAMS.get(indicator, {}), **indicator_config}
+
+
+def configured_indicator_specs(config: Dict[str, Any]) -> Dict[str, str]:
+    """按配置的指标（data.indicators）生成结果列名到指标规格的映射
+
+    列名与原有命名（ma_20、macd_signal 等）一致。
+
+    Args:
+        config: 配置参数字典
+
+    Returns:
+        Dict[str, str]: 列名到指标规格的映射
+    """
+    specs = {}
+    for indicator in config['data']['indicators']:
+        params = indicator_params(config, indicator)
+        if indicator == 'MA':
+            for period in params['periods']:
+                specs[f'ma_{period}'] = f"ma({period})"
+        elif indicator == 'RSI':
+            specs['rsi'] = f"rsi({params['period']})"
+        elif indicator == 'MACD':
+            macd = f"macd({params['fast_period']},{params['slow_period']},{params['signal_period']})"
+            specs['macd'] = f"{macd}.macd"
+            specs['macd_signal'] = f"{macd}.signal"
+            specs['macd_hist'] = f"{macd}.hist"
+        elif indicator == 'BOLL':
+            boll = f"boll({params['period']},{params['std_dev']})"
+            specs['boll_upper'] = f"{boll}.upper"
+            specs['boll_middle'] = f"{boll}.middle"
+            specs['boll_lower'] = f"{boll}.lower"
+        elif indicator == 'VWAP':
+            # anchor: rolling 为最近 period 根K线，session 为每个交易日重新累计，cumulative 为全历史累计
+            anchor = params.get('anchor', 'rolling')
+            if anchor == 'session':
+                specs['vwap'] = "session_vwap"
+            elif anchor == 'cumulative':
+                specs['vwap'] = "vwap(0)"
+            else:
+                specs['vwap'] = f"vwap({params['period']})"
+    return specs
+
+
+def live_vwap_spec(config: Dict[str, Any]) -> Optional[str]:
+    """获取实盘行情推送中增量计算的 VWAP 规格
+
+    data.indicators 含 VWAP 且 anchor 为 session 或 rolling 时，行情环形缓冲区随每条K线推送更新 VWAP
+    （写入记录的 vwap 字段），处理窗口数据时直接使用；cumulative 依赖全部历史，不在推送中计算。
+
+    Args:
+        config: 配置参数字典
+
+    Returns:
+        Optional[str]: 'session_vwap' 或 'vwap(N)'，不在推送中计算时返回None
+    """
+    spec = configured_indicator_specs(config).get('vwap')
+    return spec if spec and spec != 'vwap(0)' else None
+
+
+def config_lookback(config: Dict[str, Any], specs: Sequence[str]) -> Optional[int]:
+    """按配置的周期（data.update.period 或 data.ring_buffer.period）和容差（data.lookback.tolerance）
+    推断一组指标规格需要的预热K线数
+
+    Args:
+        config: 配置参数字典
+        specs: 指标规格，例如 ['ma(20)', 'macd(12,26,9)']
+
+    Returns:
+        Optional[int]: 预热K线数，有指标依赖全部历史时返回None
+    """
+    data_config = config.get('data') or {}
+    period = ((data_config.get('update') or {}).get('period')
+              or (data_config.get('ring_buffer') or {}).get('period') or '1d')
+    tolerance = (data_config.get('lookback') or {}).get('tolerance', 1e-3)
+    return estimate_lookback(specs, tolerance, bars_per_session(period))
+
+
+def config_warmup_length(config: Dict[str, Any], specs: Optional[Sequence[str]] = None) -> int:
+    """获取增量计算指标所需的预热K线数
+
+    按指标依赖关系推断：滚动窗口类为窗口长度减一，指数平滑类（EMA、MACD、RSI）为初始值权重
+    衰减到 data.lookback.tolerance 以下所需的K线数，叠加的指标预热相加。可通过 data.update.warmup 覆盖。
+
+    Args:
+        config: 配置参数字典
+        specs: 计算的指标规格，默认按配置的指标
+
+    Returns:
+        int: 预热K线数
+    """
+    data_config = config.get('data') or {}
+    configured = (data_config.get('update') or {}).get('warmup')
+    if configured:
+        return int(configured)
+
+    if specs is None:
+        specs = list(configured_indicator_specs(config).values())
+    # 涨跌幅需要前一根K线
+    warmup = config_lookback(config, list(specs) + ['returns(close)'])
+    if warmup is None:
+        # 从第一根K线起累计的指标依赖全部历史，按配置的历史长度预热
+        warmup = int(data_config.get('history_length') or
+                     (data_config.get('lookback') or {}).get('unbounded', 250))
+        logger.debug(f"指标依赖全部历史，预热K线数取 {warmup}")
+    return warmup
+
+
+def config_history_length(config: Dict[str, Any], window: int = 1,
+                          specs: Optional[Sequence[str]] = None) -> int:
+    """获取需要获取和缓存的历史K线数
+
+    data.history_length 为 0 时按指标预热加策略查看的最近K线数推断，恰好满足需要；
+    配置了固定长度但不足时给出警告。只读取配置，不创建存储。
+
+    Args:
+        config: 配置参数字典
+        window: 策略自身查看的最近K线数（不含指标预热）
+        specs: 计算的指标规格，默认按配置的指标
+
+    Returns:
+        int: 历史K线数
+    """
+    required = config_warmup_length(config, specs) + max(int(window), 1)
+    configured = int((config.get('data') or {}).get('history_length') or 0)
+    if not configured:
+        return required
+    if configured < required:
+        logger.warning(f"历史数据长度 {configured} 小于指标所需的 {required} 根K线，指标初始值可能不准确")
+    return configured
 
 
 class DataProcessor:
     """数据处理类"""
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], required_indicators: Optional[Sequence[str]] = None):
         """初始化数据处理器
 
         Args:
             config: 配置参数字典
+            required_indicators: 需要计算的指标规格（如 'ma(20)'），为空时按配置的指标计算
         """
         self.config = config
         self.indicators = config['data']['indicators']
+        self.required_indicators = []
+        
+        # 紧凑数据类型（float32价格和指标、int32时间键）
+        self.compact = CompactSchema.from_config(config)
         
-        # 创建缓存目录
+        # 清洗后的K线按股票只追加存储，指标按（股票, 特征, 参数, 数据版本）列式存储，
+        # 新K线只计算尾部（含预热区间）
         self.cache_dir = os.path.join(os.getcwd(), 'data', 'cache', 'processed')
-        os.makedirs(self.cache_dir, exist_ok=True)
+        self.store = BarStore(self.cache_dir, self.compact)
+        self.features = FeatureStore(os.path.join(os.getcwd(), 'data', 'cache', 'features'),
+                                     self.compact.price_dtype if self.compact.enabled else np.float64)
+        
+        # 按股票分片的并行计算（data.parallel）
+        self.executor = ParallelExecutor.from_config(config)
+        
+        if required_indicators:
+            self.set_required_indicators(required_indicators)
+
+    def set_required_indicators(self, specs: Sequence[str]) -> None:
+        """只计算指定的指标，结果列以指标规格命名
+        
+        Args:
+            specs: 指标规格列表，例如 ['ma(5)', 'ma(20)', 'rsi(14)']
+        """
+        for spec in specs:
+            parse_spec(spec)
+        self.required_indicators = list(dict.fromkeys(specs))
+    
+    def get_indicator_specs(self) -> Dict[str, str]:
+        """获取结果列名到指标规格的映射
+        
+        未指定需要的指标时，按配置的指标生成，列名与原有命名（ma_20、macd_signal 等）一致。
+        
+        Returns:
+            Dict[str, str]: 列名到指标规格的映射
+        """
+        if self.required_indicators:
+            return {spec: spec for spec in self.required_indicators}
+        return configured_indicator_specs(self.config)
 
     def get_cache_path(self, stock_code: str) -> str:
         """获取缓存文件路径
@@ -82,50 +243,271 @@ class DataProcessor:
         Returns:
             str: 缓存文件路径
         """
-        return os.path.join(self.cache_dir, f"{stock_code}.pkl")
+        return self.store.get_path(stock_code)
     
-    def save_to_cache(self, df: pd.DataFrame, stock_code: str) -> None:
-        """保存数据到缓存
+    def save_to_cache(self, df: pd.DataFrame, stock_code: str, flush: bool = True) -> None:
+        """把新行追加到缓存（已缓存的时间之前的行被忽略）
         
         Args:
             df: 数据框
             stock_code: 股票代码
+            flush: 是否立即写入清单，批量更新时可在结束后统一写入
         """
         try:
-            cache_path = self.get_cache_path(stock_code)
-            with open(cache_path, 'wb') as f:
-                pickle.dump(df, f)
-            logger.debug(f"数据已缓存: {stock_code}")
+            appended = self._append_bars(stock_code, df)
+            if flush:
+                self.store.flush_manifest()
+            logger.debug(f"数据已缓存: {stock_code}, 新增 {appended} 行")
         except Exception as e:
             logger.error(f"缓存数据失败 - 代码: {stock_code}, 错误: {str(e)}")
     
-    def load_from_cache(self, stock_code: str) -> Optional[pd.DataFrame]:
-        """从缓存加载数据
+    def _append_bars(self, stock_code: str, df: pd.DataFrame) -> int:
+        """把K线写入缓存，最后一根K线被改写时使其后的指标失效
+
+        Args:
+            stock_code: 股票代码
+            df: K线数据框
+
+        Returns:
+            int: 写入的K线数（含改写的最后一根）
+        """
+        rows_before = self.store.rows(stock_code)
+        written = self.store.append_frame(stock_code, df)
+        first_changed = self.store.rows(stock_code) - written
+        if written and first_changed < rows_before:
+            self.features.truncate(stock_code, first_changed)
+        return written
+    
+    def load_from_cache(self, stock_code: str, tail: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """从缓存加载K线和指标
         
         Args:
             stock_code: 股票代码
+            tail: 只加载最后若干行，默认全部
             
         Returns:
             Optional[pd.DataFrame]: 缓存的数据框，如果不存在则返回None
         """
         try:
-            cache_path = self.get_cache_path(stock_code)
-            if os.path.exists(cache_path):
-                with open(cache_path, 'rb') as f:
-                    df = pickle.load(f)
-                logger.debug(f"从缓存加载数据: {stock_code}")
-                return df
+            df = self.store.read_frame(stock_code, tail)
+            if df is None:
+                return None
+            
+            start = self.store.rows(stock_code) - len(df)
+            for column, spec in self.get_indicator_specs().items():
+                values = self.features.read(stock_code, column, normalize_spec(spec), start, start + len(df))
+                if values is not None and len(values) == len(df):
+                    df[column] = values
+            logger.debug(f"从缓存加载数据: {stock_code}")
+            return df
         except Exception as e:
             logger.error(f"加载缓存数据失败 - 代码: {stock_code}, 错误: {str(e)}")
         return None
     
-    @memoize_dataframe
+    @memoize(max_entries=256)
+    def _load_cached_frame(self, stock_code: str, rows: int, version: Optional[str], last: Optional[np.ndarray],
+                           specs: Tuple[Tuple[str, str], ...]) -> Optional[pd.DataFrame]:
+        """从缓存加载K线和指标，按存储状态缓存组装好的数据框
+        
+        行数、数据版本、最后一条记录和指标规格只用作缓存键：追加新K线、重写存储或改写最后一根K线后
+        键都会变化。返回的数据框可能是缓存对象本身，调用方不得修改。
+        
+        Args:
+            stock_code: 股票代码
+            rows: 存储的行数
+            version: 存储的数据版本
+            last: 存储的最后一条记录
+            specs: 列名到指标规格的映射项
+            
+        Returns:
+            Optional[pd.DataFrame]: 缓存的数据框，如果不存在则返回None
+        """
+        return self.load_from_cache(stock_code)
+    
+    def load_feature(self, stock_code: str, name: str, tail: Optional[int] = None) -> Optional[np.ndarray]:
+        """只读取一个指标，不加载K线和其他指标
+        
+        Args:
+            stock_code: 股票代码
+            name: 指标列名或指标规格（如 'ma_20'、'ma(20)'）
+            tail: 只读取最后若干行，默认全部
+            
+        Returns:
+            Optional[np.ndarray]: 指标值，未缓存时返回None
+        """
+        try:
+            specs = self.get_indicator_specs()
+            if name in specs:
+                column, params = name, normalize_spec(specs[name])
+            else:
+                # 按规格查找对应的指标列，例如 'ma(20)' 对应 'ma_20'
+                params = normalize_spec(name)
+                column = next((col for col, spec in specs.items() if normalize_spec(spec) == params), name)
+            version = self.store.data_version(stock_code)
+            rows = self.features.valid_rows(stock_code, column, params, version)
+            start = 0 if tail is None else max(rows - tail, 0)
+            return self.features.read(stock_code, column, params, start, rows)
+        except Exception as e:
+            logger.error(f"读取指标失败 - 代码: {stock_code}, 指标: {name}, 错误: {str(e)}")
+        return None
+    
+    def flush_cache(self) -> None:
+        """写入K线存储清单和特征元数据"""
+        self.store.flush_manifest()
+        self.features.flush()
+    
+    def get_warmup_length(self) -> int:
+        """获取增量计算指标所需的预热K线数（见 config_warmup_length）
+        
+        Returns:
+            int: 预热K线数
+        """
+        return config_warmup_length(self.config, list(self.get_indicator_specs().values()))
+    
+    def get_lookback(self, specs: Sequence[str]) -> Optional[int]:
+        """推断一组指标规格需要的预热K线数
+        
+        Args:
+            specs: 指标规格，例如 ['ma(20)', 'macd(12,26,9)']
+            
+        Returns:
+            Optional[int]: 预热K线数，有指标依赖全部历史时返回None
+        """
+        return config_lookback(self.config, specs)
+    
+    def get_history_length(self, window: int = 1) -> int:
+        """获取需要获取和缓存的历史K线数（见 config_history_length）
+        
+        Args:
+            window: 策略自身查看的最近K线数（不含指标预热）
+            
+        Returns:
+            int: 历史K线数
+        """
+        return config_history_length(self.config, window, list(self.get_indicator_specs().values()))
+    
+    def _time_keys(self, index: pd.Index) -> np.ndarray:
+        """把数据框索引转换为与缓存一致的时间键
+        
+        Args:
+            index: 时间索引
+            
+        Returns:
+            np.ndarray: 时间键
+        """
+        if self.compact.enabled:
+            return to_compact_time_keys(index.values)
+        return to_time_keys(index.values)
+    
+    def update_cache(self, data: Dict[str, Any], flush: bool = True) -> int:
+        """只处理比缓存更新的K线并追加到缓存
+        
+        指标在新K线加预热区间上计算，耗时与新增K线数成正比而不是与历史长度成正比。
+        
+        Args:
+            data: K线数据字典（至少包含新K线和预热区间）
+            flush: 是否立即写入缓存清单
+            
+        Returns:
+            int: 新增的行数
+        """
+        try:
+            stock_code = list(data.keys())[0]
+            df = self._convert_to_dataframe(data)
+            if df.empty:
+                return 0
+            return self._update_cache_frame(stock_code, df, flush)
+        except Exception as e:
+            logger.error(f"增量处理失败: {str(e)}")
+            return 0
+    
+    def _update_cache_frame(self, stock_code: str, df: pd.DataFrame, flush: bool = True) -> int:
+        """把数据框中比缓存更新的K线追加到缓存（与最后一根时间相同的K线改写最后一根），
+        并补齐缺失或失效的指标
+        
+        Args:
+            stock_code: 股票代码
+            df: 原始K线数据框
+            flush: 是否立即写入缓存清单
+            
+        Returns:
+            int: 写入的K线数（含改写的最后一根）
+        """
+        appended = self._append_bars(stock_code, self._clean_data(df))
+        self._update_features(stock_code)
+        if flush:
+            self.flush_cache()
+        return appended
+    
+    def _update_features(self, stock_code: str) -> None:
+        """计算缓存中缺失的指标行
+        
+        每个指标按（列名, 规范化规格）存储：参数变化的指标从头计算，未变化的只计算新增的尾部；
+        K线存储被重写（数据版本变化）时该股票的指标全部重新计算。
+        
+        Args:
+            stock_code: 股票代码
+        """
+        total = self.store.rows(stock_code)
+        version = self.store.data_version(stock_code)
+        pending = {}
+        for column, spec in self.get_indicator_specs().items():
+            params = normalize_spec(spec)
+            valid = self.features.valid_rows(stock_code, column, params, version)
+            if valid < total:
+                pending[column] = (spec, params, valid)
+        if not pending:
+            return
+        
+        start = min(valid for _, _, valid in pending.values())
+        window = self.store.read_frame(stock_code, tail=total - start + self.get_warmup_length())
+        offset = total - len(window)
+        graph = IndicatorGraph.from_frame(window, to_date_codes(window.index.values))
+        results = graph.evaluate({column: spec for column, (spec, _, _) in pending.items()})
+        for column, values in results.items():
+            _, params, valid = pending[column]
+            self.features.write(stock_code, column, params, values[valid - offset:], valid, version)
+        logger.debug(f"指标已缓存: {stock_code}, {len(results)} 个指标, 起始行 {start}")
+    
     def process_kline_data(self, data: Dict[str, Any]) -> pd.DataFrame:
         """处理K线数据
+        
+        每次调用都把新K线写入K线和特征存储（没有变化时不写入），缓存落后于输入数据时只计算新增的尾部，
+        返回截至输入最后一根K线的处理结果。结果是调用方独占的副本。
 
         Args:
             data: K线数据字典
 
+        Returns:
+            pd.DataFrame: 处理后的数据框
+        """
+        return self._process_kline(data)
+    
+    def process_batch(self, data: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+        """并行处理多只股票的K线数据
+        
+        股票分片给多个工作线程（存储和缓存不能跨进程传递，进程模式下也使用线程），
+        缓存清单在全部处理完成后统一写入一次。
+        
+        Args:
+            data: 多股票K线数据字典
+            
+        Returns:
+            Dict[str, pd.DataFrame]: 股票代码到处理结果的映射，失败的股票不包含在内
+        """
+        codes = list(data.keys())
+        results = self.executor.map(lambda code: self._process_kline({code: data[code]}, flush=False),
+                                    codes, threads=True)
+        self.flush_cache()
+        return {code: df for code, df in zip(codes, results) if df is not None and not df.empty}
+    
+    def _process_kline(self, data: Dict[str, Any], flush: bool = True) -> pd.DataFrame:
+        """处理单只股票的K线数据
+        
+        Args:
+            data: K线数据字典
+            flush: 是否立即写入缓存清单
+            
         Returns:
             pd.DataFrame: 处理后的数据框
         """
@@ -137,30 +519,191 @@ class DataProcessor:
                 
             stock_code = list(data.keys())[0]
             
-            # 尝试从缓存加载
-            cached_df = self.load_from_cache(stock_code)
-            if cached_df is not None:
-                return cached_df
-            
             # 转换为DataFrame
             df = self._convert_to_dataframe(data)
             if df.empty:
                 return df
+            last_time = self._time_keys(df.index).max()
+            
+            # 增量更新缓存后加载；存储内容未变时复用已组装的数据框，按时间筛选得到副本
+            self._update_cache_frame(stock_code, df, flush)
+            cached_df = self._load_cached_frame(stock_code, self.store.rows(stock_code),
+                                                self.store.data_version(stock_code),
+                                                self.store.read(stock_code, tail=1),
+                                                tuple(self.get_indicator_specs().items()))
+            if cached_df is None:
+                return self._calculate_indicators(self._clean_data(df))
+            
+            return cached_df[self._time_keys(cached_df.index) <= last_time]
 
-            # 数据清洗
-            df = self._clean_data(df)
+        except Exception as e:
+            logger.error(f"K线数据处理失败: {str(e)}")
+            return pd.DataFrame()
 
-            # 计算技术指标
-            df = self._calculate_indicators(df)
+    @memoize(max_entries=8)
+    def process_panel(self, data: Dict[str, Any]) -> Optional[BarPanel]:
+        """把整个标的池的K线数据一次性处理为（时间 × 股票）面板
+
+        所有股票的数据一次对齐，技术指标按列向量化计算，耗时与数据量成正比，
+        而不是与股票数量的 Python 循环次数成正比。
+
+        Args:
+            data: 多股票K线数据字典
+
+        Returns:
+            Optional[BarPanel]: 添加了涨跌幅和技术指标字段的面板，数据为空或处理失败时返回None
+        """
+        try:
+            if not data:
+                logger.warning("输入数据为空")
+                return None
             
-            # 保存到缓存
-            self.save_to_cache(df, stock_code)
+            seeds = self._live_seeds(next(iter(data.values())) or {})
+            panel = BarPanel.from_dict(data, BAR_FIELDS + list(seeds))
+            if panel.shape[0] == 0:
+                return None
+            
+            # 与单股票处理一致：缺失值按前值填充
+            for field, values in panel.fields.items():
+                panel.fields[field] = self._ffill_panel(values)
+            
+            close = panel['close']
+            returns = np.full_like(close, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns[1:] = close[1:] / close[:-1] - 1
+            panel.fields['returns'] = returns
+            
+            self._calculate_panel_indicators(panel, seeds)
+            
+            if self.compact.enabled:
+                for field, values in panel.fields.items():
+                    panel.fields[field] = self.compact.cast(field, values)
+            return panel
+        
+        except Exception as e:
+            logger.error(f"面板数据处理失败: {str(e)}")
+            return None
+    
+    @memoize(max_entries=8)
+    def process_bars(self, data: Dict[str, Any]) -> Optional[BarSet]:
+        """把K线数据处理为不依赖 pandas 的K线视图
 
-            return df
+        清洗（去重、排序、向前填充）、涨跌幅和技术指标都直接在 NumPy 数组上计算，
+        结果与 process_kline_data 的列一致。返回的视图可能来自缓存，调用方不得修改。
+
+        Args:
+            data: 多股票K线数据字典
 
+        Returns:
+            Optional[BarSet]: 股票代码到K线视图的集合，数据为空或处理失败时返回None
+        """
+        try:
+            if not data:
+                logger.warning("输入数据为空")
+                return None
+            
+            specs = self.get_indicator_specs()
+            codes = list(data.keys())
+            views = self.executor.map(lambda code: self._process_bar_view(code, data[code], specs),
+                                      codes, threads=True)
+            views = {code: view for code, view in zip(codes, views) if view is not None}
+            return BarSet(views) if views else None
+        
         except Exception as e:
-            logger.error(f"K线数据处理失败: {str(e)}")
-            return pd.DataFrame()
+            logger.error(f"K线视图处理失败: {str(e)}")
+            return None
+    
+    def _process_bar_view(self, stock_code: str, stock_data: Any, specs: Dict[str, str]) -> Optional[BarView]:
+        """处理单只股票的K线数组
+
+        Args:
+            stock_code: 股票代码
+            stock_data: 字段到序列的映射
+            specs: 结果列名到指标规格的映射
+
+        Returns:
+            Optional[BarView]: K线视图，数据为空时返回None
+        """
+        if stock_data is None or 'time' not in stock_data or 'close' not in stock_data:
+            return None
+        times = to_time_keys(stock_data['time'])
+        if len(times) == 0:
+            return None
+        seeds = self._live_seeds(stock_data)
+        fields = {field: np.asarray(stock_data[field], dtype=np.float64)
+                  for field in BAR_FIELDS + list(seeds) if field in stock_data}
+        
+        # 与 _clean_data 一致：重复时间戳保留最后一条，按时间排序
+        if len(times) > 1 and not np.all(times[1:] > times[:-1]):
+            order = np.argsort(times, kind='stable')
+            keep = np.append(times[order][1:] != times[order][:-1], True)
+            rows = order[keep]
+            times = times[rows]
+            fields = {field: values[rows] for field, values in fields.items()}
+        for field, values in fields.items():
+            fields[field] = self._ffill_panel(values[:, None])[:, 0]
+        
+        close = fields['close']
+        returns = np.full_like(close, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[1:] = close[1:] / close[:-1] - 1
+        fields['returns'] = returns
+        
+        graph = IndicatorGraph(fields, to_date_codes(times))
+        for field, spec in seeds.items():
+            graph.seed(spec, fields[field])
+        fields.update(graph.evaluate(specs))
+        if self.compact.enabled:
+            for field, values in fields.items():
+                fields[field] = self.compact.cast(field, values)
+        fields['time'] = times
+        return BarView(stock_code, fields)
+    
+    @staticmethod
+    def _ffill_panel(values: np.ndarray) -> np.ndarray:
+        """沿时间方向向前填充 NaN
+        
+        Args:
+            values: 二维数组（时间 × 股票）
+            
+        Returns:
+            np.ndarray: 填充后的数组
+        """
+        valid = ~np.isnan(values)
+        if valid.all():
+            return values
+        rows = np.where(valid, np.arange(values.shape[0])[:, None], 0)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        return values[rows, np.arange(values.shape[1])[None, :]]
+    
+    def _calculate_panel_indicators(self, panel: BarPanel, seeds: Optional[Dict[str, str]] = None) -> None:
+        """在面板上按列向量化计算技术指标，字段名与单股票处理一致
+        
+        启用并行时股票按列分片，分给多个线程或进程计算。
+        
+        Args:
+            panel: 面板数据，结果写入 panel.fields
+            seeds: 直接取面板字段值的指标（见 _live_seeds）
+        """
+        sources = {field: panel.fields[field] for field in list(SOURCE_FIELDS) + list(seeds or {})
+                   if field in panel.fields}
+        panel.fields.update(self.executor.map_columns(
+            evaluate_indicators, sources, panel.date_codes(), self.get_indicator_specs(), seeds))
+    
+    def _live_seeds(self, stock_data: Any) -> Dict[str, str]:
+        """输入数据带有行情推送中增量计算的 VWAP（行情环形缓冲区的窗口数据）时，
+        对应的 VWAP 指标直接使用该字段，不在窗口上重算
+        
+        Args:
+            stock_data: 单只股票的字段到序列的映射
+            
+        Returns:
+            Dict[str, str]: 字段到指标规格的映射
+        """
+        spec = live_vwap_spec(self.config)
+        if spec is None or VWAP_FIELD not in stock_data or self.get_indicator_specs().get('vwap') != spec:
+            return {}
+        return {VWAP_FIELD: spec}
 
     def _convert_to_dataframe(self, data: Dict[str, Any]) -> pd.DataFrame:
         """将字典数据转换为DataFrame
@@ -176,18 +719,17 @@ class DataProcessor:
             stock_code = list(data.keys())[0]
             stock_data = data[stock_code]
 
-            df = pd.DataFrame({
-                'datetime': pd.to_datetime(stock_data['time']),
-                'open': stock_data['open'],
-                'high': stock_data['high'],
-                'low': stock_data['low'],
-                'close': stock_data['close'],
-                'volume': stock_data['volume'],
-                'amount': stock_data['amount']
-            })
+            # 紧凑模式下使用 int32 时间键作为索引，否则使用 datetime 索引
+            if self.compact.enabled:
+                index = pd.Index(to_compact_time_keys(stock_data['time']), name='datetime')
+            else:
+                index = pd.DatetimeIndex(to_datetime64(stock_data['time']), name='datetime')
 
-            df.set_index('datetime', inplace=True)
-            return df
+            columns = {}
+            for field in ['open', 'high', 'low', 'close', 'volume', 'amount']:
+                columns[field] = self.compact.cast(field, stock_data[field])
+
+            return pd.DataFrame(columns, index=index, copy=False)
 
         except Exception as e:
             logger.error(f"数据转换失败: {str(e)}")
@@ -203,17 +745,19 @@ class DataProcessor:
             pd.DataFrame: 清洗后的数据框
         """
         try:
-            # 删除重复数据
-            df = df[~df.index.duplicated(keep='last')]
+            # 删除重复数据（仅在存在重复时才产生新的数据框）
+            if df.index.has_duplicates:
+                df = df[~df.index.duplicated(keep='last')]
 
             # 按时间排序
-            df.sort_index(inplace=True)
+            if not df.index.is_monotonic_increasing:
+                df.sort_index(inplace=True)
 
             # 填充缺失值
-            df.fillna(method='ffill', inplace=True)
+            df.ffill(inplace=True)
 
             # 计算涨跌幅
-            df['returns'] = df['close'].pct_change()
+            df['returns'] = df['close'].pct_change().values.astype(self.compact.price_dtype, copy=False)
 
             return df
 
@@ -231,20 +775,7 @@ class DataProcessor:
         Returns:
             Dict[str, Any]: 指标参数
         """
-        # 从配置中获取指标参数，如果没有则使用默认值
-        indicator_config = self.config.get('indicators', {}).get(indicator, {})
-        
-        # 默认参数
-        defaults = {
-            'MA': {'periods': [5, 10, 20, 60]},
-            'RSI': {'period': 14},
-            'MACD': {'fast_period': 12, 'slow_period': 26, 'signal_period': 9},
-            'BOLL': {'period': 20, 'std_dev': 2},
-            'VWAP': {'period': 14}
-        }
-        
-        # 合并默认参数和配置参数
-        return {**defaults.get(indicator, {}), **indicator_config}
+        return indicator_params(self.config, indicator)
     
     def _calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """计算技术指标
@@ -256,58 +787,15 @@ class DataProcessor:
             pd.DataFrame: 添加技术指标后的数据框
         """
         try:
-            # 创建数据副本以避免警告
-            result_df = df.copy()
+            # 直接在数据框上添加指标列，数据框由 process_kline_data 独占，无需防御性复制
+            result_df = df
             
-            # 并行计算所有指标
-            for indicator in self.indicators:
-                params = self._get_indicator_params(indicator)
-                
-                if indicator == 'MA':
-                    # 计算多个周期的移动平均线
-                    periods = params['periods']
-                    for period in periods:
-                        result_df[f'ma_{period}'] = calculate_ma(result_df['close'], period)
-
-                elif indicator == 'RSI':
-                    # 计算RSI指标
-                    period = params['period']
-                    result_df['rsi'] = calculate_rsi(result_df['close'], period)
-
-                elif indicator == 'MACD':
-                    # 计算MACD指标
-                    fast_period = params['fast_period']
-                    slow_period = params['slow_period']
-                    signal_period = params['signal_period']
-                    macd, signal, hist = calculate_macd(
-                        result_df['close'], 
-                        fast_period=fast_period, 
-                        slow_period=slow_period, 
-                        signal_period=signal_period
-                    )
-                    result_df['macd'] = macd
-                    result_df['macd_signal'] = signal
-                    result_df['macd_hist'] = hist
-
-                elif indicator == 'BOLL':
-                    # 计算布林带
-                    period = params['period']
-                    std_dev = params['std_dev']
-                    upper, middle, lower = calculate_bollinger_bands(
-                        result_df['close'], 
-                        period=period, 
-                        std_dev=std_dev
-                    )
-                    result_df['boll_upper'] = upper
-                    result_df['boll_middle'] = middle
-                    result_df['boll_lower'] = lower
-
-                elif indicator == 'VWAP':
-                    # 计算VWAP
-                    period = params['period']
-                    result_df['vwap'] = calculate_vwap(result_df['close'], result_df['volume'], period)
-
-            return result_df
+            # 只计算需要的指标，公共中间结果（如布林带中轨与 MA20）只计算一次
+            graph = IndicatorGraph.from_frame(result_df, to_date_codes(result_df.index.values))
+            for column, values in graph.evaluate(self.get_indicator_specs()).items():
+                result_df[column] = values
+
+            return self.compact.convert_frame(result_df)
 
         except Exception as e:
             logger.error(f"技术指标计算失败: {str(e)}")
@@ -323,15 +811,20 @@ class DataProcessor:
             pd.DataFrame: 添加特征后的数据框
         """
         try:
-            # 计算波动率
-            df['volatility'] = df['returns'].rolling(window=20).std()
-
-            # 计算成交量变化
-            df['volume_ma'] = df['volume'].rolling(window=20).mean()
-            df['volume_ratio'] = df['volume'] / df['volume_ma']
-
-            # 计算趋势强度
-            df['trend_strength'] = abs(df['close'] - df['ma_20']) / df['ma_20']
+            # 已经计算过的指标列直接复用，例如趋势强度使用已有的 MA20
+            graph = IndicatorGraph.from_frame(df)
+            for column, spec in self.get_indicator_specs().items():
+                if column in df.columns:
+                    graph.seed(spec, df[column].values)
+            
+            features = graph.evaluate({
+                'volatility': 'volatility(20)',  # 波动率
+                'volume_ma': 'ma(20,volume)',  # 成交量变化
+                'volume_ratio': 'volume_ratio(20)',
+                'trend_strength': 'trend_strength(20)'  # 趋势强度
+            })
+            for column, values in features.items():
+                df[column] = values
 
             return df
 
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""数据质量检查模块
+
+此模块在整个面板上一次性完成数据质量检查，包括：
+1. 字段缺失、零价和负价
+2. 最高价低于最低价、开收盘价越界
+3. 重复时间戳
+4. 相对交易日历的缺口
+5. 停牌（成交量为零）
+
+检查结果为（时间 × 股票）的质量位图，引擎据此跳过或修复数据。
+"""
+
+from typing import Dict, List, Any, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from data.panel import BarPanel, PRICE_FIELDS, BAR_FIELDS, to_date_codes
+
+# 质量标志位
+QUALITY_OK = 0
+QUALITY_MISSING_FIELD = 1 << 0   # 缺少必要字段
+QUALITY_BAD_PRICE = 1 << 1       # 价格为零或负
+QUALITY_HIGH_LOW = 1 << 2        # 最高价低于最低价，或开收盘价越界
+QUALITY_DUPLICATE = 1 << 3       # 重复时间戳
+QUALITY_GAP = 1 << 4             # 交易日历内缺少K线
+QUALITY_SUSPENDED = 1 << 5       # 停牌（成交量为零）
+QUALITY_NAN = 1 << 6             # 价格缺失值
+
+QUALITY_FLAG_NAMES = {
+    'missing_field': QUALITY_MISSING_FIELD,
+    'bad_price': QUALITY_BAD_PRICE,
+    'high_low': QUALITY_HIGH_LOW,
+    'duplicate': QUALITY_DUPLICATE,
+    'gap': QUALITY_GAP,
+    'suspended': QUALITY_SUSPENDED,
+    'nan': QUALITY_NAN
+}
+
+# 默认：最新K线存在以下问题时跳过该股票
+DEFAULT_SKIP_FLAGS = QUALITY_MISSING_FIELD | QUALITY_BAD_PRICE | QUALITY_HIGH_LOW | QUALITY_NAN
+# 默认：历史K线存在以下问题时删除该行
+DEFAULT_REPAIR_FLAGS = QUALITY_DUPLICATE | QUALITY_BAD_PRICE | QUALITY_HIGH_LOW | QUALITY_NAN
+
+
+def parse_flags(names: Optional[Sequence[str]], default: int) -> int:
+    """把标志名称列表转换为位掩码
+
+    Args:
+        names: 标志名称列表
+        default: 未配置时的默认掩码
+
+    Returns:
+        int: 位掩码
+    """
+    if names is None:
+        return default
+    mask = QUALITY_OK
+    for name in names:
+        if name not in QUALITY_FLAG_NAMES:
+            logger.warning(f"未知的数据质量标志: {name}")
+            continue
+        mask |= QUALITY_FLAG_NAMES[name]
+    return mask
+
+
+class QualityReport:
+    """数据质量检查结果
+
+    Attributes:
+        panel: 检查所用的面板
+        bitmap: （时间 × 股票）质量位图
+        symbol_flags: 每只股票所有问题的并集
+        latest_flags: 每只股票最新一根K线的质量标志
+        gap_counts: 每只股票在交易日历内缺少的K线数量
+    """
+
+    def __init__(self, panel: BarPanel, bitmap: np.ndarray, gap_counts: np.ndarray):
+        """初始化检查结果
+
+        Args:
+            panel: 面板数据
+            bitmap: 质量位图
+            gap_counts: 日历缺口数量
+        """
+        self.panel = panel
+        self.bitmap = bitmap
+        self.gap_counts = gap_counts
+
+        n_times, n_codes = panel.shape
+        field_flags = np.zeros(n_codes, dtype=np.uint8)
+        for code in panel.missing_fields:
+            field_flags[panel.code_index[code]] = QUALITY_MISSING_FIELD
+        self.symbol_flags = np.bitwise_or.reduce(bitmap, axis=0) if n_times else field_flags.copy()
+        self.symbol_flags = self.symbol_flags | field_flags | np.where(gap_counts > 0, QUALITY_GAP, 0).astype(np.uint8)
+
+        # 每只股票最后一根K线所在行
+        has_bar = panel.present.any(axis=0)
+        last_rows = n_times - 1 - np.argmax(panel.present[::-1], axis=0) if n_times else np.zeros(n_codes, dtype=np.int64)
+        latest = bitmap[last_rows, np.arange(n_codes)] if n_times else np.zeros(n_codes, dtype=np.uint8)
+        self.latest_flags = np.where(has_bar, latest, QUALITY_MISSING_FIELD).astype(np.uint8) | field_flags
+
+    @property
+    def codes(self) -> List[str]:
+        """股票代码列表"""
+        return self.panel.codes
+
+    def flags(self, code: str) -> np.ndarray:
+        """获取单只股票的质量位图列
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            np.ndarray: 该股票每个时间点的质量标志
+        """
+        return self.bitmap[:, self.panel.code_index[code]]
+
+    def bad_symbols(self, mask: int = DEFAULT_SKIP_FLAGS) -> List[str]:
+        """获取最新K线命中指定标志的股票
+
+        Args:
+            mask: 标志掩码
+
+        Returns:
+            List[str]: 股票代码列表
+        """
+        hit = np.flatnonzero(self.latest_flags & mask)
+        return [self.panel.codes[i] for i in hit]
+
+    def summary(self) -> Dict[str, int]:
+        """统计各类问题的数量
+
+        Returns:
+            Dict[str, int]: 标志名称到命中数量的映射
+        """
+        summary = {}
+        for name, bit in QUALITY_FLAG_NAMES.items():
+            summary[name] = int(np.count_nonzero(self.bitmap & bit))
+        summary['missing_field'] = len(self.panel.missing_fields)
+        summary['gap'] = int(self.gap_counts.sum())
+        return summary
+
+    def entry_flags(self) -> np.ndarray:
+        """获取原始逐条记录对应的质量标志
+
+        Returns:
+            np.ndarray: 与原始记录一一对应的标志，重复记录带 QUALITY_DUPLICATE
+        """
+        panel = self.panel
+        flags = self.bitmap[panel.entry_rows, panel.entry_cols] & ~np.uint8(QUALITY_DUPLICATE)
+        flags[panel.entry_dup] |= QUALITY_DUPLICATE
+        return flags
+
+
+class DataQualityScanner:
+    """数据质量检查器"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """初始化检查器
+
+        Args:
+            config: 配置参数字典，读取 data.quality 段
+        """
+        quality_config = ((config or {}).get('data') or {}).get('quality') or {}
+        self.required_fields = quality_config.get('required_fields', BAR_FIELDS[:-1])
+        self.skip_flags = parse_flags(quality_config.get('skip_flags'), DEFAULT_SKIP_FLAGS)
+        self.repair_flags = parse_flags(quality_config.get('repair_flags'), DEFAULT_REPAIR_FLAGS)
+
+    def scan(self, data: Dict[str, Any], calendar: Optional[Sequence[Any]] = None) -> QualityReport:
+        """对整个面板做一次质量检查
+
+        Args:
+            data: K线数据字典
+            calendar: 交易日历（日期编码或时间戳），提供时检查缺口
+
+        Returns:
+            QualityReport: 检查结果
+        """
+        panel = data if isinstance(data, BarPanel) else BarPanel.from_dict(data, self.required_fields)
+        present = panel.present
+        bitmap = np.zeros(panel.shape, dtype=np.uint8)
+
+        prices = [panel[f] for f in PRICE_FIELDS if f in panel]
+        with np.errstate(invalid='ignore'):
+            if prices:
+                stacked = np.stack(prices)
+                nan_mask = np.isnan(stacked).any(axis=0)
+                bad_price = (stacked <= 0).any(axis=0)
+                bitmap[present & nan_mask] |= QUALITY_NAN
+                bitmap[present & bad_price] |= QUALITY_BAD_PRICE
+
+            if 'high' in panel and 'low' in panel:
+                high, low = panel['high'], panel['low']
+                inverted = high < low
+                for f in ('open', 'close'):
+                    if f in panel:
+                        inverted |= (panel[f] > high) | (panel[f] < low)
+                bitmap[present & inverted] |= QUALITY_HIGH_LOW
+
+            if 'volume' in panel:
+                bitmap[present & (panel['volume'] <= 0)] |= QUALITY_SUSPENDED
+
+        bitmap[panel.duplicated] |= QUALITY_DUPLICATE
+
+        gap_counts = np.zeros(panel.shape[1], dtype=np.int64)
+        if calendar is not None and panel.shape[0]:
+            gap_counts = self._scan_gaps(panel, bitmap, calendar)
+
+        return QualityReport(panel, bitmap, gap_counts)
+
+    def _scan_gaps(self, panel: BarPanel, bitmap: np.ndarray, calendar: Sequence[Any]) -> np.ndarray:
+        """检查相对交易日历的缺口
+
+        Args:
+            panel: 面板数据
+            bitmap: 质量位图，原地标记缺口
+            calendar: 交易日历
+
+        Returns:
+            np.ndarray: 每只股票缺少的交易日数量
+        """
+        cal = np.unique(to_date_codes(calendar))
+        row_dates = panel.date_codes()
+        present = panel.present
+        n_times, n_codes = present.shape
+
+        has_bar = present.any(axis=0)
+        first_rows = np.argmax(present, axis=0)
+        last_rows = n_times - 1 - np.argmax(present[::-1], axis=0)
+        first_dates = row_dates[first_rows]
+        last_dates = row_dates[last_rows]
+
+        # 面板中已有的行：在股票存续区间内、属于交易日、但该股票无K线
+        in_calendar = np.isin(row_dates, cal)
+        rows = np.arange(n_times)[:, None]
+        in_span = (rows >= first_rows[None, :]) & (rows <= last_rows[None, :])
+        gap_cells = in_span & ~present & in_calendar[:, None] & has_bar[None, :]
+        bitmap[gap_cells] |= QUALITY_GAP
+
+        # 日历中的交易日数量与实际K线日期数量之差（含全市场缺失的日期）
+        expected = np.searchsorted(cal, last_dates, side='right') - np.searchsorted(cal, first_dates, side='left')
+        actual = (present & in_calendar[:, None]).sum(axis=0)
+        if len(np.unique(row_dates)) != n_times:
+            # 分钟线：按日期去重后再计数
+            day_start = np.r_[True, row_dates[1:] != row_dates[:-1]]
+            day_ids = np.cumsum(day_start) - 1
+            per_day = np.zeros((day_ids[-1] + 1, n_codes), dtype=bool)
+            np.logical_or.at(per_day, day_ids, present & in_calendar[:, None])
+            actual = per_day.sum(axis=0)
+        return np.where(has_bar, np.maximum(expected - actual, 0), 0)
+
+    def clean(self, data: Dict[str, Any], report: Optional[QualityReport] = None) -> Dict[str, Any]:
+        """根据质量位图跳过或修复数据
+
+        最新K线命中 skip_flags 的股票被移除；历史K线命中 repair_flags 的行被删除。
+
+        Args:
+            data: K线数据字典
+            report: 已有的检查结果，为空时重新检查
+
+        Returns:
+            Dict[str, Any]: 清理后的数据字典
+        """
+        if not data:
+            return data
+        report = report or self.scan(data)
+        panel = report.panel
+
+        skipped = set(report.bad_symbols(self.skip_flags))
+        entry_flags = report.entry_flags()
+        drop = (entry_flags & self.repair_flags) != 0
+        dirty = np.flatnonzero(np.bincount(panel.entry_cols[drop], minlength=len(panel.codes)))
+
+        cleaned = {}
+        for code in panel.codes:
+            if code not in skipped:
+                cleaned[code] = data[code]
+        for i in dirty:
+            code = panel.codes[i]
+            if code in skipped:
+                continue
+            keep = ~drop[panel.entry_offsets[i]:panel.entry_offsets[i + 1]]
+            stock_data = data[code]
+            if hasattr(stock_data, 'iloc'):
+                cleaned[code] = stock_data.iloc[keep]
+            else:
+                cleaned[code] = {f: (np.asarray(v)[keep] if len(v) == len(keep) else v)
+                                 for f, v in stock_data.items()}
+
+        if skipped or len(dirty):
+            logger.warning(f"数据质量检查 - 跳过: {sorted(skipped)}, 修复: {len(dirty)} 只, "
+                           f"统计: {report.summary()}")
+        return cleaned
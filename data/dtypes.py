@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""紧凑数据类型模块
+
+此模块定义K线数据的紧凑表示，包括：
+1. float32 价格、int32 成交量（停牌、补齐产生的缺失成交量转换为0）
+2. int32 时间键（日线为 YYYYMMDD，分钟线为秒级时间戳）
+3. 存储时按最小价格变动单位编码为 int32 整数价格
+"""
+
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from data.panel import PRICE_FIELDS, MS_PER_DAY, TZ_OFFSET_MS, to_time_keys, to_date_codes
+
+# 价格编码前缀：存储时 open 编码为 open_ticks
+TICKS_SUFFIX = '_ticks'
+
+
+def to_compact_time_keys(times: Any) -> np.ndarray:
+    """将时间序列转换为 int32 时间键
+
+    全部位于交易日零点的时间（日线）编码为 YYYYMMDD，其余编码为秒级时间戳。
+
+    Args:
+        times: 时间序列
+
+    Returns:
+        np.ndarray: int32 时间键
+    """
+    keys = to_time_keys(times)
+    if keys.size == 0 or int(np.abs(keys).max()) < 100000000:
+        return keys.astype(np.int32)
+    ms = keys if int(np.abs(keys).max()) >= 100000000000 else keys * 1000
+    if np.all((ms + TZ_OFFSET_MS) % MS_PER_DAY == 0):
+        return to_date_codes(ms)
+    return (ms // 1000).astype(np.int32)
+
+
+class CompactSchema:
+    """K线数据紧凑表示"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        price_dtype: str = 'float32',
+        volume_dtype: str = 'int32',
+        amount_dtype: str = 'float64',
+        tick_size: float = 0.01
+    ):
+        """初始化紧凑表示
+
+        Args:
+            enabled: 是否启用
+            price_dtype: 价格及指标的数据类型
+            volume_dtype: 成交量的数据类型
+            amount_dtype: 成交额的数据类型
+            tick_size: 最小价格变动单位，用于整数价格编码
+        """
+        self.enabled = enabled
+        self.price_dtype = np.dtype(price_dtype) if enabled else np.dtype(np.float64)
+        self.volume_dtype = np.dtype(volume_dtype) if enabled else np.dtype(np.float64)
+        self.amount_dtype = np.dtype(amount_dtype) if enabled else np.dtype(np.float64)
+        self.tick_size = tick_size
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'CompactSchema':
+        """从配置创建
+
+        data.compact 可以是布尔值，也可以是包含 enabled/price_dtype/volume_dtype/
+        amount_dtype/tick_size 的字典。
+
+        Args:
+            config: 配置参数字典
+
+        Returns:
+            CompactSchema: 紧凑表示
+        """
+        compact_config = (config.get('data') or {}).get('compact', False)
+        if isinstance(compact_config, dict):
+            return cls(**{'enabled': True, **compact_config})
+        return cls(enabled=bool(compact_config))
+
+    def field_dtype(self, field: str) -> np.dtype:
+        """获取字段对应的数据类型
+
+        Args:
+            field: 字段名
+
+        Returns:
+            np.dtype: 数据类型
+        """
+        if field == 'volume':
+            return self.volume_dtype
+        if field == 'amount':
+            return self.amount_dtype
+        return self.price_dtype
+
+    def cast(self, field: str, values: Any, copy: bool = False) -> np.ndarray:
+        """把数组转换为字段对应的数据类型
+
+        转换为整数类型时缺失值和无穷值先置为0，避免转换出无意义的极值。
+
+        Args:
+            field: 字段名
+            values: 数组
+            copy: 类型不变时是否复制
+
+        Returns:
+            np.ndarray: 转换后的数组
+        """
+        dtype = self.field_dtype(field)
+        values = np.asarray(values)
+        if dtype.kind in 'iu' and values.dtype.kind == 'f':
+            finite = np.isfinite(values)
+            if not finite.all():
+                values = np.where(finite, values, 0)
+        return values.astype(dtype, copy=copy)
+
+    def convert(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """转换多股票K线数据字典
+
+        Args:
+            data: 多股票K线数据字典
+
+        Returns:
+            Dict[str, Any]: 转换后的数据字典，未启用时原样返回
+        """
+        if not self.enabled or not data:
+            return data
+        return {code: self.convert_stock(stock_data) for code, stock_data in data.items()}
+
+    def convert_stock(self, stock_data: Any) -> Any:
+        """转换单只股票的K线数据
+
+        Args:
+            stock_data: 字段到序列的映射或DataFrame
+
+        Returns:
+            Any: 转换后的数据，DataFrame 原地转换列类型
+        """
+        if not self.enabled or stock_data is None:
+            return stock_data
+        if isinstance(stock_data, pd.DataFrame):
+            for column in stock_data.columns:
+                if column == 'time':
+                    stock_data['time'] = to_compact_time_keys(stock_data['time'].values)
+                elif stock_data[column].dtype.kind in 'fiu':
+                    stock_data[column] = self.cast(column, stock_data[column].values)
+            return stock_data
+
+        converted = {}
+        for field, values in stock_data.items():
+            arr = np.asarray(values)
+            if field == 'time':
+                converted[field] = to_compact_time_keys(arr)
+            elif arr.dtype.kind in 'fiu':
+                converted[field] = self.cast(field, arr)
+            else:
+                converted[field] = arr
+        return converted
+
+    def convert_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """原地转换DataFrame的数值列
+
+        Args:
+            df: 数据框
+
+        Returns:
+            pd.DataFrame: 同一个数据框
+        """
+        if not self.enabled:
+            return df
+        for column in df.columns:
+            if df[column].dtype.kind in 'fiu' and df[column].dtype != self.field_dtype(column):
+                df[column] = self.cast(column, df[column].values, copy=True)
+        return df
+
+    def encode_ticks(self, df: pd.DataFrame) -> pd.DataFrame:
+        """把价格列编码为 int32 整数价格（仅在编码无损时）
+
+        Args:
+            df: 数据框
+
+        Returns:
+            pd.DataFrame: 编码后的数据框，价格列改名为 {field}_ticks
+        """
+        if not self.enabled:
+            return df
+        encoded = {}
+        for field in PRICE_FIELDS:
+            if field not in df.columns:
+                continue
+            prices = df[field].values.astype(np.float64)
+            with np.errstate(invalid='ignore'):
+                ticks = np.round(prices / self.tick_size)
+                exact = np.isfinite(prices) & (np.abs(ticks * self.tick_size - prices) < self.tick_size * 1e-3)
+            if not exact.all() or np.abs(ticks).max(initial=0) >= np.iinfo(np.int32).max:
+                logger.debug(f"价格无法无损编码为整数价格，保留浮点: {field}")
+                continue
+            encoded[field] = ticks.astype(np.int32)
+        if not encoded:
+            return df
+        df = df.copy(deep=False)
+        for field, ticks in encoded.items():
+            loc = df.columns.get_loc(field)
+            df = df.drop(columns=field)
+            df.insert(loc, field + TICKS_SUFFIX, ticks)
+        return df
+
+    def decode_ticks(self, df: pd.DataFrame) -> pd.DataFrame:
+        """把 int32 整数价格列还原为价格
+
+        Args:
+            df: 数据框
+
+        Returns:
+            pd.DataFrame: 还原后的数据框
+        """
+        for column in [c for c in df.columns if c.endswith(TICKS_SUFFIX)]:
+            loc = df.columns.get_loc(column)
+            prices = (df[column].values * self.tick_size).astype(self.price_dtype)
+            df = df.drop(columns=column)
+            df.insert(loc, column[:-len(TICKS_SUFFIX)], prices)
+        return df
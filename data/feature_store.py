@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""特征存储模块
+
+此模块按（股票, 特征名, 参数哈希, 数据版本）持久化计算好的技术指标和特征，包括：
+1. 列式存储：每个特征一个原始二进制数组文件，可以只读取需要的特征和行
+2. 参数变化时写入新的特征文件，不会读到旧参数的结果
+3. 原始数据被重写（数据版本变化）时只有对应股票的特征失效
+4. 新K线只追加特征的尾部，最后一根K线被改写时从该行起重新计算
+
+特征的第 i 行与 BarStore 中同一股票的第 i 条记录对应。
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+class FeatureStore:
+    """列式特征存储
+
+    目录结构：{root}/{code}/{特征名}-{参数哈希}.bin 为特征值，{root}/{code}/meta.json 为元数据。
+    """
+
+    META = 'meta.json'
+
+    def __init__(self, root: str, dtype: Any = np.float64):
+        """初始化存储
+
+        Args:
+            root: 存储目录
+            dtype: 特征值的数据类型
+        """
+        self.root = root
+        self.dtype = np.dtype(dtype)
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._metas: Dict[str, Dict[str, Any]] = {}
+        self._dirty = set()
+
+    @staticmethod
+    def param_hash(params: Any) -> str:
+        """计算参数哈希
+
+        Args:
+            params: 特征参数（指标规格字符串或可 JSON 序列化的参数）
+
+        Returns:
+            str: 参数哈希
+        """
+        text = params if isinstance(params, str) else json.dumps(params, sort_keys=True, default=str)
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=6).hexdigest()
+
+    def feature_key(self, name: str, params: Any) -> str:
+        """获取特征的存储键
+
+        Args:
+            name: 特征名
+            params: 特征参数
+
+        Returns:
+            str: 存储键，同时是文件名（不含扩展名）
+        """
+        return f"{re.sub(r'[^0-9A-Za-z_.]', '_', name)}-{self.param_hash(params)}"
+
+    def get_path(self, code: str, key: str) -> str:
+        """获取特征文件路径
+
+        Args:
+            code: 股票代码
+            key: 特征存储键
+
+        Returns:
+            str: 文件路径
+        """
+        return os.path.join(self.root, code, f"{key}.bin")
+
+    def _meta(self, code: str) -> Dict[str, Any]:
+        """获取股票的特征元数据，首次访问时从文件加载"""
+        meta = self._metas.get(code)
+        if meta is None:
+            meta = {}
+            path = os.path.join(self.root, code, self.META)
+            try:
+                if os.path.exists(path):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+            except Exception as e:
+                logger.warning(f"读取特征元数据失败，特征将重新计算 - 代码: {code}, 错误: {str(e)}")
+            self._metas[code] = meta
+        return meta
+
+    def flush(self, codes: Optional[Iterable[str]] = None) -> None:
+        """原子写入元数据文件
+
+        Args:
+            codes: 股票代码，默认所有有变化的股票
+        """
+        with self._lock:
+            pending = list(self._dirty if codes is None else set(codes) & self._dirty)
+            for code in pending:
+                path = os.path.join(self.root, code, self.META)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._metas[code], f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, path)
+                self._dirty.discard(code)
+
+    def _file_rows(self, code: str, key: str) -> int:
+        path = self.get_path(code, key)
+        return os.path.getsize(path) // self.dtype.itemsize if os.path.exists(path) else 0
+
+    def valid_rows(self, code: str, name: str, params: Any, data_version: Optional[str]) -> int:
+        """获取特征中仍然有效的行数
+
+        数据版本不一致或参数对应的文件不存在时为 0。
+
+        Args:
+            code: 股票代码
+            name: 特征名
+            params: 特征参数
+            data_version: 原始数据的当前版本
+
+        Returns:
+            int: 有效行数
+        """
+        key = self.feature_key(name, params)
+        entry = self._meta(code).get(key)
+        if not entry or entry.get('data_version') != data_version or entry.get('dtype') != self.dtype.str:
+            return 0
+        return min(entry['rows'], self._file_rows(code, key))
+
+    def write(self, code: str, name: str, params: Any, values: np.ndarray, start: int,
+              data_version: Optional[str], updated: Optional[str] = None) -> None:
+        """写入特征的第 start 行起的值，之后的旧值被覆盖
+
+        Args:
+            code: 股票代码
+            name: 特征名
+            params: 特征参数
+            values: 特征值
+            start: 起始行
+            data_version: 计算所用原始数据的版本
+            updated: 更新时间，默认当前时间
+
+        Raises:
+            ValueError: start 之前的行无效（写入会留下空洞）
+        """
+        key = self.feature_key(name, params)
+        valid = self.valid_rows(code, name, params, data_version)
+        if start > valid:
+            raise ValueError(f"特征写入位置超出有效行 - 代码: {code}, 特征: {name}, 起始: {start}, 有效: {valid}")
+
+        path = self.get_path(code, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        if start == 0 or not os.path.exists(path):
+            with open(path, 'wb') as f:
+                values.tofile(f)
+        else:
+            with open(path, 'r+b') as f:
+                f.truncate(start * self.dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                values.tofile(f)
+
+        with self._lock:
+            self._meta(code)[key] = {
+                'name': name,
+                'params': params if isinstance(params, (str, int, float, list, dict)) else str(params),
+                'dtype': self.dtype.str,
+                'rows': start + len(values),
+                'data_version': data_version,
+                'updated': updated or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self._dirty.add(code)
+
+    def truncate(self, code: str, rows: int) -> None:
+        """使股票所有特征第 rows 行起的值失效（原始数据的最后几条被改写时调用）
+
+        Args:
+            code: 股票代码
+            rows: 保留的有效行数
+        """
+        meta = self._meta(code)
+        with self._lock:
+            for entry in meta.values():
+                if entry['rows'] > rows:
+                    entry['rows'] = max(rows, 0)
+                    self._dirty.add(code)
+
+    def read(self, code: str, name: str, params: Any, start: int = 0,
+             stop: Optional[int] = None) -> Optional[np.ndarray]:
+        """只读取一个特征的指定行
+
+        Args:
+            code: 股票代码
+            name: 特征名
+            params: 特征参数
+            start: 起始行
+            stop: 结束行（不含），默认到最后一行有效值
+
+        Returns:
+            Optional[np.ndarray]: 特征值，特征不存在时返回None
+        """
+        key = self.feature_key(name, params)
+        entry = self._meta(code).get(key)
+        if not entry:
+            return None
+        rows = min(entry['rows'], self._file_rows(code, key))
+        stop = rows if stop is None else min(stop, rows)
+        start = min(max(start, 0), stop)
+        return np.fromfile(self.get_path(code, key), dtype=self.dtype,
+                           count=stop - start, offset=start * self.dtype.itemsize)
+
+    def features(self, code: str) -> List[Dict[str, Any]]:
+        """列出股票已存储的特征
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            List[Dict[str, Any]]: 特征元数据列表
+        """
+        return [dict(entry, key=key) for key, entry in self._meta(code).items()]
+
+    def prune(self, code: str, keep: Iterable[Tuple[str, Any]]) -> int:
+        """删除不在保留列表中的特征（如参数已变化的旧特征）
+
+        Args:
+            code: 股票代码
+            keep: 需要保留的（特征名, 参数）
+
+        Returns:
+            int: 删除的特征数
+        """
+        keep_keys = {self.feature_key(name, params) for name, params in keep}
+        meta = self._meta(code)
+        removed = 0
+        with self._lock:
+            for key in [key for key in meta if key not in keep_keys]:
+                meta.pop(key)
+                try:
+                    os.remove(self.get_path(code, key))
+                except FileNotFoundError:
+                    pass
+                removed += 1
+            if removed:
+                self._dirty.add(code)
+        return removed
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""共享内存行情总线模块
+
+此模块让多个策略进程共享同一路行情，包括：
+1. 行情进程在 multiprocessing.shared_memory 中创建环形缓冲区并写入推送
+2. 策略进程按名称映射同一块内存，以只读方式读取
+3. 每只股票的写入序号作为 seqlock，读取方据此得到一致的数据
+
+增加策略进程不会增加订阅流量和行情数据的内存占用。
+"""
+
+import json
+import time
+import struct
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from data.ring_buffer import RingBuffer
+
+# 元数据段：8字节长度 + JSON
+_META_HEADER = struct.Struct('<Q')
+_META_SIZE = 1 << 20
+
+
+def _open_segment(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    """打开或创建共享内存段
+
+    映射方不登记到 resource_tracker，避免映射方退出时删除行情进程的共享内存。
+
+    Args:
+        name: 共享内存名称
+        create: 是否创建
+        size: 创建时的字节数
+
+    Returns:
+        shared_memory.SharedMemory: 共享内存段
+    """
+    if create:
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 上次行情进程异常退出留下的共享内存
+            logger.warning(f"共享内存已存在，重新创建: {name}")
+            stale = _open_segment(name)
+            stale.close()
+            stale.unlink()
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数
+        segment = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        except Exception:
+            pass
+        return segment
+
+
+class MarketBus:
+    """共享内存行情总线"""
+
+    def __init__(self, name: str, ring: RingBuffer, data_segment: shared_memory.SharedMemory,
+                 meta_segment: shared_memory.SharedMemory, owner: bool = False):
+        """初始化总线，请使用 create / attach 创建
+
+        Args:
+            name: 总线名称
+            ring: 映射在共享内存上的环形缓冲区
+            data_segment: 数据段
+            meta_segment: 元数据段
+            owner: 是否为创建方（行情进程）
+        """
+        self.name = name
+        self.ring = ring
+        self.owner = owner
+        self._data_segment = data_segment
+        self._meta_segment = meta_segment
+
+    @staticmethod
+    def _map_arrays(segment: shared_memory.SharedMemory, layout: Dict[str, tuple],
+                    writeable: bool) -> Dict[str, np.ndarray]:
+        """把共享内存映射为环形缓冲区所需的数组
+
+        Args:
+            segment: 数据段
+            layout: RingBuffer.layout 返回的布局
+            writeable: 是否可写
+
+        Returns:
+            Dict[str, np.ndarray]: 数组名到数组的映射
+        """
+        arrays = {}
+        for name in ('heads', 'counts', 'versions', 'buffer'):
+            offset, shape, dtype = layout[name]
+            array = np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=offset)
+            array.flags.writeable = writeable
+            arrays[name] = array
+        return arrays
+
+    @classmethod
+    def create(cls, name: str, codes: Sequence[str], capacity: int, dtype: np.dtype,
+               vwap_period: Optional[int] = None) -> 'MarketBus':
+        """创建总线（行情进程调用）
+
+        Args:
+            name: 总线名称
+            codes: 股票代码列表
+            capacity: 每只股票保留的记录数
+            dtype: 记录类型
+            vwap_period: 记录类型含 vwap 字段时 VWAP 的滚动窗口长度，为空时按交易日锚定
+
+        Returns:
+            MarketBus: 总线
+        """
+        dtype = np.dtype(dtype)
+        layout = RingBuffer.layout(len(codes), capacity, dtype)
+        data_segment = _open_segment(f"{name}_data", create=True, size=layout['size'])
+        ring = RingBuffer(codes, capacity, dtype, cls._map_arrays(data_segment, layout, True), vwap_period)
+        ring.reset()
+
+        # 元数据最后写入，映射方看到元数据时数据段已初始化完成
+        meta = json.dumps({
+            'codes': list(codes),
+            'capacity': int(capacity),
+            'dtype': [list(field) for field in dtype.descr],
+            'created': time.time()
+        }).encode('utf-8')
+        meta_segment = _open_segment(f"{name}_meta", create=True, size=_META_SIZE)
+        meta_segment.buf[_META_HEADER.size:_META_HEADER.size + len(meta)] = meta
+        meta_segment.buf[:_META_HEADER.size] = _META_HEADER.pack(len(meta))
+
+        logger.info(f"行情总线已创建 - 名称: {name}, 股票数: {len(codes)}, "
+                    f"容量: {capacity}, 大小: {layout['size'] / 1024 / 1024:.1f}MB")
+        return cls(name, ring, data_segment, meta_segment, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, timeout: float = 0.0) -> 'MarketBus':
+        """映射已有的总线（策略进程调用），以只读方式访问
+
+        Args:
+            name: 总线名称
+            timeout: 等待行情进程创建总线的最长时间（秒）
+
+        Returns:
+            MarketBus: 总线
+
+        Raises:
+            FileNotFoundError: 超时后总线仍不存在
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                meta_segment = _open_segment(f"{name}_meta")
+                length = _META_HEADER.unpack(bytes(meta_segment.buf[:_META_HEADER.size]))[0]
+                if length:
+                    break
+                meta_segment.close()
+            except FileNotFoundError:
+                pass
+            if time.monotonic() >= deadline:
+                raise FileNotFoundError(f"行情总线不存在，请先启动行情进程: {name}")
+            time.sleep(0.5)
+
+        meta = json.loads(bytes(meta_segment.buf[_META_HEADER.size:_META_HEADER.size + length]).decode('utf-8'))
+        dtype = np.dtype([tuple(field) for field in meta['dtype']])
+        layout = RingBuffer.layout(len(meta['codes']), meta['capacity'], dtype)
+        data_segment = _open_segment(f"{name}_data")
+        ring = RingBuffer(meta['codes'], meta['capacity'], dtype,
+                          cls._map_arrays(data_segment, layout, False))
+
+        logger.info(f"已连接行情总线 - 名称: {name}, 股票数: {len(meta['codes'])}")
+        return cls(name, ring, data_segment, meta_segment, owner=False)
+
+    def close(self) -> None:
+        """断开映射，创建方同时删除共享内存"""
+        # 先释放对共享内存的引用，否则无法关闭
+        self.ring = None
+        for segment in (self._data_segment, self._meta_segment):
+            try:
+                segment.close()
+            except BufferError:
+                # 仍有数组引用这块内存，映射在进程退出时释放
+                logger.debug(f"共享内存仍被引用，延迟释放: {segment.name}")
+            try:
+                if self.owner:
+                    segment.unlink()
+            except Exception as e:
+                logger.warning(f"删除共享内存失败: {str(e)}")
+        logger.info(f"行情总线已关闭: {self.name}")
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""面板数据模块
+
+此模块负责把按股票组织的K线字典转换为（时间 × 股票）的二维面板，包括：
+1. 时间键和日期编码的统一转换
+2. 全市场数据一次性对齐
+3. 重复时间戳的识别
+"""
+
+from typing import Dict, List, Any, Optional, Sequence
+
+import numpy as np
+
+# K线字段
+PRICE_FIELDS = ['open', 'high', 'low', 'close']
+BAR_FIELDS = PRICE_FIELDS + ['volume', 'amount']
+
+# 行情时间戳（毫秒）相对UTC的时区偏移：北京时间 +8 小时
+TZ_OFFSET_MS = 8 * 3600 * 1000
+MS_PER_DAY = 86400 * 1000
+
+# A股每个交易日的连续竞价分钟数（9:30-11:30、13:00-15:00）
+SESSION_MINUTES = 240
+
+
+def to_time_keys(values: Any) -> np.ndarray:
+    """将时间序列统一转换为 int64 时间键
+
+    支持毫秒时间戳、YYYYMMDD 整数、'YYYYMMDD' 字符串和 datetime64（按北京时间解释）。
+
+    Args:
+        values: 时间序列
+
+    Returns:
+        np.ndarray: int64 时间键
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind in 'iu':
+        return arr.astype(np.int64, copy=False)
+    if arr.dtype.kind == 'f':
+        return arr.astype(np.int64)
+    if arr.dtype.kind == 'M':
+        return arr.astype('datetime64[ms]').astype(np.int64) - TZ_OFFSET_MS
+    # 字符串：去掉分隔符后按整数解析
+    return np.array([int(str(v).replace('-', '').replace(':', '').replace(' ', '')) for v in arr],
+                    dtype=np.int64)
+
+
+def _to_epoch_ms(keys: np.ndarray) -> Optional[np.ndarray]:
+    """把时间戳类的时间键统一为毫秒，YYYYMMDD 返回 None"""
+    if keys.size == 0:
+        return keys
+    sample = int(np.abs(keys).max())
+    if sample < 100000000:
+        return None
+    if sample < 100000000000:
+        # 秒级时间戳
+        return keys * 1000
+    return keys
+
+
+def to_date_codes(time_keys: Any) -> np.ndarray:
+    """将时间键转换为 int32 日期编码（YYYYMMDD）
+
+    Args:
+        time_keys: 时间键序列，毫秒/秒时间戳或 YYYYMMDD 整数
+
+    Returns:
+        np.ndarray: int32 日期编码
+    """
+    keys = to_time_keys(time_keys)
+    ms = _to_epoch_ms(keys)
+    if ms is None or keys.size == 0:
+        # 已经是 YYYYMMDD
+        return keys.astype(np.int32)
+
+    days = ((ms + TZ_OFFSET_MS) // MS_PER_DAY).astype('datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    months = days.astype('datetime64[M]')
+    year = years.astype(np.int64) + 1970
+    month = (months - years).astype(np.int64) + 1
+    day = (days - months).astype(np.int64) + 1
+    return (year * 10000 + month * 100 + day).astype(np.int32)
+
+
+def to_datetime64(time_keys: Any) -> np.ndarray:
+    """将时间键转换为北京时间的 datetime64[ms]
+
+    Args:
+        time_keys: 时间键序列，毫秒/秒时间戳或 YYYYMMDD 整数
+
+    Returns:
+        np.ndarray: datetime64[ms] 数组
+    """
+    keys = to_time_keys(time_keys)
+    ms = _to_epoch_ms(keys)
+    if ms is None:
+        codes = keys.astype(np.int64)
+        years = (codes // 10000 - 1970).astype('datetime64[Y]')
+        months = years.astype('datetime64[M]') + (codes // 100 % 100 - 1)
+        days = months.astype('datetime64[D]') + (codes % 100 - 1)
+        return days.astype('datetime64[ms]')
+    return (ms + TZ_OFFSET_MS).astype('datetime64[ms]')
+
+
+def bars_per_session(period: str) -> int:
+    """每个交易日的K线数
+
+    Args:
+        period: K线周期，如 '1d'、'1m'、'5m'、'1h'、'tick'
+
+    Returns:
+        int: K线数，日线及以上为 1
+    """
+    text = str(period).lower()
+    if text == 'tick':
+        # 分笔快照约每 3 秒一笔
+        return SESSION_MINUTES * 20
+    unit = text.lstrip('0123456789')
+    count = int(text[:len(text) - len(unit)] or 1)
+    if unit == 'm':
+        return -(-SESSION_MINUTES // count)
+    if unit == 'h':
+        return -(-SESSION_MINUTES // (count * 60))
+    return 1
+
+
+class BarPanel:
+    """K线面板（时间 × 股票）
+
+    Attributes:
+        codes: 股票代码列表，对应列
+        times: int64 时间键，对应行（升序、唯一）
+        fields: 字段名到二维数组的映射，缺失位置为 NaN
+        present: 每个（时间, 股票）是否有K线
+        duplicated: 每个（时间, 股票）是否出现过重复时间戳
+        missing_fields: 每只股票缺失的字段列表
+    """
+
+    def __init__(
+        self,
+        codes: List[str],
+        times: np.ndarray,
+        fields: Dict[str, np.ndarray],
+        present: np.ndarray,
+        duplicated: Optional[np.ndarray] = None,
+        missing_fields: Optional[Dict[str, List[str]]] = None
+    ):
+        """初始化面板
+
+        Args:
+            codes: 股票代码列表
+            times: 时间键
+            fields: 字段二维数组
+            present: K线存在掩码
+            duplicated: 重复时间戳掩码
+            missing_fields: 缺失字段
+        """
+        self.codes = codes
+        self.times = times
+        self.fields = fields
+        self.present = present
+        self.duplicated = duplicated if duplicated is not None else np.zeros_like(present)
+        self.missing_fields = missing_fields or {}
+        self.code_index = {code: i for i, code in enumerate(codes)}
+
+        # 原始逐条记录到面板位置的映射，用于把面板结果回写到原始数据
+        self.entry_rows = np.empty(0, dtype=np.int64)
+        self.entry_cols = np.empty(0, dtype=np.int64)
+        self.entry_dup = np.empty(0, dtype=bool)
+        self.entry_offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+
+    @property
+    def shape(self) -> tuple:
+        """面板形状（时间数, 股票数）"""
+        return self.present.shape
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """按字段获取二维数组"""
+        return self.fields[field]
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.fields
+
+    def date_codes(self) -> np.ndarray:
+        """获取每行的日期编码
+
+        Returns:
+            np.ndarray: int32 日期编码
+        """
+        return to_date_codes(self.times)
+
+    def column(self, code: str, field: str) -> np.ndarray:
+        """获取单只股票某字段的列视图
+
+        Args:
+            code: 股票代码
+            field: 字段名
+
+        Returns:
+            np.ndarray: 一维视图
+        """
+        return self.fields[field][:, self.code_index[code]]
+
+    def symbol(self, code: str) -> Dict[str, np.ndarray]:
+        """获取单只股票所有字段的列视图
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            Dict[str, np.ndarray]: 字段到一维视图的映射
+        """
+        col = self.code_index[code]
+        return {field: values[:, col] for field, values in self.fields.items()}
+
+    def recent_rows(self, lag: int = 0) -> np.ndarray:
+        """获取每只股票倒数第 lag+1 根实际存在的K线所在的行
+
+        停牌等缺失的K线不计入，因此各股票的"最新"K线可以位于不同的行。
+
+        Args:
+            lag: 0 表示最新一根，1 表示前一根，依此类推
+
+        Returns:
+            np.ndarray: 每只股票的行号，K线不足时为 -1
+        """
+        ranks = np.cumsum(self.present, axis=0)
+        target = ranks[-1] - lag if len(ranks) else np.zeros(len(self.codes), dtype=np.int64)
+        hit = self.present & (ranks == target[None, :])
+        return np.where((target > 0) & hit.any(axis=0), hit.argmax(axis=0), -1)
+
+    def recent(self, field: str, lag: int = 0) -> np.ndarray:
+        """获取每只股票倒数第 lag+1 根K线的字段值
+
+        Args:
+            field: 字段名
+            lag: 0 表示最新一根，1 表示前一根，依此类推
+
+        Returns:
+            np.ndarray: 每只股票一个值，K线不足时为 NaN
+        """
+        rows = self.recent_rows(lag)
+        values = np.full(len(self.codes), np.nan)
+        valid = rows >= 0
+        values[valid] = self.fields[field][rows[valid], np.flatnonzero(valid)]
+        return values
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: Dict[str, Any],
+        fields: Optional[Sequence[str]] = None,
+        dtype: Any = np.float64
+    ) -> 'BarPanel':
+        """把按股票组织的K线字典一次性对齐为面板
+
+        Args:
+            data: K线数据字典，键为股票代码，值为字段到序列的映射
+            fields: 需要对齐的字段，默认 BAR_FIELDS
+            dtype: 字段数组的数据类型
+
+        Returns:
+            BarPanel: 面板数据
+        """
+        fields = list(fields or BAR_FIELDS)
+        codes = []
+        time_parts = []
+        missing_fields = {}
+        for code, stock_data in data.items():
+            codes.append(code)
+            if stock_data is None or 'time' not in stock_data:
+                time_parts.append(np.empty(0, dtype=np.int64))
+                missing_fields[code] = ['time'] + fields
+                continue
+            time_parts.append(to_time_keys(stock_data['time']))
+
+        n_codes = len(codes)
+        lengths = np.array([len(t) for t in time_parts], dtype=np.int64)
+        offsets = np.zeros(n_codes + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # 所有股票时间轴完全一致（升序无重复）时直接按列拼接，省去排序和散射写入
+        aligned = False
+        if n_codes and lengths[0] and np.all(lengths == lengths[0]):
+            stacked_times = np.stack(time_parts)
+            aligned = bool((stacked_times == stacked_times[0]).all() and np.all(np.diff(stacked_times[0]) > 0))
+
+        entry_cols = np.repeat(np.arange(n_codes, dtype=np.int64), lengths)
+        if aligned:
+            times = stacked_times[0]
+            n_times = len(times)
+            entry_rows = np.tile(np.arange(n_times, dtype=np.int64), n_codes)
+            entry_dup = np.zeros(len(entry_rows), dtype=bool)
+            present = np.ones((n_times, n_codes), dtype=bool)
+            duplicated = np.zeros((n_times, n_codes), dtype=bool)
+        else:
+            all_times = np.concatenate(time_parts) if time_parts else np.empty(0, dtype=np.int64)
+            times, entry_rows = np.unique(all_times, return_inverse=True)
+            entry_rows = entry_rows.reshape(-1).astype(np.int64)
+            n_times = len(times)
+
+            # 同一（时间, 股票）出现多次：保留最后一条，其余记为重复
+            flat = entry_rows * max(n_codes, 1) + entry_cols
+            order = np.argsort(flat, kind='stable')
+            sorted_flat = flat[order]
+            entry_dup = np.zeros(len(flat), dtype=bool)
+            entry_dup[order[:-1]] = sorted_flat[1:] == sorted_flat[:-1]
+
+            present = np.zeros((n_times, n_codes), dtype=bool)
+            present[entry_rows[~entry_dup], entry_cols[~entry_dup]] = True
+            duplicated = np.zeros((n_times, n_codes), dtype=bool)
+            duplicated[entry_rows[entry_dup], entry_cols[entry_dup]] = True
+        keep = ~entry_dup
+
+        panel_fields = {}
+        for field in fields:
+            parts = []
+            for i, code in enumerate(codes):
+                stock_data = data[code]
+                part = None
+                if code not in missing_fields or field not in missing_fields[code]:
+                    if field in stock_data:
+                        part = np.asarray(stock_data[field])
+                    if part is None or len(part) != lengths[i]:
+                        missing_fields.setdefault(code, []).append(field)
+                        part = None
+                parts.append(part if part is not None else np.full(lengths[i], np.nan))
+            if aligned:
+                values = np.stack(parts, axis=1).astype(dtype, copy=False)
+            else:
+                values = np.full((n_times, n_codes), np.nan, dtype=dtype)
+                if parts:
+                    flat_values = np.concatenate(parts)
+                    values[entry_rows[keep], entry_cols[keep]] = flat_values[keep]
+            panel_fields[field] = values
+
+        panel = cls(codes, times, panel_fields, present, duplicated, missing_fields)
+        panel.entry_rows = entry_rows
+        panel.entry_cols = entry_cols
+        panel.entry_dup = entry_dup
+        panel.entry_offsets = offsets
+        return panel
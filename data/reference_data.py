@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""参考数据存储模块
+
+此模块在本地保存股票的股本、上市日期和ST状态历史，包括：
+1. 股本变动历史：每次变动的生效日期、流通股本和总股本
+2. 上市日期和ST区间（含 *ST）
+3. 向量化的时点（as-of）关联：对整个（时间 × 股票）面板一次 searchsorted，
+   每根K线只使用当日已经生效的股本和ST状态，避免未来数据
+4. 批量计算换手率、总市值和流通市值，不在逐根K线时查询合约信息
+
+日期均为 YYYYMMDD 整数。数据由 DataFetcher.get_reference_data 从 xtdata 获取后写入，
+存储本身不依赖 xtquant。
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from data.panel import to_date_codes
+
+# 组合键中日期所占的位数（股票列号 * DATE_SPAN + YYYYMMDD）
+DATE_SPAN = 100000000
+
+# 可做时点关联的股本字段
+CAPITAL_FIELDS = ('float_shares', 'total_shares')
+
+
+class ReferenceDataStore:
+    """股票参考数据存储
+
+    数据保存在 {root}/reference.json，每只股票一条记录：
+    股本变动（date、float_shares、total_shares 三个等长列表）、上市日期 list_date、
+    ST区间 st（[开始日期, 结束日期] 列表，结束日期 0 表示至今）和更新日期 updated。
+    """
+
+    FILE_NAME = 'reference.json'
+
+    def __init__(self, root: str):
+        """初始化存储
+
+        Args:
+            root: 存储目录
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = self._load()
+        self._capital_cache: Dict[str, Tuple[np.ndarray, Dict[str, np.ndarray]]] = {}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """加载存储文件
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 股票代码到参考数据的映射
+        """
+        path = os.path.join(self.root, self.FILE_NAME)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取参考数据失败，将重新获取: {str(e)}")
+        return {}
+
+    def flush(self) -> None:
+        """原子写入存储文件"""
+        path = os.path.join(self.root, self.FILE_NAME)
+        tmp_path = path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.records, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def codes(self) -> List[str]:
+        """已保存参考数据的股票代码"""
+        return list(self.records)
+
+    def stale_codes(self, codes: Sequence[str], max_age_days: int = 7) -> List[str]:
+        """没有参考数据或超过 max_age_days 天未更新的股票
+
+        Args:
+            codes: 股票代码列表
+            max_age_days: 最长更新间隔（自然日）
+
+        Returns:
+            List[str]: 需要重新获取的股票代码
+        """
+        today = datetime.now()
+        stale = []
+        for code in codes:
+            updated = (self.records.get(code) or {}).get('updated')
+            if not updated or (today - datetime.strptime(str(updated), '%Y%m%d')).days > max_age_days:
+                stale.append(code)
+        return stale
+
+    def update(self, code: str, capital: Optional[Dict[str, Sequence[Any]]] = None,
+               list_date: Optional[int] = None, st_periods: Optional[Sequence[Sequence[int]]] = None) -> None:
+        """写入一只股票的参考数据，未提供的部分保持不变
+
+        Args:
+            code: 股票代码
+            capital: 股本变动，包含 date（生效日期）、float_shares、total_shares 三个等长序列，
+                     同一生效日期保留最后一条
+            list_date: 上市日期
+            st_periods: ST区间 [开始日期, 结束日期]，结束日期 0 表示至今
+        """
+        with self._lock:
+            record = dict(self.records.get(code) or {})
+            if capital is not None:
+                dates = np.asarray(capital['date'], dtype=np.int64)
+                order = np.argsort(dates, kind='stable')
+                dates = dates[order]
+                # 同一日期多条记录时保留排序后的最后一条
+                last = np.ones(len(dates), dtype=bool)
+                last[:-1] = dates[1:] != dates[:-1]
+                record['capital'] = {'date': dates[last].tolist()}
+                for field in CAPITAL_FIELDS:
+                    values = np.asarray(capital.get(field, np.full(len(order), np.nan)), dtype=np.float64)[order]
+                    record['capital'][field] = [None if np.isnan(v) else float(v) for v in values[last]]
+            if list_date is not None:
+                record['list_date'] = int(list_date)
+            if st_periods is not None:
+                record['st'] = sorted([int(start), int(end or 0)] for start, end in st_periods)
+            record['updated'] = int(datetime.now().strftime('%Y%m%d'))
+            self.records[code] = record
+            self._capital_cache.pop(code, None)
+
+    def _capital(self, code: str) -> Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """股本变动的数组形式（生效日期, 字段到数组的映射）"""
+        cached = self._capital_cache.get(code)
+        if cached is not None:
+            return cached
+        capital = (self.records.get(code) or {}).get('capital')
+        if not capital or not capital.get('date'):
+            return None
+        dates = np.asarray(capital['date'], dtype=np.int64)
+        values = {field: np.array([np.nan if v is None else v for v in capital.get(field, [])], dtype=np.float64)
+                  for field in CAPITAL_FIELDS}
+        cached = self._capital_cache[code] = (dates, values)
+        return cached
+
+    def asof(self, field: str, codes: Sequence[str], time_keys: Any) -> np.ndarray:
+        """把股本字段按时点关联到（时间 × 股票）面板
+
+        所有股票的变动日期拼接为（列号, 日期）组合键后一次 searchsorted，
+        每个位置取当日（含）之前最后一次生效的值。
+
+        Args:
+            field: 股本字段（float_shares 或 total_shares）
+            codes: 股票代码列表，对应列
+            time_keys: 时间键序列，对应行
+
+        Returns:
+            np.ndarray: 二维数组，首次生效之前或没有数据的位置为 NaN
+        """
+        if field not in CAPITAL_FIELDS:
+            raise ValueError(f"不支持的股本字段: {field}")
+        dates = to_date_codes(time_keys).astype(np.int64)
+        result = np.full((len(dates), len(codes)), np.nan)
+        key_parts, value_parts = [], []
+        for col, code in enumerate(codes):
+            capital = self._capital(code)
+            if capital is not None:
+                key_parts.append(capital[0] + col * DATE_SPAN)
+                value_parts.append(capital[1][field])
+        if not key_parts or len(dates) == 0:
+            return result
+
+        keys = np.concatenate(key_parts)
+        values = np.concatenate(value_parts)
+        cols = np.arange(len(codes), dtype=np.int64)
+        query = dates[:, None] + cols[None, :] * DATE_SPAN
+        idx = np.searchsorted(keys, query, side='right') - 1
+        # 命中的记录必须属于同一列（否则是前一只股票的记录或该股票尚未生效）
+        valid = (idx >= 0) & (keys[np.maximum(idx, 0)] // DATE_SPAN == cols[None, :])
+        result[valid] = values[idx[valid]]
+        return result
+
+    def asof_column(self, code: str, field: str, time_keys: Any) -> np.ndarray:
+        """单只股票的时点关联，返回一维数组"""
+        return self.asof(field, [code], time_keys)[:, 0]
+
+    def is_st(self, codes: Sequence[str], time_keys: Any) -> np.ndarray:
+        """每个（时间, 股票）是否处于ST状态
+
+        Args:
+            codes: 股票代码列表
+            time_keys: 时间键序列
+
+        Returns:
+            np.ndarray: 二维布尔数组
+        """
+        dates = to_date_codes(time_keys).astype(np.int64)
+        result = np.zeros((len(dates), len(codes)), dtype=bool)
+        starts, ends = [], []
+        for col, code in enumerate(codes):
+            for start, end in (self.records.get(code) or {}).get('st', []):
+                starts.append(start + col * DATE_SPAN)
+                ends.append((end or DATE_SPAN - 1) + col * DATE_SPAN)
+        if not starts or len(dates) == 0:
+            return result
+
+        order = np.argsort(starts)
+        starts = np.asarray(starts, dtype=np.int64)[order]
+        ends = np.asarray(ends, dtype=np.int64)[order]
+        query = dates[:, None] + np.arange(len(codes), dtype=np.int64)[None, :] * DATE_SPAN
+        idx = np.searchsorted(starts, query, side='right') - 1
+        safe = np.maximum(idx, 0)
+        return (idx >= 0) & (query <= ends[safe]) & (starts[safe] // DATE_SPAN == query // DATE_SPAN)
+
+    def list_dates(self, codes: Sequence[str]) -> np.ndarray:
+        """每只股票的上市日期，未知时为 0"""
+        return np.array([(self.records.get(code) or {}).get('list_date') or 0 for code in codes], dtype=np.int64)
+
+    def listed_days(self, codes: Sequence[str], time_keys: Any) -> np.ndarray:
+        """每个（时间, 股票）距上市日期的自然日数，上市日期未知时为 NaN
+
+        Args:
+            codes: 股票代码列表
+            time_keys: 时间键序列
+
+        Returns:
+            np.ndarray: 二维数组
+        """
+        dates = to_date_codes(time_keys)
+        list_dates = self.list_dates(codes)
+        result = np.full((len(dates), len(codes)), np.nan)
+        known = list_dates > 0
+        if not known.any() or len(dates) == 0:
+            return result
+        days = _date_codes_to_days(dates)
+        result[:, known] = days[:, None] - _date_codes_to_days(list_dates[known])[None, :]
+        return result
+
+    def turnover_rate(self, codes: Sequence[str], time_keys: Any, volume: np.ndarray) -> np.ndarray:
+        """换手率（%）= 成交量（手）* 100 / 当日流通股本 * 100
+
+        Args:
+            codes: 股票代码列表
+            time_keys: 时间键序列
+            volume: 成交量，二维（时间 × 股票）或单只股票时的一维数组
+
+        Returns:
+            np.ndarray: 与 volume 形状相同，流通股本未知的位置为 NaN
+        """
+        volume = np.asarray(volume, dtype=np.float64)
+        shares = self.asof('float_shares', codes, time_keys)
+        if volume.ndim == 1:
+            shares = shares[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return volume * 100 / shares * 100
+
+    def market_cap(self, codes: Sequence[str], time_keys: Any, close: np.ndarray,
+                   field: str = 'total_shares') -> np.ndarray:
+        """市值 = 收盘价 * 当日股本
+
+        Args:
+            codes: 股票代码列表
+            time_keys: 时间键序列
+            close: 收盘价，二维（时间 × 股票）或单只股票时的一维数组
+            field: total_shares 为总市值，float_shares 为流通市值
+
+        Returns:
+            np.ndarray: 与 close 形状相同
+        """
+        close = np.asarray(close, dtype=np.float64)
+        shares = self.asof(field, codes, time_keys)
+        return close * (shares[:, 0] if close.ndim == 1 else shares)
+
+    def join(self, panel: Any) -> Any:
+        """把股本、换手率、市值和ST状态作为字段加入面板（原地修改并返回）
+
+        新增字段：float_shares、total_shares、turnover_rate、market_cap、float_market_cap、is_st。
+
+        Args:
+            panel: BarPanel，需要 close 和 volume 字段
+
+        Returns:
+            Any: 同一个面板
+        """
+        for field in CAPITAL_FIELDS:
+            panel.fields[field] = self.asof(field, panel.codes, panel.times)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if 'volume' in panel.fields:
+                panel.fields['turnover_rate'] = panel.fields['volume'] * 100 / panel.fields['float_shares'] * 100
+            if 'close' in panel.fields:
+                panel.fields['market_cap'] = panel.fields['close'] * panel.fields['total_shares']
+                panel.fields['float_market_cap'] = panel.fields['close'] * panel.fields['float_shares']
+        panel.fields['is_st'] = self.is_st(panel.codes, panel.times)
+        return panel
+
+
+def _date_codes_to_days(date_codes: np.ndarray) -> np.ndarray:
+    """YYYYMMDD 转换为自1970年起的天数"""
+    codes = np.asarray(date_codes, dtype=np.int64)
+    months = (codes // 10000 - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (codes // 100 % 100 - 1)
+    return (months.astype('datetime64[D]') + (codes % 100 - 1)).astype(np.int64)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""行情环形缓冲区模块
+
+此模块实现实盘行情的内存环形缓冲区，包括：
+1. 整个标的池共用一块预分配的结构化数组（股票 × 容量）
+2. 行情回调直接写入，不产生新的数组
+3. 读取最近N条记录：window 返回零拷贝视图；snapshot 按 seqlock 返回一致的副本
+4. 可选地随每条K线推送增量更新 VWAP（IncrementalVWAP），写入记录的 vwap 字段，策略不必在窗口上重算
+
+每条记录写入两次（槽位 i 和 i + 容量），因此任意最近N条记录在内存中总是连续的。
+时间与最后一条相同的推送原地改写最后一条，零拷贝视图中的最后一条会随之变化，
+需要一致数据的读取方（策略取数、最新记录）使用副本。
+"""
+
+import time
+import threading
+from typing import Dict, List, Any, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from data.panel import to_time_keys, to_date_codes
+from utils.indicators import IncrementalVWAP
+
+# K线记录
+BAR_DTYPE = np.dtype([
+    ('time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+    ('amount', np.float64)
+])
+
+# 分笔记录（一档盘口）
+TICK_DTYPE = np.dtype([
+    ('time', np.int64),
+    ('lastPrice', np.float64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('lastClose', np.float64),
+    ('volume', np.float64),
+    ('amount', np.float64),
+    ('askPrice1', np.float64),
+    ('askVol1', np.float64),
+    ('bidPrice1', np.float64),
+    ('bidVol1', np.float64)
+])
+
+# 推送路径增量计算的 VWAP 字段
+VWAP_FIELD = 'vwap'
+
+# 盘口字段：xtdata 推送为五档列表，缓冲区只保留一档
+LEVEL1_FIELDS = {
+    'askPrice1': 'askPrice',
+    'askVol1': 'askVol',
+    'bidPrice1': 'bidPrice',
+    'bidVol1': 'bidVol'
+}
+
+
+def record_dtype(period: str, compact: Any = None, vwap: bool = False) -> np.dtype:
+    """获取周期对应的记录类型
+
+    Args:
+        period: 周期，'tick' 为分笔，其余为K线
+        compact: 紧凑数据类型（CompactSchema），启用时价格和成交量使用紧凑类型
+        vwap: K线记录是否附带增量计算的 VWAP 字段
+
+    Returns:
+        np.dtype: 记录类型
+    """
+    base = TICK_DTYPE if period == 'tick' else BAR_DTYPE
+    if vwap and period != 'tick':
+        base = np.dtype(base.descr + [(VWAP_FIELD, np.float64)])
+    if compact is None or not compact.enabled:
+        return base
+    return np.dtype([(name, base[name] if name == 'time' else compact.field_dtype(name))
+                     for name in base.names])
+
+
+class RingBuffer:
+    """标的池行情环形缓冲区
+
+    Attributes:
+        codes: 股票代码列表，对应行
+        capacity: 每只股票保留的记录数
+        vwap: 增量 VWAP，随每条K线推送更新并写入记录的 vwap 字段，None 表示不计算
+        counts: 每只股票已有的记录数（不超过容量）
+        versions: 每只股票的写入序号（seqlock），写入期间为奇数，可用于判断是否有新数据
+    """
+
+    def __init__(
+        self,
+        codes: Sequence[str],
+        capacity: int,
+        dtype: np.dtype = BAR_DTYPE,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+        vwap_period: Optional[int] = None
+    ):
+        """初始化缓冲区
+
+        Args:
+            codes: 股票代码列表
+            capacity: 每只股票保留的记录数
+            dtype: 记录类型
+            arrays: 外部提供的 buffer/heads/counts/versions 数组（如共享内存），默认自行分配
+            vwap_period: 记录类型含 vwap 字段时 VWAP 的滚动窗口长度，为空时按交易日锚定
+        """
+        self.codes = list(codes)
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+
+        n = len(self.codes)
+        allocated = arrays is None
+        if allocated:
+            arrays = {
+                'buffer': np.empty((n, 2 * self.capacity), dtype=self.dtype),
+                'heads': np.empty(n, dtype=np.int64),
+                'counts': np.empty(n, dtype=np.int64),
+                'versions': np.empty(n, dtype=np.int64)
+            }
+        self._buffer = arrays['buffer']
+        self.heads = arrays['heads']        # 下一条记录写入的槽位
+        self.counts = arrays['counts']
+        self.versions = arrays['versions']
+        if allocated:
+            self.reset()
+
+        # 预先取出各字段视图，写入时不再创建视图对象
+        self._fields = {name: self._buffer[name] for name in self.dtype.names}
+        self._time = self._fields['time']
+        # 写入时先组装完整记录，再整条写入槽位
+        self._record = np.empty(1, dtype=self.dtype)
+        self._lock = threading.Lock()
+        # 映射他人写入的缓冲区（只读）时由写入方计算
+        self.vwap = None
+        if VWAP_FIELD in self.dtype.names and self._buffer.flags.writeable:
+            self.vwap = IncrementalVWAP(n, vwap_period)
+
+    @staticmethod
+    def layout(n_codes: int, capacity: int, dtype: np.dtype) -> Dict[str, tuple]:
+        """计算各数组在一块连续内存中的布局
+
+        Args:
+            n_codes: 股票数
+            capacity: 每只股票保留的记录数
+            dtype: 记录类型
+
+        Returns:
+            Dict[str, tuple]: 数组名到（偏移, 形状, 数据类型）的映射，'size' 为总字节数
+        """
+        dtype = np.dtype(dtype)
+        layout = {}
+        offset = 0
+        for name, shape, array_dtype in (('heads', (n_codes,), np.dtype(np.int64)),
+                                         ('counts', (n_codes,), np.dtype(np.int64)),
+                                         ('versions', (n_codes,), np.dtype(np.int64)),
+                                         ('buffer', (n_codes, 2 * capacity), dtype)):
+            layout[name] = (offset, shape, array_dtype)
+            offset += int(np.prod(shape)) * array_dtype.itemsize
+        layout['size'] = max(offset, 1)
+        return layout
+
+    def reset(self) -> None:
+        """清空缓冲区"""
+        self._buffer.fill(0)
+        for name in self.dtype.names:
+            if self.dtype[name].kind == 'f':
+                self._buffer[name] = np.nan
+        self.heads.fill(0)
+        self.counts.fill(0)
+        self.versions.fill(0)
+
+    def _write(self, row: int, slot: int, record: Dict[str, Any], replace: bool = False) -> None:
+        """把一条记录写入槽位及其镜像槽位（在写锁内调用）
+
+        Args:
+            row: 股票行号
+            slot: 槽位
+            record: 字段到值的映射
+            replace: 是否改写最后一条（用于增量 VWAP）
+        """
+        staged = self._record
+        for name in self.dtype.names:
+            value = record.get(name)
+            if value is None and name in LEVEL1_FIELDS:
+                levels = record.get(LEVEL1_FIELDS[name])
+                value = levels[0] if levels else None
+            if value is None:
+                value = np.nan if self.dtype[name].kind == 'f' else 0
+            staged[name] = value
+        if self.vwap is not None:
+            session = to_date_codes(staged['time'])
+            staged[VWAP_FIELD] = self.vwap.update(staged['close'], staged['volume'], session,
+                                                  replace, rows=row)
+        self._buffer[row, slot] = staged[0]
+        self._buffer[row, slot + self.capacity] = staged[0]
+
+    def append(self, code: str, record: Dict[str, Any]) -> bool:
+        """追加一条记录
+
+        时间与最后一条相同的记录（如盘中不断更新的当日K线）覆盖最后一条。
+
+        Args:
+            code: 股票代码
+            record: 字段到值的映射，缺失的字段写为 NaN
+
+        Returns:
+            bool: 股票是否在缓冲区中
+        """
+        row = self.code_index.get(code)
+        if row is None:
+            return False
+        time_key = record.get('time', 0)
+        with self._lock:
+            self.versions[row] += 1
+            head = self.heads[row]
+            last = (head - 1) % self.capacity
+            if self.counts[row] and self._time[row, last] == time_key:
+                self._write(row, last, record, replace=True)
+            else:
+                self._write(row, head, record)
+                self.heads[row] = (head + 1) % self.capacity
+                if self.counts[row] < self.capacity:
+                    self.counts[row] += 1
+            self.versions[row] += 1
+        return True
+
+    def extend(self, code: str, stock_data: Any) -> int:
+        """批量追加记录（用于启动时用历史数据预热）
+
+        计算增量 VWAP 时，该股票的 VWAP 状态按这批K线重建。
+
+        Args:
+            code: 股票代码
+            stock_data: 字段到序列的映射或DataFrame，须包含 time
+
+        Returns:
+            int: 写入的记录数
+        """
+        row = self.code_index.get(code)
+        if row is None or stock_data is None or 'time' not in stock_data:
+            return 0
+        times = to_time_keys(stock_data['time'])
+        m = min(len(times), self.capacity)
+        if m == 0:
+            return 0
+        with self._lock:
+            self.versions[row] += 1
+            slots = (self.heads[row] + np.arange(m)) % self.capacity
+            for name, values in self._fields.items():
+                if name == 'time':
+                    column = times[-m:]
+                elif name in stock_data:
+                    column = np.asarray(stock_data[name])[-m:]
+                else:
+                    continue
+                values[row, slots] = column
+                values[row, slots + self.capacity] = column
+            if self.vwap is not None and 'close' in stock_data and 'volume' in stock_data:
+                column = self.vwap.load(row, np.asarray(stock_data['close'], dtype=np.float64),
+                                        np.asarray(stock_data['volume'], dtype=np.float64),
+                                        to_date_codes(times))[-m:]
+                self._fields[VWAP_FIELD][row, slots] = column
+                self._fields[VWAP_FIELD][row, slots + self.capacity] = column
+            self.heads[row] = (self.heads[row] + m) % self.capacity
+            self.counts[row] = min(self.counts[row] + m, self.capacity)
+            self.versions[row] += 1
+        return m
+
+    def window(self, code: str, n: Optional[int] = None) -> np.ndarray:
+        """获取最近N条记录的零拷贝视图（按时间升序）
+
+        视图直接引用缓冲区，在之后写入超过 capacity - N 条记录前保持有效；
+        最后一条会被时间相同的推送原地改写，需要一致数据时使用 snapshot。
+
+        Args:
+            code: 股票代码
+            n: 记录数，默认全部已有记录
+
+        Returns:
+            np.ndarray: 结构化数组视图
+        """
+        row = self.code_index[code]
+        count = int(self.counts[row])
+        n = count if n is None else min(int(n), count)
+        end = int(self.heads[row]) + self.capacity
+        return self._buffer[row, end - n:end]
+
+    def window_dict(self, code: str, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """以字段到视图的映射获取最近N条记录
+
+        Args:
+            code: 股票代码
+            n: 记录数，默认全部已有记录
+
+        Returns:
+            Dict[str, np.ndarray]: 字段到一维视图的映射
+        """
+        window = self.window(code, n)
+        return {name: window[name] for name in self.dtype.names}
+
+    def snapshot(self, code: str, n: Optional[int] = None, retries: int = 100) -> np.ndarray:
+        """获取最近N条记录的一致副本
+
+        按 seqlock 协议读取：写入序号为奇数（正在写入）或读取前后不一致时让出CPU后重读，
+        适用于其他线程或进程正在写入的缓冲区；本进程的写入持有写锁，读取时同样持有，第一次即可读到一致的数据。
+
+        Args:
+            code: 股票代码
+            n: 记录数，默认全部已有记录
+            retries: 最大重读次数
+
+        Returns:
+            np.ndarray: 结构化数组副本
+        """
+        row = self.code_index[code]
+        window = None
+        for _ in range(retries):
+            with self._lock:
+                version = int(self.versions[row])
+                if not version & 1:
+                    window = self.window(code, n).copy()
+                    if int(self.versions[row]) == version:
+                        return window
+            time.sleep(0)
+        logger.warning(f"行情缓冲区读取冲突次数过多 - 代码: {code}")
+        return window if window is not None else self.window(code, n).copy()
+
+    def latest(self, code: str) -> Optional[np.void]:
+        """获取最新一条记录的一致副本
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            Optional[np.void]: 最新记录，没有数据时返回None
+        """
+        row = self.code_index.get(code)
+        if row is None or self.counts[row] == 0:
+            return None
+        snapshot = self.snapshot(code, 1)
+        return snapshot[0] if len(snapshot) else None
+
+    def ready_codes(self) -> List[str]:
+        """获取已有数据的股票
+
+        Returns:
+            List[str]: 股票代码列表
+        """
+        return [self.codes[i] for i in np.flatnonzero(self.counts)]
+
+    def on_quote(self, datas: Dict[str, Any]) -> None:
+        """xtdata.subscribe_quote 的回调
+
+        Args:
+            datas: 股票代码到推送记录（单条字典或字典列表）的映射
+        """
+        try:
+            for code, records in datas.items():
+                if isinstance(records, dict):
+                    self.append(code, records)
+                else:
+                    for record in records:
+                        self.append(code, record)
+        except Exception as e:
+            logger.error(f"行情写入缓冲区失败: {str(e)}")
@@ -7,12 +7,14 @@
 1. 解析命令行参数
 2. 加载配置文件
 3. 初始化日志系统
-4. 根据运行模式（回测/实盘）启动相应的引擎
+4. 根据运行模式（回测/实盘/增量更新/行情进程）启动相应的引擎
 
 使用示例：
     通用策略：
         回测模式：python main.py --mode backtest --strategy example_strategy
         实盘模式：python main.py --mode live --strategy example_strategy
+        收盘后增量更新：python main.py --mode update --strategy example_strategy
+        共享行情进程：python main.py --mode feed --strategy example_strategy
     
     首板打板策略：
         回测模式：python main.py --mode backtest --strategy first_board_strategy --config config/first_board_settings.yaml
@@ -29,9 +31,11 @@ from utils.logger import setup_logger
 from strategies.base_strategy import load_strategy
 from backtest.backtest_engine import BacktestEngine
 from trader.trading_engine import TradingEngine
+from data.daily_updater import DailyUpdater
+from data.data_fetcher import DataFetcher
 
 @click.command()
-@click.option('--mode', type=click.Choice(['backtest', 'live']), required=True, help='运行模式：回测或实盘')
+@click.option('--mode', type=click.Choice(['backtest', 'live', 'update', 'feed']), required=True, help='运行模式：回测、实盘、收盘后增量更新或共享行情进程')
 @click.option('--strategy', required=True, help='策略名称')
 @click.option('--config', help='策略配置文件路径')
 @click.option('--base_config', default='config/common_settings.yaml', help='基础配置文件路径')
@@ -42,7 +46,7 @@ def main(mode: str, strategy: str, config: str, base_config: str, start_date: st
     """主程序入口函数
 
     Args:
-        mode: 运行模式，'backtest'或'live'
+        mode: 运行模式，'backtest'、'live'、'update'或'feed'
         strategy: 策略名称
         config: 策略配置文件路径
         base_config: 基础配置文件路径
@@ -78,6 +82,17 @@ def main(mode: str, strategy: str, config: str, base_config: str, start_date: st
         setup_logger(cfg['log_dir'], mode)
         logger.info(f"启动系统 - 模式: {mode}, 策略: {strategy}")
         
+        # 增量更新只需要配置中的标的池和指标参数
+        if mode == 'update':
+            DailyUpdater(cfg).run()
+            return
+        
+        # 行情进程：订阅标的池并写入共享内存总线，策略进程以 data.feed.mode = bus 映射
+        if mode == 'feed':
+            cfg['data']['feed'] = {**(cfg['data'].get('feed') or {}), 'mode': 'publish'}
+            DataFetcher(cfg).run_feed()
+            return
+        
         # 加载策略
         strategy_class = load_strategy(strategy)
         strategy_instance = strategy_class(cfg)
@@ -25,7 +25,20 @@ from data.data_processor import DataProcessor
 from utils.logger import strategy_log
 
 class BaseStrategy(ABC):
-    """策略基类"""
+    """策略基类
+
+    Attributes:
+        data_mode: 传给 generate_signals 的数据形式，'frame' 为单只股票的 DataFrame，
+            'panel' 为整个标的池的 BarPanel（时间 × 股票），
+            'bars' 为每只股票的 BarView（NumPy 数组，不构造 pandas 对象）
+        required_indicators: 策略使用的指标规格，如 ['ma(20)', 'rsi(14)']，结果以规格为列名；
+            为空时按配置计算全部指标。可在 initialize 中按策略参数设置
+        lookback: 策略自身查看的最近K线数（不含指标预热），与指标预热一起决定获取和缓存的历史长度
+    """
+
+    data_mode = 'frame'
+    required_indicators: List[str] = []
+    lookback = 2
 
     def __init__(self, config: Dict[str, Any]):
         """初始化策略
@@ -36,10 +49,12 @@ class BaseStrategy(ABC):
         self.config = config
         self.name = self.__class__.__name__
         
-        # 初始化数据模块
-        self.data_fetcher = DataFetcher(config)
+        # 初始化数据处理模块（数据获取器在推断出历史长度后创建）
         self.data_processor = DataProcessor(config)
         
+        # 按股票分片的并行执行器，与数据处理共用
+        self.executor = self.data_processor.executor
+        
         # 策略参数
         self.universe = config['data']['universe']
         self.params = config.get('strategy_params', {})
@@ -47,20 +62,36 @@ class BaseStrategy(ABC):
         # 交易状态
         self.positions = {}
         self.orders = {}
+        # 实盘交易引擎运行时注入，交易信号经其批量下单
+        self.order_router = None
         
         # 初始化策略
         self.initialize()
         
+        # 只计算策略声明需要的指标
+        if self.required_indicators:
+            self.data_processor.set_required_indicators(self.required_indicators)
+        
+        # 历史长度按指标预热和策略查看的K线数推断（data.history_length 为 0 时），
+        # 传给数据获取器，回测读取 strategy.history_length；共享的配置不被修改
+        self.history_length = self.data_processor.get_history_length(self.lookback)
+        self.data_fetcher = DataFetcher(config, self.history_length)
+        logger.info(f"策略历史数据长度: {self.history_length}")
+        
     def initialize(self) -> None:
-        """策略初始化，可在子类中重写"""
+        """策略初始化，可在子类中重写
+
+        在数据获取器创建之前调用，可在此设置 required_indicators 和 lookback。
+        """
         pass
     
     @abstractmethod
-    def generate_signals(self, data: pd.DataFrame) -> Dict[str, float]:
+    def generate_signals(self, data: Any) -> Dict[str, float]:
         """生成交易信号
 
         Args:
-            data: 市场数据
+            data: 市场数据，data_mode 为 'frame' 时是 DataFrame，为 'panel' 时是 BarPanel，
+                为 'bars' 时是 BarSet
 
         Returns:
             Dict[str, float]: 交易信号字典，键为股票代码，值为仓位比例（-1到1）
@@ -75,12 +106,21 @@ class BaseStrategy(ABC):
         """
         try:
             # 处理数据
-            df = self.data_processor.process_kline_data(data)
-            if df.empty:
-                return
+            if self.data_mode == 'panel':
+                processed = self.data_processor.process_panel(data)
+                if processed is None:
+                    return
+            elif self.data_mode == 'bars':
+                processed = self.data_processor.process_bars(data)
+                if processed is None:
+                    return
+            else:
+                processed = self.data_processor.process_kline_data(data)
+                if processed.empty:
+                    return
             
             # 生成信号
-            signals = self.generate_signals(df)
+            signals = self.generate_signals(processed)
             
             # 执行交易
             self.execute_trades(signals)
@@ -95,22 +135,37 @@ class BaseStrategy(ABC):
             signals: 交易信号字典
         """
         try:
+            targets = {}
+            orders = []
             for code, signal in signals.items():
                 # 检查是否可交易
                 if not self._check_tradable(code):
                     continue
                 
-                # 获取当前持仓
-                current_pos = self.positions.get(code, 0)
-                
                 # 计算目标仓位
                 target_pos = self._calculate_position(code, signal)
+                targets[code] = target_pos
+                
+                # 获取当前持仓
+                current_pos = self.positions.get(code, 0)
                 
                 # 生成交易指令
                 if target_pos > current_pos:
-                    self._buy(code, target_pos - current_pos)
+                    orders.append((code, 'buy', target_pos - current_pos))
                 elif target_pos < current_pos:
-                    self._sell(code, current_pos - target_pos)
+                    orders.append((code, 'sell', current_pos - target_pos))
+            
+            # 接入交易引擎时提交目标仓位，由引擎按账户实际持仓计算差额并作为一个篮子下单；
+            # 否则逐笔调用 _buy/_sell
+            if self.order_router is not None:
+                if targets:
+                    self.order_router.submit_targets(targets)
+                return
+            for code, side, amount in orders:
+                if side == 'buy':
+                    self._buy(code, amount)
+                else:
+                    self._sell(code, amount)
                     
         except Exception as e:
             logger.error(f"交易执行错误 - {self.name}: {str(e)}")
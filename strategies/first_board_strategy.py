@@ -11,18 +11,26 @@ A股市场主板首板打板策略
 4. 设置严格的止盈止损策略控制风险
 """
 
-from typing import Dict, Any, List, Tuple
-import pandas as pd
+from typing import Dict, Any, List, Optional, Tuple
 import numpy as np
 from datetime import datetime, timedelta
 from loguru import logger
 
+from data.bar_view import BarView, BarSet
+from data.panel import to_date_codes
 from strategies.base_strategy import BaseStrategy
+from utils.indicator_graph import IndicatorGraph
+from utils.indicators import ma_2d
 from utils.logger import strategy_log
 
 class FirstBoardStrategy(BaseStrategy):
     """A股市场主板首板打板策略"""
 
+    # 逐只股票判断最新几根K线，使用不构造 pandas 对象的K线视图
+    data_mode = 'bars'
+    # 行情数据只用于确定最新交易日，个股数据另行获取
+    lookback = 1
+
     def initialize(self) -> None:
         """策略初始化"""
         # 获取策略参数
@@ -33,6 +41,16 @@ class FirstBoardStrategy(BaseStrategy):
         self.stop_loss_pct = self.params.get('stop_loss_pct', 0.03)  # 止损比例
         self.stop_profit_pct = self.params.get('stop_profit_pct', 0.05)  # 止盈比例
         self.max_position_pct = self.params.get('max_position_pct', 0.2)  # 单只股票最大仓位
+        self.board_window = self.params.get('board_window', 20)  # 首板判断回看的交易日数
+        
+        # 个股指标，获取的历史长度按指标预热推断（RSI 为 14 日简单平均，预热 14 根）
+        self.stock_indicators = {'ma5': 'ma(5)', 'ma10': 'ma(10)', 'ma20': 'ma(20)',
+                                 'volume_ma5': 'ma(5,volume)', 'volume_ma20': 'ma(20,volume)'}
+        self.macd_spec = 'macd(12,26,9)'
+        warmup = self.data_processor.get_lookback(list(self.stock_indicators.values()) + [self.macd_spec])
+        self.stock_history = max(warmup, 14) + self.board_window + 1
+        # 大盘指数：5日均线和前一日成交量
+        self.index_history = self.data_processor.get_lookback(['ma(5)']) + 2
         
         # 记录已识别的涨停板股票
         self.limit_up_stocks = {}
@@ -42,12 +60,12 @@ class FirstBoardStrategy(BaseStrategy):
                              f"最大连板数={self.max_boards}, 止损比例={self.stop_loss_pct}, "
                              f"止盈比例={self.stop_profit_pct}, 最大仓位={self.max_position_pct}")
 
-    def generate_signals(self, data: pd.DataFrame) -> Dict[str, float]:
+    def generate_signals(self, data: BarSet) -> Dict[str, float]:
         """生成交易信号
-
+        
         Args:
-            data: 市场数据
-
+            data: 市场数据（每只股票的K线视图）
+        
         Returns:
             Dict[str, float]: 交易信号字典，键为股票代码，值为仓位比例（-1到1）
         """
@@ -55,20 +73,32 @@ class FirstBoardStrategy(BaseStrategy):
             signals = {}
             
             # 获取最新交易日数据
-            latest_date = data.index[-1].strftime('%Y%m%d')
+            last_time = data.last_time()
+            if last_time is None:
+                return signals
+            latest_date = str(to_date_codes(np.array([last_time]))[0])
+            
+            # 股本和ST历史按时点关联，过期时才重新获取
+            self.reference = self.data_fetcher.get_reference_data(self.universe)
+            
+            # 并行获取股票池的个股数据（xtdata 调用经会话限流，各线程共用同一连接）
+            views = self.executor.map(lambda code: self._get_stock_data(code, latest_date),
+                                      self.universe, threads=True)
+            stock_views = dict(zip(self.universe, views))
             
             # 遍历股票池
             for code in self.universe:
                 # 获取个股数据
-                stock_data = self._get_stock_data(code, latest_date)
-                if stock_data.empty:
+                bars = stock_views.get(code)
+                if bars is None or bars.empty:
                     continue
                 
                 # 判断是否为首板
-                is_first_board, board_strength = self._check_first_board(stock_data)
+                is_first_board, board_strength = self._check_first_board(bars)
                 
                 # 生成交易信号
                 signal = 0.0
+                current_price = bars[-1].close
                 
                 # 买入条件：确认为首板且强度足够
                 if is_first_board and board_strength > 0.7:
@@ -79,7 +109,7 @@ class FirstBoardStrategy(BaseStrategy):
                         # 记录涨停板信息
                         self.limit_up_stocks[code] = {
                             'date': latest_date,
-                            'price': stock_data['close'].iloc[-1],
+                            'price': current_price,
                             'strength': board_strength
                         }
                 
@@ -88,7 +118,6 @@ class FirstBoardStrategy(BaseStrategy):
                     # 获取持仓信息
                     position = self.positions[code]
                     entry_price = position['price']
-                    current_price = stock_data['close'].iloc[-1]
                     price_change = (current_price - entry_price) / entry_price
                     
                     # 止盈条件
@@ -103,155 +132,139 @@ class FirstBoardStrategy(BaseStrategy):
                     
                     # 次日高开未能继续涨停，及时卖出
                     elif code in self.limit_up_stocks and latest_date > self.limit_up_stocks[code]['date']:
-                        if not self._check_continue_limit_up(stock_data):
+                        if not self._check_continue_limit_up(bars):
                             signal = -1.0
                             strategy_log(self.name, f"卖出信号 - {code}: 次日未能继续涨停")
                 
                 signals[code] = signal
             
             return signals
-            
+        
         except Exception as e:
             logger.error(f"信号生成错误 - {self.name}: {str(e)}")
             return {}
 
-    def _get_stock_data(self, code: str, date: str) -> pd.DataFrame:
+    def _get_stock_data(self, code: str, date: str) -> Optional[BarView]:
         """获取个股历史数据
-
+        
         Args:
             code: 股票代码
             date: 当前日期
-
+        
         Returns:
-            pd.DataFrame: 个股历史数据
+            Optional[BarView]: 个股历史数据（含涨跌幅、涨停价、换手率和均线等派生字段），获取失败时返回None
         """
         try:
             # 获取历史数据，增加获取的天数以确保有足够的历史数据进行分析
-            history_data = self.data_fetcher.get_history_data(
-                code, 
-                period='1d', 
-                count=30,  # 增加获取的历史数据天数
-                fields=['open', 'high', 'low', 'close', 'volume', 'amount', 'turnover_rate', 'total_shares', 'float_shares']
-            )
+            history_data = self.data_fetcher.get_history_data(code, period='1d', count=self.stock_history)
             
             if not history_data or code not in history_data:
                 strategy_log(self.name, f"无法获取{code}的历史数据")
-                return pd.DataFrame()
-            
-            # 转换为DataFrame
-            stock_data = pd.DataFrame({
-                'open': history_data[code]['open'],
-                'high': history_data[code]['high'],
-                'low': history_data[code]['low'],
-                'close': history_data[code]['close'],
-                'volume': history_data[code]['volume'],
-                'amount': history_data[code]['amount'],
-                'time': history_data[code]['time']
-            })
-            
-            # 设置日期索引
-            stock_data['date'] = pd.to_datetime(stock_data['time'], format='%Y%m%d')
-            stock_data.set_index('date', inplace=True)
+                return None
+            
+            # 只取需要的列为 NumPy 数组，不再构造新的 DataFrame
+            stock_data = history_data[code]
+            bars = BarView.from_dict(code, stock_data, ['time', 'open', 'high', 'low', 'close', 'volume', 'amount'])
+            for field in ['open', 'high', 'low', 'close', 'volume', 'amount']:
+                bars.fields[field] = bars.fields[field].astype(np.float64, copy=False)
+            close = bars.close
+            volume = bars.volume
             
             # 计算前收盘价
-            stock_data['pre_close'] = stock_data['close'].shift(1)
-            
-            # 计算涨跌幅
-            stock_data['pct_change'] = (stock_data['close'] - stock_data['pre_close']) / stock_data['pre_close'] * 100
-            
-            # 计算涨停价和跌停价（主板股票涨跌幅限制为10%，ST股票为5%）
-            # 这里简化处理，假设所有股票都是主板非ST股票
-            stock_data['limit_up_price'] = np.round(stock_data['pre_close'] * 1.1, 2)  # 涨停价四舍五入到分
-            stock_data['limit_down_price'] = np.round(stock_data['pre_close'] * 0.9, 2)  # 跌停价四舍五入到分
-            
-            # 计算成交量变化
-            stock_data['volume_ratio'] = stock_data['volume'] / stock_data['volume'].shift(1)
-            
-            # 计算换手率
-            # 尝试从history_data中获取换手率数据
-            if 'turnover_rate' in history_data[code]:
-                stock_data['turnover_rate'] = history_data[code]['turnover_rate']
-            else:
-                # 尝试获取流通股本数据
-                try:
-                    # 获取股票基本信息
-                    stock_info = self.data_fetcher.get_instrument_detail(code)
-                    if stock_info and 'float_shares' in stock_info:
-                        float_shares = stock_info['float_shares']
-                        # 计算换手率 = 成交量 / 流通股本 * 100%
-                        stock_data['turnover_rate'] = stock_data['volume'] / float_shares * 100
+            pre_close = np.full_like(close, np.nan)
+            pre_close[1:] = close[:-1]
+            prev_volume = np.full_like(volume, np.nan)
+            prev_volume[1:] = volume[:-1]
+            
+            with np.errstate(divide='ignore', invalid='ignore'):
+                bars.add('pre_close', pre_close)
+                # 计算涨跌幅
+                bars.add('pct_change', (close - pre_close) / pre_close * 100)
+                
+                # 计算涨停价和跌停价（主板股票涨跌幅限制为10%，ST股票为5%，按每根K线当日的ST状态）
+                limit_pct = np.where(self.reference.is_st([code], bars.time)[:, 0], 0.05, 0.1)
+                bars.add('limit_up_price', np.round(pre_close * (1 + limit_pct), 2))  # 涨停价四舍五入到分
+                bars.add('limit_down_price', np.round(pre_close * (1 - limit_pct), 2))  # 跌停价四舍五入到分
+                
+                # 计算成交量变化
+                bars.add('volume_ratio', volume / prev_volume)
+                
+                # 计算技术指标：移动平均线和成交量均线
+                graph = IndicatorGraph({'close': close, 'volume': volume})
+                for field, values in graph.evaluate(self.stock_indicators).items():
+                    bars.add(field, values)
+                
+                # 计算换手率
+                # 尝试从history_data中获取换手率数据
+                if 'turnover_rate' in stock_data:
+                    bars.add('turnover_rate', np.asarray(stock_data['turnover_rate'], dtype=np.float64))
+                else:
+                    # 按每根K线当日生效的流通股本计算换手率 = 成交量（手） / 流通股本 * 100%
+                    turnover_rate = self.reference.turnover_rate([code], bars.time, volume)
+                    if np.isfinite(turnover_rate[-1]):
+                        bars.add('turnover_rate', turnover_rate)
                     else:
                         # 简化处理，使用成交量的相对大小估算换手率
-                        stock_data['turnover_rate'] = stock_data['volume'] / stock_data['volume'].rolling(20).mean() * 5
-                except Exception as e:
-                    logger.warning(f"获取{code}流通股本失败，使用简化方法计算换手率: {str(e)}")
-                    stock_data['turnover_rate'] = stock_data['volume'] / stock_data['volume'].rolling(20).mean() * 5
-            
-            # 计算技术指标
-            # 移动平均线
-            stock_data['ma5'] = stock_data['close'].rolling(5).mean()
-            stock_data['ma10'] = stock_data['close'].rolling(10).mean()
-            stock_data['ma20'] = stock_data['close'].rolling(20).mean()
-            
-            # 计算量比（当日成交量/过去5日平均成交量）
-            stock_data['volume_ma5'] = stock_data['volume'].rolling(5).mean()
-            stock_data['volume_ratio_5'] = stock_data['volume'] / stock_data['volume_ma5']
-            
-            # 标记是否涨停
-            stock_data['is_limit_up'] = (stock_data['close'] >= stock_data['limit_up_price'] * 0.997) | \
-                                       (stock_data['pct_change'] >= self.limit_up_pct * 100)
-            
-            strategy_log(self.name, f"获取{code}历史数据成功，数据长度={len(stock_data)}")
-            return stock_data
+                        logger.warning(f"获取{code}流通股本失败，使用简化方法计算换手率")
+                        bars.add('turnover_rate', volume / bars.volume_ma20 * 5)
+                
+                # 计算量比（当日成交量/过去5日平均成交量）
+                bars.add('volume_ratio_5', volume / bars.volume_ma5)
+                
+                # 标记是否涨停
+                bars.add('is_limit_up', (close >= bars.limit_up_price * 0.997) |
+                         (bars.pct_change >= self.limit_up_pct * 100))
             
+            strategy_log(self.name, f"获取{code}历史数据成功，数据长度={len(bars)}")
+            return bars
+        
         except Exception as e:
             logger.error(f"获取股票数据失败 - {code}: {str(e)}")
-            return pd.DataFrame()
+            return None
 
-    def _check_first_board(self, data: pd.DataFrame) -> Tuple[bool, float]:
+    def _check_first_board(self, bars: BarView) -> Tuple[bool, float]:
         """判断是否为首板
-
+        
         Args:
-            data: 个股历史数据
-
+            bars: 个股历史数据
+        
         Returns:
             Tuple[bool, float]: (是否为首板, 涨停强度)
         """
         try:
             # 确保有足够的历史数据
-            if len(data) < 20:
+            if len(bars) < self.board_window:
                 return False, 0.0
             
-            latest_data = data.iloc[-1]
-            prev_data = data.iloc[-2]
-            history_data = data.iloc[:-1]  # 不包括最新交易日的历史数据
+            latest_data = bars[-1]
+            prev_data = bars[-2]
             
             # 判断当日是否涨停
-            is_limit_up = latest_data['pct_change'] >= self.limit_up_pct * 100
+            is_limit_up = latest_data.pct_change >= self.limit_up_pct * 100
             
             if not is_limit_up:
                 return False, 0.0
             
-            # 判断历史上是否有涨停（过去20个交易日内）
-            limit_up_days = history_data[history_data['pct_change'] >= self.limit_up_pct * 100].index.tolist()
+            # 判断过去 board_window 个交易日内是否有涨停（不包括最新交易日）
+            history_pct = bars.pct_change[-self.board_window - 1:-1]
+            limit_up_days = int(np.count_nonzero(history_pct >= self.limit_up_pct * 100))
             
             # 计算涨停强度指标
             # 1. 成交量放大倍数
-            volume_ratio = latest_data['volume'] / prev_data['volume'] if prev_data['volume'] > 0 else 0
+            volume_ratio = latest_data.volume / prev_data.volume if prev_data.volume > 0 else 0
             volume_strength = min(volume_ratio / self.volume_ratio, 1.5) / 1.5
             
             # 2. 换手率
-            turnover_rate = latest_data['turnover_rate']
+            turnover_rate = latest_data.turnover_rate
             turnover_strength = min(turnover_rate / self.turnover_rate, 2.0) / 2.0
             
             # 3. 涨停时间特征（这里简化处理，实际应使用分时数据）
             # 假设收盘价接近最高价表示涨停封板时间较长
-            price_strength = (latest_data['close'] - latest_data['open']) / (latest_data['high'] - latest_data['open']) if (latest_data['high'] - latest_data['open']) > 0 else 0
+            price_strength = (latest_data.close - latest_data.open) / (latest_data.high - latest_data.open) if (latest_data.high - latest_data.open) > 0 else 0
             
-            # 4. 涨停前的走势（低吸还是冲高）
-            # 计算5日均线
-            data['ma5'] = data['close'].rolling(5).mean()
-            ma5_position = latest_data['close'] / latest_data['ma5'] if not pd.isna(latest_data['ma5']) and latest_data['ma5'] > 0 else 1
+            # 4. 涨停前的走势（低吸还是冲高）：收盘价相对5日均线的位置
+            ma5 = latest_data.ma5
+            ma5_position = latest_data.close / ma5 if not np.isnan(ma5) and ma5 > 0 else 1
             trend_strength = min(ma5_position / 1.05, 1.2) / 1.2
             
             # 综合强度评分 (0-1)
@@ -262,137 +275,113 @@ class FirstBoardStrategy(BaseStrategy):
                 trend_strength * 0.1      # 走势特征权重10%
             )
             
-            # 判断是否为首板（20个交易日内无涨停记录）
-            is_first_board = is_limit_up and len(limit_up_days) == 0
+            # 判断是否为首板（回看窗口内无涨停记录）
+            is_first_board = is_limit_up and limit_up_days == 0
             
             # 记录详细日志
-            strategy_log(self.name, f"首板检查: 股票涨停={is_limit_up}, 历史涨停次数={len(limit_up_days)}, "
+            strategy_log(self.name, f"首板检查: 股票涨停={is_limit_up}, 历史涨停次数={limit_up_days}, "
                                  f"成交量强度={volume_strength:.2f}, 换手率强度={turnover_strength:.2f}, "
                                  f"综合强度={board_strength:.2f}, 是否首板={is_first_board}")
             
             return is_first_board, board_strength
-            
+        
         except Exception as e:
             logger.error(f"首板判断失败: {str(e)}")
             return False, 0.0
 
     def _check_market_condition(self) -> bool:
         """检查市场环境是否适合打板
-
+        
         Returns:
             bool: 市场环境是否良好
         """
         try:
             # 获取大盘指数数据（以上证指数为例）
             index_code = '000001.SH'
-            index_data = self.data_fetcher.get_history_data(index_code, period='1d', count=10)
+            index_data = self.data_fetcher.get_history_data(index_code, period='1d', count=self.index_history)
             if not index_data or index_code not in index_data:
                 return False
             
-            # 转换为DataFrame
-            df = pd.DataFrame({
-                'open': index_data[index_code]['open'],
-                'high': index_data[index_code]['high'],
-                'low': index_data[index_code]['low'],
-                'close': index_data[index_code]['close'],
-                'volume': index_data[index_code]['volume'],
-                'time': index_data[index_code]['time']
-            })
+            close = np.asarray(index_data[index_code]['close'], dtype=np.float64)
+            volume = np.asarray(index_data[index_code]['volume'], dtype=np.float64)
             
-            # 计算大盘涨跌幅
-            df['pct_change'] = df['close'].pct_change() * 100
-            
-            # 计算5日均线
-            df['ma5'] = df['close'].rolling(5).mean()
+            # 计算大盘涨跌幅和5日均线
+            pct_change = (close[-1] / close[-2] - 1) * 100 if len(close) > 1 else np.nan
+            ma5 = close[-5:].mean() if len(close) >= 5 else np.nan
             
             # 判断大盘环境
-            latest_data = df.iloc[-1]
-            
             # 1. 大盘当日涨跌幅>-1%
-            condition1 = latest_data['pct_change'] > -1.0
+            condition1 = pct_change > -1.0
             
             # 2. 大盘收盘价在5日均线之上
-            condition2 = latest_data['close'] > latest_data['ma5'] if not pd.isna(latest_data['ma5']) else True
+            condition2 = close[-1] > ma5 if not np.isnan(ma5) else True
             
             # 3. 大盘成交量较前一日放大
-            condition3 = latest_data['volume'] > df.iloc[-2]['volume'] if len(df) > 1 else True
+            condition3 = volume[-1] > volume[-2] if len(volume) > 1 else True
             
             # 综合判断市场环境
             is_market_good = condition1 and condition2
             
-            strategy_log(self.name, f"市场环境检查: 涨跌幅={latest_data['pct_change']:.2f}%, "
+            strategy_log(self.name, f"市场环境检查: 涨跌幅={pct_change:.2f}%, "
                                  f"MA5={condition2}, 成交量={condition3}, 结果={is_market_good}")
             
             return is_market_good
-            
+        
         except Exception as e:
             logger.error(f"市场环境检查失败: {str(e)}")
             return False
 
-    def _check_continue_limit_up(self, data: pd.DataFrame) -> bool:
+    def _check_continue_limit_up(self, bars: BarView) -> bool:
         """检查是否有继续涨停的趋势
-
+        
         Args:
-            data: 个股历史数据
-
+            bars: 个股历史数据
+        
         Returns:
             bool: 是否有继续涨停的趋势
         """
         try:
             # 确保有足够的历史数据
-            if len(data) < 20:
+            if len(bars) < self.board_window:
                 return False
-                
+            
             # 获取最新交易日数据
-            latest_data = data.iloc[-1]
+            latest_data = bars[-1]
             
             # 1. 判断当前是否已经涨停
-            is_limit_up = latest_data['pct_change'] >= self.limit_up_pct * 100
+            is_limit_up = latest_data.pct_change >= self.limit_up_pct * 100
             if is_limit_up:
                 return True  # 已经涨停，直接返回True
             
-            # 2. 计算MACD指标
-            if 'MACD' not in data.columns or 'MACD_signal' not in data.columns:
-                # 计算MACD
-                ema12 = data['close'].ewm(span=12, adjust=False).mean()
-                ema26 = data['close'].ewm(span=26, adjust=False).mean()
-                data['MACD'] = ema12 - ema26
-                data['MACD_signal'] = data['MACD'].ewm(span=9, adjust=False).mean()
-                data['MACD_hist'] = data['MACD'] - data['MACD_signal']
-            
-            # 3. 计算RSI指标
-            if 'RSI' not in data.columns:
-                # 计算RSI
-                delta = data['close'].diff()
-                gain = delta.where(delta > 0, 0)
-                loss = -delta.where(delta < 0, 0)
-                avg_gain = gain.rolling(window=14).mean()
-                avg_loss = loss.rolling(window=14).mean()
-                rs = avg_gain / avg_loss
-                data['RSI'] = 100 - (100 / (1 + rs))
-            
-            # 4. 分析技术指标
-            # MACD金叉或柱状图由负转正
-            macd_golden_cross = False
-            if len(data) >= 3:
-                macd_golden_cross = (data['MACD'].iloc[-1] > data['MACD_signal'].iloc[-1]) and \
-                                   (data['MACD'].iloc[-2] <= data['MACD_signal'].iloc[-2])
+            # 2. 计算MACD指标和RSI指标（RSI为14日涨跌幅的简单平均）
+            close = bars.close
+            indicators = IndicatorGraph({'close': close}).evaluate(
+                {'macd': f'{self.macd_spec}.macd', 'signal': f'{self.macd_spec}.signal',
+                 'hist': f'{self.macd_spec}.hist'})
+            macd, macd_signal, macd_hist = indicators['macd'], indicators['signal'], indicators['hist']
+            
+            delta = np.diff(close, prepend=np.nan)[:, None]
+            avg_gain = ma_2d(np.where(delta > 0, delta, 0.0), 14)[:, 0]
+            avg_loss = ma_2d(np.where(delta < 0, -delta, 0.0), 14)[:, 0]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = 100 - (100 / (1 + avg_gain / avg_loss))
             
-            macd_hist_positive = data['MACD_hist'].iloc[-1] > 0 if 'MACD_hist' in data.columns else False
+            # 3. 分析技术指标
+            # MACD金叉或柱状图由负转正
+            macd_golden_cross = (macd[-1] > macd_signal[-1]) and (macd[-2] <= macd_signal[-2])
+            macd_hist_positive = macd_hist[-1] > 0
             
             # RSI上升且大于50
-            rsi_bullish = False
-            if 'RSI' in data.columns and len(data) >= 2:
-                rsi_bullish = (data['RSI'].iloc[-1] > data['RSI'].iloc[-2]) and (data['RSI'].iloc[-1] > 50)
+            rsi_bullish = (rsi[-1] > rsi[-2]) and (rsi[-1] > 50)
             
-            # 5. 分析K线形态
+            # 4. 分析K线形态
             # 收盘价高于开盘价（阳线）
-            bullish_candle = latest_data['close'] > latest_data['open']
+            bullish_candle = latest_data.close > latest_data.open
             
             # 收盘价创近期新高
-            price_new_high = latest_data['close'] >= data['close'][-5:].max()
+            price_new_high = latest_data.close >= close[-5:].max()
             
-            # 6. 综合判断
+            # 5. 综合判断
             # 至少满足3个条件
             conditions_met = sum([macd_golden_cross, macd_hist_positive, rsi_bullish, bullish_candle, price_new_high])
             has_uptrend = conditions_met >= 3
@@ -402,7 +391,7 @@ class FirstBoardStrategy(BaseStrategy):
                                  f"结果={has_uptrend}")
             
             return has_uptrend
-            
+        
         except Exception as e:
             logger.error(f"涨停延续检查失败: {str(e)}")
             return False
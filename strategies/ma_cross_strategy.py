@@ -10,15 +10,19 @@
 """
 
 from typing import Dict, Any
-import pandas as pd
+import numpy as np
 from loguru import logger
 
+from data.panel import BarPanel
 from strategies.base_strategy import BaseStrategy
 from utils.logger import strategy_log
 
 class ma_cross_strategy(BaseStrategy):
     """双均线交叉策略"""
 
+    # 整个标的池一次性计算指标和信号
+    data_mode = 'panel'
+
     def initialize(self) -> None:
         """策略初始化"""
         # 获取策略参数
@@ -28,53 +32,61 @@ class ma_cross_strategy(BaseStrategy):
         self.rsi_buy = self.params.get('rsi_buy', 30)   # RSI买入阈值
         self.rsi_sell = self.params.get('rsi_sell', 70)  # RSI卖出阈值
         
+        # 只计算策略用到的指标，长期均线同时用于趋势强度
+        self.ma_short_spec = f'ma({self.ma_short})'
+        self.ma_long_spec = f'ma({self.ma_long})'
+        self.rsi_spec = f'rsi({self.rsi_period})'
+        self.required_indicators = [self.ma_short_spec, self.ma_long_spec, self.rsi_spec]
+        
+        # 最近一次处理的面板，用于仓位计算
+        self.panel = None
+        
         strategy_log(self.name, f"策略初始化 - 参数: MA短线={self.ma_short}, MA长线={self.ma_long}, "
                              f"RSI周期={self.rsi_period}, RSI买入={self.rsi_buy}, RSI卖出={self.rsi_sell}")
 
-    def generate_signals(self, data: pd.DataFrame) -> Dict[str, float]:
+    def generate_signals(self, data: BarPanel) -> Dict[str, float]:
         """生成交易信号
 
         Args:
-            data: 市场数据
+            data: 标的池面板数据
 
         Returns:
             Dict[str, float]: 交易信号字典，键为股票代码，值为仓位比例（-1到1）
         """
         try:
             signals = {}
+            self.panel = data
+            
+            # 每只股票最新和前一根K线的技术指标（停牌股票取各自最近的K线）
+            ma_short_prev = data.recent(self.ma_short_spec, 1)
+            ma_short_curr = data.recent(self.ma_short_spec)
+            ma_long_prev = data.recent(self.ma_long_spec, 1)
+            ma_long_curr = data.recent(self.ma_long_spec)
+            rsi_curr = data.recent(self.rsi_spec)
             
-            # 获取最新数据
-            latest_data = data.iloc[-1]
-            prev_data = data.iloc[-2] if len(data) > 1 else None
+            # 判断均线交叉
+            cross_up = (ma_short_prev < ma_long_prev) & (ma_short_curr > ma_long_curr)
+            cross_down = (ma_short_prev > ma_long_prev) & (ma_short_curr < ma_long_curr)
             
-            if prev_data is None:
-                return signals
+            # 买入条件：均线金叉 且 RSI低于超卖线
+            buy = cross_up & (rsi_curr < self.rsi_buy)
+            # 卖出条件：均线死叉 或 RSI高于超买线
+            sell = ~buy & (cross_down | (rsi_curr > self.rsi_sell))
             
             for code in self.universe:
-                # 获取技术指标数据
-                ma_short_prev = prev_data[f'ma_{self.ma_short}']
-                ma_short_curr = latest_data[f'ma_{self.ma_short}']
-                ma_long_prev = prev_data[f'ma_{self.ma_long}']
-                ma_long_curr = latest_data[f'ma_{self.ma_long}']
-                rsi_curr = latest_data['rsi']
-                
-                # 判断均线交叉
-                cross_up = ma_short_prev < ma_long_prev and ma_short_curr > ma_long_curr
-                cross_down = ma_short_prev > ma_long_prev and ma_short_curr < ma_long_curr
+                col = data.code_index.get(code)
+                if col is None or np.isnan(ma_short_prev[col]):
+                    continue
                 
                 # 生成交易信号
                 signal = 0.0
-                
-                # 买入条件：均线金叉 且 RSI低于超卖线
-                if cross_up and rsi_curr < self.rsi_buy:
+                if buy[col]:
                     signal = 1.0
-                    strategy_log(self.name, f"买入信号 - {code}: 均线金叉, RSI={rsi_curr:.2f}")
-                
-                # 卖出条件：均线死叉 或 RSI高于超买线
-                elif cross_down or rsi_curr > self.rsi_sell:
+                    strategy_log(self.name, f"买入信号 - {code}: 均线金叉, RSI={rsi_curr[col]:.2f}")
+                elif sell[col]:
                     signal = -1.0
-                    strategy_log(self.name, f"卖出信号 - {code}: {'均线死叉' if cross_down else 'RSI超买'}, "
-                                         f"RSI={rsi_curr:.2f}")
+                    strategy_log(self.name, f"卖出信号 - {code}: {'均线死叉' if cross_down[col] else 'RSI超买'}, "
+                                         f"RSI={rsi_curr[col]:.2f}")
                 
                 signals[code] = signal
             
@@ -98,10 +110,13 @@ class ma_cross_strategy(BaseStrategy):
         target_pos = super()._calculate_position(code, signal)
         
         # 添加自定义的仓位控制逻辑
-        if target_pos > 0:
-            # 买入时检查趋势强度
-            trend_strength = self.data_processor.calculate_features(pd.DataFrame())['trend_strength'].iloc[-1]
+        if target_pos > 0 and self.panel is not None and code in self.panel.code_index:
+            # 买入时检查趋势强度：收盘价偏离长期均线的幅度
+            col = self.panel.code_index[code]
+            close = self.panel.recent('close')[col]
+            ma_long = self.panel.recent(self.ma_long_spec)[col]
+            trend_strength = abs(close - ma_long) / ma_long
             if trend_strength < 0.02:  # 趋势不明显时减少仓位
                 target_pos *= 0.5
         
-        return target_pos
\ No newline at end of file
+        return target_pos
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""K线存储测试
+
+同一时间的K线被再次推送（盘中仍在形成的日K线、被修正的最后一根K线）时，
+存储改写最后一条，指标从该行起重新计算。
+"""
+
+import os
+
+import numpy as np
+
+from data.bar_store import BarStore
+from data.data_processor import DataProcessor
+
+CODE = '000001.SZ'
+DAY_MS = 86400000
+
+
+def _bars(closes, volumes):
+    times = [1700000000000 + DAY_MS * i for i in range(len(closes))]
+    return {
+        'time': times, 'open': closes, 'high': closes, 'low': closes,
+        'close': closes, 'volume': volumes, 'amount': closes
+    }
+
+
+def test_append_rewrites_last_bar(tmp_path):
+    store = BarStore(str(tmp_path))
+    closes = [10.0, 11.0, 12.0]
+    assert store.append(CODE, _bars(closes, [100, 100, 100])) == 3
+
+    # 完全相同的K线不写入
+    assert store.append(CODE, _bars(closes, [100, 100, 100])) == 0
+
+    assert store.append(CODE, _bars([10.0, 11.0, 12.5], [100, 100, 300])) == 1
+    records = store.read(CODE)
+    assert len(records) == 3
+    assert records['close'][-1] == 12.5
+    assert records['volume'][-1] == 300
+    assert records['close'][1] == 11.0
+
+    # 改写最后一条并追加新K线
+    assert store.append(CODE, _bars([10.0, 11.0, 13.0, 14.0], [100, 100, 400, 500])) == 2
+    records = store.read(CODE)
+    assert list(records['close']) == [10.0, 11.0, 13.0, 14.0]
+    assert store.last_time(CODE) == int(records['time'][-1])
+
+
+def test_process_kline_recomputes_rewritten_bar(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processor = DataProcessor({'data': {'indicators': ['MA']}})
+    closes = [float(i) for i in range(1, 31)]
+    volumes = [100] * 30
+
+    df = processor._process_kline({CODE: _bars(closes, volumes)})
+    assert df['close'].iloc[-1] == 30.0
+    assert df['ma_5'].iloc[-1] == 28.0
+
+    closes[-1], volumes[-1] = 60.0, 500
+    df = processor._process_kline({CODE: _bars(closes, volumes)})
+    assert len(df) == 30
+    assert df['close'].iloc[-1] == 60.0
+    assert df['volume'].iloc[-1] == 500
+    assert np.isclose(df['ma_5'].iloc[-1], 34.0)
+    assert np.isclose(df['ma_5'].iloc[-2], 27.0)
+
+
+def test_process_kline_data_writes_store_on_repeat(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processor = DataProcessor({'data': {'indicators': ['MA']}})
+    data = {CODE: _bars([float(i) for i in range(1, 31)], [100] * 30)}
+
+    df = processor.process_kline_data(data)
+    assert processor.store.rows(CODE) == 30
+
+    # 相同输入再次处理时仍写入存储（存储被清空后重新写入）
+    os.remove(processor.store.get_path(CODE))
+    processor.store.manifest.pop(CODE)
+    df = processor.process_kline_data(data)
+    assert processor.store.rows(CODE) == 30
+
+    # 返回结果是副本，调用方修改不影响下一次结果
+    df['close'] = 0.0
+    df = processor.process_kline_data(data)
+    assert df['close'].iloc[-1] == 30.0
+    assert df['ma_5'].iloc[-1] == 28.0
@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""账户缓存模块
+
+此模块在进程内维护资金和持仓，由交易推送驱动，包括：
+1. 资金推送（on_stock_asset）和持仓推送（on_stock_position）覆盖对应记录，快照之后本地委托冻结的
+   变化叠加在快照的冻结上，快照中尚未体现的活跃委托冻结不会丢失，已释放的冻结也不会重复释放
+2. 委托变化冻结或释放资金和可卖数量，成交推送增量更新资金、持仓数量和市值；
+   成交时间早于快照到达时间（留出推送延迟）的成交视为已包含在快照中，不再重复记账
+3. T+1：当日买入只增加持仓数量，不增加可卖数量；交易日切换时昨日持仓全部转为可卖
+4. 读取不访问柜台（持仓数量和可卖数量以只读映射提供），只按 trading.account_reconcile_interval 全量查询核对
+"""
+
+import time
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Iterable, Mapping, Tuple
+
+from loguru import logger
+from xtquant import xtconstant
+
+
+class AccountAsset:
+    """账户资金"""
+
+    __slots__ = ('cash', 'frozen_cash', 'market_value', 'total_asset', 'updated_at')
+
+    def __init__(self, cash: float = 0.0, frozen_cash: float = 0.0, market_value: float = 0.0,
+                 total_asset: Optional[float] = None):
+        """初始化资金
+
+        Args:
+            cash: 可用资金
+            frozen_cash: 冻结资金
+            market_value: 持仓市值
+            total_asset: 总资产，None 表示按前三项相加
+        """
+        self.cash = cash
+        self.frozen_cash = frozen_cash
+        self.market_value = market_value
+        self.total_asset = cash + frozen_cash + market_value if total_asset is None else total_asset
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"AccountAsset(可用={self.cash:.2f}, 冻结={self.frozen_cash:.2f}, 总资产={self.total_asset:.2f})"
+
+
+class PositionState:
+    """单只股票持仓"""
+
+    __slots__ = ('stock_code', 'volume', 'can_use_volume', 'frozen_volume', 'yesterday_volume',
+                 'open_price', 'market_value')
+
+    def __init__(self, stock_code: str, volume: int = 0, can_use_volume: int = 0, frozen_volume: int = 0,
+                 yesterday_volume: int = 0, open_price: float = 0.0, market_value: float = 0.0):
+        """初始化持仓
+
+        Args:
+            stock_code: 股票代码
+            volume: 持仓数量
+            can_use_volume: 可卖数量
+            frozen_volume: 卖出委托冻结的数量
+            yesterday_volume: 昨日持仓数量
+            open_price: 开仓均价
+            market_value: 持仓市值
+        """
+        self.stock_code = stock_code
+        self.volume = volume
+        self.can_use_volume = can_use_volume
+        self.frozen_volume = frozen_volume
+        self.yesterday_volume = yesterday_volume
+        self.open_price = open_price
+        self.market_value = market_value
+
+    @classmethod
+    def from_xt(cls, position: Any) -> 'PositionState':
+        """从 XtPosition 创建"""
+        return cls(position.stock_code, int(position.volume), int(position.can_use_volume),
+                   int(getattr(position, 'frozen_volume', 0) or 0),
+                   int(getattr(position, 'yesterday_volume', 0) or 0),
+                   float(getattr(position, 'open_price', 0.0) or 0.0),
+                   float(getattr(position, 'market_value', 0.0) or 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"PositionState({self.stock_code}, 持仓={self.volume}, 可卖={self.can_use_volume})"
+
+
+class AccountCache:
+    """推送驱动的资金和持仓缓存
+
+    委托首次出现时冻结资金（买入）或可卖数量（卖出），终态时释放剩余部分；成交推送按成交金额记账。
+    快照（推送或全量查询）只提供余额（可用加冻结）、可卖总量和快照时的冻结，当前冻结按
+    快照冻结加上快照之后本地活跃委托冻结的变化计算，且不少于本地活跃委托的冻结，
+    因此快照早于委托冻结或晚于委托释放都不会重复或遗漏。资金和各股票持仓分别记录最近一次
+    快照的到达时间，成交的资金部分和持仓部分只在成交晚于对应快照时记账。
+    """
+
+    def __init__(self, reconcile_interval: float = 300.0, t_plus_one: bool = True, snapshot_lag: float = 1.0):
+        """初始化账户缓存
+
+        Args:
+            reconcile_interval: 全量查询核对的间隔（秒）
+            t_plus_one: 当日买入是否当日不可卖
+            snapshot_lag: 快照从柜台生成到到达的最大延迟（秒），成交时间（精确到秒）早于快照到达时间减去
+                此延迟的成交视为已包含在快照中
+        """
+        self.reconcile_interval = reconcile_interval
+        self.t_plus_one = t_plus_one
+        self.snapshot_lag = snapshot_lag
+        self.asset: Optional[AccountAsset] = None
+        self._positions: Dict[str, PositionState] = {}
+        self._volumes: Dict[str, int] = {}
+        self._sellable: Dict[str, int] = {}
+        # 持仓数量和可卖数量的只读视图，读取时不复制
+        self.volumes: Mapping[str, int] = MappingProxyType(self._volumes)
+        self.sellable_volumes: Mapping[str, int] = MappingProxyType(self._sellable)
+        # 已冻结的活跃委托：委托编号到 (方向, 剩余冻结数量, 委托价格, 股票代码)
+        self._frozen: Dict[int, Tuple[str, int, float, str]] = {}
+        # 本地活跃委托的冻结合计：买入冻结资金，各股票卖出冻结数量
+        self._buy_frozen = 0.0
+        self._sell_frozen: Dict[str, int] = {}
+        # 资金快照：余额（可用加冻结）、快照冻结资金、快照时的本地买入冻结、到达时间
+        self._balance = 0.0
+        self._asset_frozen = (0.0, 0.0)
+        self._asset_at = 0.0
+        # 持仓快照：各股票可卖总量（可卖加冻结）、(快照冻结数量, 快照时的本地卖出冻结)、到达时间
+        self._available: Dict[str, int] = {}
+        self._position_frozen: Dict[str, Tuple[int, int]] = {}
+        self._position_at: Dict[str, float] = {}
+        self._closed: set = set()
+        self._trade_ids: set = set()
+        self._day = time.strftime('%Y%m%d')
+        self._lock = threading.RLock()
+        self.last_reconcile = 0.0
+
+    # ------------------------------------------------------------------ 推送
+
+    def on_asset(self, asset: Any) -> None:
+        """资金推送（XtAsset），覆盖缓存的资金"""
+        with self._lock:
+            self._set_asset(asset)
+
+    def on_position(self, position: Any) -> None:
+        """持仓推送（XtPosition），覆盖该股票的持仓"""
+        with self._lock:
+            self._roll_day()
+            self._set_position(PositionState.from_xt(position))
+
+    def _set_asset(self, asset: Any) -> None:
+        """用快照覆盖资金，记录快照冻结和当时的本地买入冻结"""
+        frozen_cash = float(getattr(asset, 'frozen_cash', 0.0) or 0.0)
+        self.asset = AccountAsset(float(asset.cash), frozen_cash,
+                                  float(getattr(asset, 'market_value', 0.0) or 0.0),
+                                  float(asset.total_asset))
+        self._balance = self.asset.cash + frozen_cash
+        self._asset_frozen = (frozen_cash, self._buy_frozen)
+        self._asset_at = time.time()
+        self._refresh_asset()
+
+    def _set_position(self, position: PositionState, at: Optional[float] = None) -> None:
+        """用快照覆盖单只股票持仓，记录快照冻结和当时的本地卖出冻结"""
+        code = position.stock_code
+        self._available[code] = position.can_use_volume + position.frozen_volume
+        self._position_frozen[code] = (position.frozen_volume, self._sell_frozen.get(code, 0))
+        self._position_at[code] = time.time() if at is None else at
+        self._store(position)
+        self._refresh_position(code)
+
+    def _refresh_asset(self) -> None:
+        """按余额和冻结重算可用资金和冻结资金"""
+        if self.asset is None:
+            return
+        snapshot_frozen, local_at_snapshot = self._asset_frozen
+        frozen = max(snapshot_frozen + self._buy_frozen - local_at_snapshot, self._buy_frozen, 0.0)
+        self.asset.frozen_cash = frozen
+        self.asset.cash = self._balance - frozen
+
+    def _refresh_position(self, code: str) -> None:
+        """按可卖总量和冻结重算单只股票的可卖数量和冻结数量"""
+        position = self._positions.get(code)
+        if position is None:
+            return
+        local = self._sell_frozen.get(code, 0)
+        snapshot_frozen, local_at_snapshot = self._position_frozen.get(code, (0, 0))
+        available = max(self._available.get(code, 0), 0)
+        frozen = min(max(snapshot_frozen + local - local_at_snapshot, local, 0), available)
+        position.frozen_volume = frozen
+        position.can_use_volume = available - frozen
+        self._sellable[code] = position.can_use_volume
+
+    def _included(self, traded_time: int, snapshot_at: float) -> bool:
+        """成交是否已包含在到达时间为 snapshot_at 的快照中"""
+        return bool(traded_time) and traded_time + 1 + self.snapshot_lag <= snapshot_at
+
+    def on_trade(self, trade: Any) -> None:
+        """成交推送（XtTrade），增量更新资金、持仓数量、可卖数量和市值
+
+        已包含在资金快照或该股票持仓快照中的成交（按 traded_time 判断）不再计入对应部分，
+        只减少委托的剩余冻结。
+
+        Args:
+            trade: 成交，需有 traded_id、order_id、stock_code、order_type、traded_volume、traded_price，
+                可选 traded_amount、traded_time（秒）
+        """
+        volume = int(trade.traded_volume or 0)
+        if volume <= 0:
+            return
+        amount = float(getattr(trade, 'traded_amount', 0.0) or volume * trade.traded_price)
+        is_buy = trade.order_type == xtconstant.STOCK_BUY
+        traded_time = int(getattr(trade, 'traded_time', 0) or 0)
+        code = trade.stock_code
+        with self._lock:
+            self._roll_day()
+            if trade.traded_id in self._trade_ids:
+                return
+            self._trade_ids.add(trade.traded_id)
+
+            frozen = self._frozen.get(trade.order_id)
+            if frozen is not None:
+                filled = min(volume, frozen[1])
+                self._frozen[trade.order_id] = (frozen[0], frozen[1] - filled, frozen[2], frozen[3])
+                self._change_freeze(code, frozen[0], -filled, frozen[2])
+
+            asset_done = self._included(traded_time, self._asset_at)
+            position_done = self._included(traded_time, self._position_at.get(code, 0.0))
+            if asset_done or position_done:
+                logger.debug(f"成交已包含在快照中 - {trade.traded_id}: 资金={asset_done}, 持仓={position_done}")
+
+            position = self._positions.get(code) or PositionState(code)
+            if is_buy:
+                cost = amount
+            elif position.volume > 0:
+                cost = position.market_value * min(volume, position.volume) / position.volume
+            else:
+                cost = amount
+            if not position_done:
+                if is_buy:
+                    position.market_value += amount
+                    position.volume += volume
+                    if not self.t_plus_one:
+                        self._available[code] = self._available.get(code, 0) + volume
+                else:
+                    position.market_value -= cost
+                    position.volume -= volume
+                    self._available[code] = self._available.get(code, 0) - volume
+                self._store(position)
+            if self.asset is not None and not asset_done:
+                self._balance += -amount if is_buy else amount
+                self.asset.market_value += cost if is_buy else -cost
+            self._refresh_position(code)
+            if self.asset is not None:
+                self._refresh_asset()
+                self._update_total()
+
+    def on_order_update(self, record: Any) -> None:
+        """委托簿监听器：新委托冻结资金或可卖数量，终态释放剩余冻结
+
+        Args:
+            record: 委托记录，需有 order_id、stock_code、order_type、price、remaining_volume、is_final
+        """
+        with self._lock:
+            self._roll_day()
+            order_id = record.order_id
+            if record.is_final:
+                frozen = self._frozen.pop(order_id, None)
+                self._closed.add(order_id)
+                if frozen is not None and frozen[1] > 0:
+                    self._change_freeze(frozen[3], frozen[0], -frozen[1], frozen[2])
+                return
+            if order_id in self._frozen or order_id in self._closed:
+                return
+            side = 'buy' if record.order_type == xtconstant.STOCK_BUY else 'sell'
+            remaining = int(record.remaining_volume)
+            self._frozen[order_id] = (side, remaining, record.price, record.stock_code)
+            self._change_freeze(record.stock_code, side, remaining, record.price)
+
+    def _change_freeze(self, code: str, side: str, volume: int, price: float) -> None:
+        """增加（volume>0）或减少（volume<0）本地冻结，并重算资金或持仓"""
+        if side == 'buy':
+            self._buy_frozen = max(self._buy_frozen + volume * price, 0.0)
+            self._refresh_asset()
+        else:
+            self._sell_frozen[code] = max(self._sell_frozen.get(code, 0) + volume, 0)
+            self._refresh_position(code)
+
+    def _store(self, position: PositionState) -> None:
+        """写入持仓并更新只读视图，持仓为零时删除"""
+        code = position.stock_code
+        if position.volume > 0:
+            self._positions[code] = position
+            self._volumes[code] = position.volume
+            self._sellable[code] = position.can_use_volume
+        else:
+            self._positions.pop(code, None)
+            self._volumes.pop(code, None)
+            self._sellable.pop(code, None)
+            self._available.pop(code, None)
+            self._position_frozen.pop(code, None)
+
+    def _update_total(self) -> None:
+        """按可用、冻结资金和持仓市值重算总资产"""
+        self.asset.total_asset = self.asset.cash + self.asset.frozen_cash + self.asset.market_value
+        self.asset.updated_at = time.time()
+
+    def _roll_day(self) -> None:
+        """交易日切换：昨日持仓全部转为可卖，清空当日成交、委托记录和冻结"""
+        day = time.strftime('%Y%m%d')
+        if day == self._day:
+            return
+        self._day = day
+        for position in self._positions.values():
+            position.yesterday_volume = position.volume
+            position.frozen_volume = 0
+            position.can_use_volume = position.volume
+            self._available[position.stock_code] = position.volume
+            self._sellable[position.stock_code] = position.volume
+        self._frozen.clear()
+        self._buy_frozen = 0.0
+        self._sell_frozen.clear()
+        self._asset_frozen = (0.0, 0.0)
+        self._position_frozen.clear()
+        self._refresh_asset()
+        self._closed.clear()
+        self._trade_ids.clear()
+
+    # ------------------------------------------------------------------ 核对
+
+    def needs_reconcile(self) -> bool:
+        """距上次全量核对是否已超过核对间隔"""
+        return time.time() - self.last_reconcile >= self.reconcile_interval
+
+    def reconcile(self, asset: Any = None, positions: Optional[Iterable[Any]] = None,
+                  active_orders: Optional[Iterable[Any]] = None) -> int:
+        """用全量查询结果核对缓存
+
+        Args:
+            asset: XtAsset，None 表示不核对资金
+            positions: XtPosition 列表，None 表示不核对持仓
+            active_orders: 当前活跃委托，视为冻结已包含在查询结果中
+
+        Returns:
+            int: 修正的持仓数
+        """
+        changed = 0
+        with self._lock:
+            self._roll_day()
+            if active_orders is not None:
+                self._frozen = {
+                    record.order_id: ('buy' if record.order_type == xtconstant.STOCK_BUY else 'sell',
+                                      int(record.remaining_volume), record.price, record.stock_code)
+                    for record in active_orders}
+                self._buy_frozen = sum(volume * price for side, volume, price, _ in self._frozen.values()
+                                       if side == 'buy')
+                self._sell_frozen = {}
+                for side, volume, _, code in self._frozen.values():
+                    if side == 'sell':
+                        self._sell_frozen[code] = self._sell_frozen.get(code, 0) + volume
+            if asset is not None:
+                self._set_asset(asset)
+            if positions is not None:
+                fresh = {position.stock_code: PositionState.from_xt(position) for position in positions}
+                for code, position in fresh.items():
+                    old = self._volumes.get(code)
+                    if old is None:
+                        logger.info(f"新增持仓 - {code}: {position.volume}")
+                    elif old != position.volume:
+                        logger.info(f"持仓变化 - {code}: {old} -> {position.volume}")
+                    else:
+                        continue
+                    changed += 1
+                for code in set(self._positions) - set(fresh):
+                    logger.info(f"清空持仓 - {code}")
+                    changed += 1
+                self._positions.clear()
+                self._volumes.clear()
+                self._sellable.clear()
+                self._available.clear()
+                self._position_frozen.clear()
+                now = time.time()
+                for position in fresh.values():
+                    self._set_position(position, now)
+            self.last_reconcile = time.time()
+        return changed
+
+    # ------------------------------------------------------------------ 读取
+
+    def volume(self, code: str) -> int:
+        """持仓数量"""
+        return self._volumes.get(code, 0)
+
+    def sellable(self, code: str) -> int:
+        """可卖数量"""
+        return self._sellable.get(code, 0)
+
+    def position(self, code: str) -> Optional[Dict[str, Any]]:
+        """单只股票持仓快照"""
+        with self._lock:
+            position = self._positions.get(code)
+            return position.to_dict() if position is not None else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """资金和全部持仓的快照"""
+        with self._lock:
+            return {
+                'asset': self.asset.to_dict() if self.asset is not None else None,
+                'positions': {code: position.to_dict() for code, position in self._positions.items()},
+            }
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """从快照恢复（进程重启后到下一次全量核对之前使用）"""
+        with self._lock:
+            asset = snapshot.get('asset')
+            if asset:
+                self.asset = AccountAsset(asset['cash'], asset['frozen_cash'], asset['market_value'],
+                                          asset['total_asset'])
+                self._balance = self.asset.cash + self.asset.frozen_cash
+                self._asset_frozen = (self.asset.frozen_cash, self._buy_frozen)
+            self._positions.clear()
+            self._volumes.clear()
+            self._sellable.clear()
+            self._available.clear()
+            self._position_frozen.clear()
+            for position in (snapshot.get('positions') or {}).values():
+                self._set_position(PositionState(**position), 0.0)
+            self.last_reconcile = 0.0
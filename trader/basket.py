@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""篮子委托模块
+
+此模块把一组委托作为一个篮子处理，包括：
+1. 批量校验：交易方向、数量（买入100股整数倍）、价格类型和价格、资金和持仓；
+   同一股票同向委托合并，反向委托在篮内轧差，每只股票最多发出一笔净额委托（净买入按整手向下取整）；
+   校验和轧差在委托副本上进行，不修改调用方的委托
+2. 与未完成委托轧差：同向未成交数量从新委托中扣除，存在反向未完成委托时跳过（避免自成交）
+3. 并发发出：线程池并发调用异步下单，令牌桶限制每秒委托数，并限制单日委托总数
+   （交易所程序化交易规则：每秒300笔或单日20000笔以上为高频交易）
+4. 逐笔结果（委托编号或失败原因，每笔输入委托都能查到对应结果）和整篮耗时（全部发出、全部收到回报）
+"""
+
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Dict, List, Any, Optional, Callable, Sequence
+
+from loguru import logger
+from xtquant import xtconstant
+
+from trader.order_book import OrderBook, ORDER_TYPES
+from trader.risk_engine import RiskLimits
+from utils.xt_session import TokenBucket
+
+# 价格类型：limit 限价；latest 最新价；market 最优五档即时成交剩余撤销（按交易所区分）
+PRICE_TYPES = ('limit', 'latest', 'market')
+
+# 委托结果状态
+STATUS_PENDING = 'pending'        # 已发出，等待回报
+STATUS_SUBMITTED = 'submitted'    # 已收到委托编号
+STATUS_REJECTED = 'rejected'      # 柜台拒绝或等待回报超时
+STATUS_INVALID = 'invalid'        # 未通过批量校验
+STATUS_NETTED = 'netted'          # 与未完成委托轧差后无需下单
+STATUS_CONFLICT = 'conflict'      # 存在反向未完成委托
+STATUS_THROTTLED = 'throttled'    # 超过单日委托上限
+
+
+def xt_price_type(price_type: str, code: str) -> int:
+    """把价格类型名称转换为 xtconstant 报价类型
+
+    Args:
+        price_type: 价格类型名称
+        code: 股票代码，市价单按交易所选择报价类型
+
+    Returns:
+        int: xtconstant 报价类型
+    """
+    if price_type == 'latest':
+        return xtconstant.LATEST_PRICE
+    if price_type == 'market':
+        return xtconstant.MARKET_SH_CONVERT_5_CANCEL if code.endswith('.SH') else xtconstant.MARKET_SZ_CONVERT_5_CANCEL
+    return xtconstant.FIX_PRICE
+
+
+class BasketOrder:
+    """篮子中的一笔委托"""
+
+    __slots__ = ('code', 'side', 'volume', 'price', 'price_type', 'remark')
+
+    def __init__(self, code: str, side: str, volume: int, price: float = 0.0,
+                 price_type: str = 'limit', remark: str = ''):
+        """初始化委托
+
+        Args:
+            code: 股票代码
+            side: 交易方向，'buy'或'sell'
+            volume: 委托数量（股）
+            price: 限价单为委托价格，其他价格类型为估算资金用的参考价
+            price_type: 价格类型，见 PRICE_TYPES
+            remark: 委托备注
+        """
+        self.code = code
+        self.side = side
+        self.volume = int(volume)
+        self.price = float(price)
+        self.price_type = price_type
+        self.remark = remark
+
+    @classmethod
+    def from_dict(cls, order: Dict[str, Any]) -> 'BasketOrder':
+        """从字典创建委托，方向可用 side 或 direction"""
+        return cls(order['code'], order.get('side') or order.get('direction'), order['volume'],
+                   order.get('price', 0.0), order.get('price_type', 'limit'), order.get('remark', ''))
+
+    def copy(self) -> 'BasketOrder':
+        """复制委托"""
+        return BasketOrder(self.code, self.side, self.volume, self.price, self.price_type, self.remark)
+
+    def __repr__(self) -> str:
+        return f"BasketOrder({self.code}, {self.side}, {self.volume}, {self.price_type}@{self.price})"
+
+
+class BasketResult:
+    """一笔委托的结果"""
+
+    __slots__ = ('order', 'inputs', 'status', 'message', 'order_id', 'future', 'submitted_volume', 'latency')
+
+    def __init__(self, order: BasketOrder, status: str = STATUS_PENDING, message: str = ''):
+        self.order = order.copy()
+        self.inputs: List[BasketOrder] = [order]
+        self.status = status
+        self.message = message
+        self.order_id: Optional[int] = None
+        self.future: Optional[Future] = None
+        self.submitted_volume = 0
+        self.latency: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return (f"BasketResult({self.order.code}, {self.order.side}, {self.status}, "
+                f"委托号={self.order_id}, {self.message})")
+
+
+class BasketReport:
+    """篮子的逐笔结果和耗时"""
+
+    def __init__(self, results: List[BasketResult]):
+        """初始化报告
+
+        Args:
+            results: 每个（股票, 方向）一个结果，result.inputs 为其覆盖的输入委托
+        """
+        self.results = results
+        self._by_input = {id(order): result for result in results for order in result.inputs}
+        self.started_at = time.monotonic()
+        self.dispatch_latency: Optional[float] = None
+        self.ack_latency: Optional[float] = None
+
+    def result_for(self, order: BasketOrder) -> Optional[BasketResult]:
+        """输入委托对应的结果（合并的同向委托共用一个结果）
+
+        Args:
+            order: 传入 dispatch 的委托
+
+        Returns:
+            Optional[BasketResult]: 对应的结果，不是本篮子的委托时返回None
+        """
+        return self._by_input.get(id(order))
+
+    @property
+    def pending(self) -> List[BasketResult]:
+        """等待回报的委托"""
+        return [r for r in self.results if r.status == STATUS_PENDING]
+
+    def wait(self, timeout: Optional[float] = None) -> 'BasketReport':
+        """等待所有已发出委托的回报
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            BasketReport: 报告本身
+        """
+        futures = [r.future for r in self.results if r.future is not None]
+        wait_futures(futures, timeout=timeout)
+        for result in self.results:
+            if result.future is not None and result.future.done() and result.status == STATUS_PENDING:
+                _apply_future(result, self.started_at)
+        if not self.pending and self.ack_latency is None:
+            self.ack_latency = max([r.latency for r in self.results if r.latency is not None] or [0.0])
+        return self
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的委托数"""
+        counts: Dict[str, int] = {}
+        for result in self.results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        return counts
+
+    def summary(self) -> str:
+        """一行摘要，用于日志"""
+        dispatch = f"{self.dispatch_latency * 1000:.1f}ms" if self.dispatch_latency is not None else '-'
+        ack = f"{self.ack_latency * 1000:.1f}ms" if self.ack_latency is not None else '-'
+        return f"委托数: {len(self.results)}, 状态: {self.counts()}, 发出耗时: {dispatch}, 回报耗时: {ack}"
+
+
+def _apply_future(result: BasketResult, started_at: float) -> None:
+    """用已完成的 Future 更新结果"""
+    if result.future.exception() is not None:
+        result.status = STATUS_REJECTED
+        result.message = str(result.future.exception())
+    else:
+        result.status = STATUS_SUBMITTED
+        result.order_id = result.future.result()
+    if result.latency is None:
+        result.latency = time.monotonic() - started_at
+
+
+class BasketDispatcher:
+    """篮子委托的校验、轧差和限速并发发出"""
+
+    def __init__(self, submit: Callable[[BasketOrder], Optional[Future]],
+                 order_book: Optional[OrderBook] = None, rate: float = 20.0, burst: float = 5.0,
+                 workers: int = 4, max_daily_orders: int = 20000, cash_buffer: float = 1.01):
+        """初始化发出器
+
+        Args:
+            submit: 发出单笔异步委托的函数，返回结果为委托编号的 Future（已发出委托占用的资金由下单方的风控计入）
+            order_book: 委托簿，用于与未完成委托轧差
+            rate: 每秒最多发出的委托数
+            burst: 令牌桶容量（允许的突发委托数）
+            workers: 并发发出的线程数
+            max_daily_orders: 单日委托总数上限，0 表示不限制
+            cash_buffer: 校验买入资金时的放大系数，与风控限额一致
+        """
+        self.submit = submit
+        self.order_book = order_book
+        self.limiter = TokenBucket(rate, burst)
+        self.workers = max(int(workers), 1)
+        self.max_daily_orders = max_daily_orders
+        self.cash_buffer = cash_buffer
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._day = time.strftime('%Y%m%d')
+        self._daily_count = 0
+
+    @classmethod
+    def from_config(cls, submit: Callable[[BasketOrder], Optional[Future]],
+                    order_book: Optional[OrderBook], config: Dict[str, Any]) -> 'BasketDispatcher':
+        """按 trading.basket 配置创建发出器，资金放大系数取自 trading.risk"""
+        basket_config = (config.get('trading') or {}).get('basket') or {}
+        return cls(submit, order_book,
+                   rate=basket_config.get('rate', 20),
+                   burst=basket_config.get('burst', 5),
+                   workers=basket_config.get('workers', 4),
+                   max_daily_orders=basket_config.get('max_daily_orders', 20000),
+                   cash_buffer=RiskLimits.from_config(config).cash_buffer)
+
+    def validate(self, orders: Sequence[BasketOrder], cash: Optional[float] = None,
+                 positions: Optional[Dict[str, int]] = None,
+                 max_positions: Optional[int] = None) -> List[BasketResult]:
+        """批量校验并合并同一股票的同向委托（在委托副本上进行，输入委托不被修改）
+
+        Args:
+            orders: 委托列表
+            cash: 可用资金，None 表示不检查
+            positions: 股票代码到可卖数量的映射，None 表示不检查
+            max_positions: 最大持仓股票数
+
+        Returns:
+            List[BasketResult]: 每个（股票, 方向）一个结果，未通过的状态为 invalid，
+                result.inputs 为合并进该结果的输入委托
+        """
+        merged: Dict[tuple, BasketResult] = {}
+        results = []
+        for order in orders:
+            key = (order.code, order.side)
+            if key in merged and merged[key].status == STATUS_PENDING and \
+                    merged[key].order.price_type == order.price_type:
+                # 同向委托合并，限价取更有利于成交的价格
+                merged[key].inputs.append(order)
+                existing = merged[key].order
+                existing.volume += order.volume
+                existing.price = max(existing.price, order.price) if order.side == 'buy' else \
+                    min(existing.price, order.price)
+                continue
+            result = BasketResult(order)
+            merged[key] = result
+            results.append(result)
+
+        # 同一股票同时有买入和卖出时在篮内轧差，只发出一笔净额委托（同时发出买卖会自成交）；
+        # 净买入按整手向下取整，不足一手的零股不发出，在结果中注明
+        for code in {result.order.code for result in results}:
+            buy, sell = merged.get((code, 'buy')), merged.get((code, 'sell'))
+            if buy is None or sell is None:
+                continue
+            net = buy.order.volume - sell.order.volume
+            buy.order.volume, sell.order.volume = max(net, 0) // 100 * 100, max(-net, 0)
+            for result in (buy, sell):
+                if result.order.volume == 0:
+                    result.status = STATUS_NETTED
+                    result.message = "与同一篮子的反向委托轧差"
+            if net > 0 and net % 100:
+                buy.message = f"与同一篮子的反向委托轧差，净买入 {net} 股，不足一手的 {net % 100} 股未委托"
+
+        held = set(positions or {})
+        reserved = 0.0
+        for result in results:
+            order = result.order
+            message = ''
+            if result.status != STATUS_PENDING:
+                continue
+            if not order.code or len(order.code) < 6:
+                message = f"无效的股票代码: {order.code}"
+            elif order.side not in ORDER_TYPES:
+                message = f"无效的交易方向: {order.side}"
+            elif order.price_type not in PRICE_TYPES:
+                message = f"无效的价格类型: {order.price_type}"
+            elif order.volume <= 0 or (order.side == 'buy' and order.volume % 100 != 0):
+                message = f"无效的交易数量: {order.volume}，买入必须为100的整数倍"
+            elif order.price_type == 'limit' and order.price <= 0:
+                message = f"限价委托缺少价格: {order.price}"
+            elif order.side == 'sell' and positions is not None and positions.get(order.code, 0) < order.volume:
+                message = f"可卖数量不足 - 所需: {order.volume}, 可卖: {positions.get(order.code, 0)}"
+            elif order.side == 'buy' and cash is not None and reserved + order.volume * order.price * self.cash_buffer > cash:
+                message = f"资金不足 - 所需: {order.volume * order.price * self.cash_buffer:.2f}, 可用: {cash - reserved:.2f}"
+            elif order.side == 'buy' and max_positions is not None and order.code not in held \
+                    and len(held) >= max_positions:
+                message = f"超过最大持仓限制: {max_positions}"
+            if message:
+                result.status = STATUS_INVALID
+                result.message = message
+            elif order.side == 'buy':
+                reserved += order.volume * order.price * self.cash_buffer
+                held.add(order.code)
+        return results
+
+    def net(self, results: Sequence[BasketResult]) -> None:
+        """与委托簿中的未完成委托轧差（修改结果中的委托副本）
+
+        Args:
+            results: validate 的结果
+        """
+        if self.order_book is None:
+            return
+        for result in results:
+            if result.status != STATUS_PENDING:
+                continue
+            order = result.order
+            side_type = ORDER_TYPES[order.side]
+            active = self.order_book.active_orders(order.code)
+            if any(record.order_type != side_type for record in active):
+                result.status = STATUS_CONFLICT
+                result.message = "存在反向未完成委托"
+                continue
+            open_volume = sum(record.remaining_volume for record in active)
+            if open_volume:
+                volume = order.volume - open_volume
+                if order.side == 'buy':
+                    volume = volume // 100 * 100
+                if volume <= 0:
+                    result.status = STATUS_NETTED
+                    result.message = f"未完成同向委托 {open_volume} 股已覆盖"
+                    continue
+                result.message = f"扣除未完成同向委托 {open_volume} 股"
+                order.volume = volume
+
+    def _take_daily_quota(self) -> bool:
+        """占用一笔单日委托额度"""
+        with self._lock:
+            today = time.strftime('%Y%m%d')
+            if today != self._day:
+                self._day, self._daily_count = today, 0
+            if self.max_daily_orders and self._daily_count >= self.max_daily_orders:
+                return False
+            self._daily_count += 1
+            return True
+
+    def _dispatch_one(self, result: BasketResult, started_at: float) -> None:
+        """在令牌桶限速下发出单笔委托"""
+        if not self._take_daily_quota():
+            result.status = STATUS_THROTTLED
+            result.message = f"超过单日委托上限: {self.max_daily_orders}"
+            return
+        self.limiter.acquire()
+        future = self.submit(result.order)
+        if future is None:
+            result.status = STATUS_REJECTED
+            result.message = result.message or "下单检查未通过"
+            return
+        result.future = future
+        result.submitted_volume = result.order.volume
+        future.add_done_callback(lambda f: _apply_future(result, started_at))
+
+    def dispatch(self, orders: Sequence[Any], cash: Optional[float] = None,
+                 positions: Optional[Dict[str, int]] = None, max_positions: Optional[int] = None,
+                 wait: Optional[float] = None) -> BasketReport:
+        """校验、轧差并并发发出一篮委托
+
+        Args:
+            orders: BasketOrder 或字典（code、side/direction、volume、price、price_type）
+            cash: 可用资金
+            positions: 可卖数量
+            max_positions: 最大持仓股票数
+            wait: 等待回报的秒数，None 表示发出后立即返回
+
+        Returns:
+            BasketReport: 逐笔结果和耗时
+        """
+        orders = [o if isinstance(o, BasketOrder) else BasketOrder.from_dict(o) for o in orders]
+        results = self.validate(orders, cash, positions, max_positions)
+        # 委托簿轧差只修改结果中的副本
+        self.net(results)
+        report = BasketReport(results)
+
+        # 卖出在前，先释放持仓名额
+        to_send = sorted((r for r in results if r.status == STATUS_PENDING), key=lambda r: r.order.side != 'sell')
+        if to_send:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='basket')
+            tasks = [self._pool.submit(self._dispatch_one, result, report.started_at) for result in to_send]
+            for task in tasks:
+                try:
+                    task.result()
+                except Exception as e:
+                    logger.error(f"篮子委托发出失败: {str(e)}")
+        for result in to_send:
+            if result.future is None and result.status == STATUS_PENDING:
+                result.status = STATUS_REJECTED
+                result.message = result.message or "发出失败"
+        report.dispatch_latency = time.monotonic() - report.started_at
+
+        if wait is not None:
+            report.wait(wait)
+        logger.info(f"篮子委托 - {report.summary()}")
+        return report
+
+    def shutdown(self) -> None:
+        """关闭发出线程池"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""委托簿模块
+
+此模块在进程内维护当日委托的状态，由交易推送驱动，包括：
+1. 按委托编号保存委托记录，委托回报、成交回报和委托失败推送直接更新记录
+2. 按股票代码和委托状态建立索引，查询活跃委托为进程内 O(1) 查找，不再访问柜台
+3. 推送可能乱序：已进入终态的委托不会被较早的中间状态覆盖
+4. 只按配置的间隔用一次全量查询核对，补齐断线期间丢失的推送
+5. 异步下单（order_stock_async）的请求序号与 on_order_stock_async_response 回报对应，
+   每笔委托返回一个 Future，回报到达时得到委托编号
+
+委托状态使用 xtconstant 中的数值常量。
+"""
+
+import time
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Any, Optional, Set, Callable, Iterable, Tuple
+
+from loguru import logger
+from xtquant import xtconstant
+
+# 交易方向到委托类型的映射
+ORDER_TYPES = {'buy': xtconstant.STOCK_BUY, 'sell': xtconstant.STOCK_SELL}
+
+# 终态：不会再变化的委托状态
+FINAL_STATUSES = frozenset({
+    xtconstant.ORDER_PART_CANCEL,   # 部成部撤
+    xtconstant.ORDER_CANCELED,      # 已撤
+    xtconstant.ORDER_SUCCEEDED,     # 已成
+    xtconstant.ORDER_JUNK           # 废单
+})
+
+
+class OrderRejectedError(Exception):
+    """委托被柜台拒绝或在等待回报时超时"""
+    pass
+
+
+class OrderRecord:
+    """委托记录，字段与 XtOrder 同名，另外记录本地提交时间和成交明细"""
+
+    __slots__ = ('order_id', 'stock_code', 'order_type', 'order_volume', 'price', 'traded_volume',
+                 'traded_price', 'order_status', 'status_msg', 'order_sysid', 'order_remark',
+                 'strategy_name', 'order_time', 'created_at', 'updated_at', 'cancel_requested', 'trades')
+
+    def __init__(self, order_id: int, stock_code: str = '', order_type: int = 0, order_volume: int = 0,
+                 price: float = 0.0, order_status: int = xtconstant.ORDER_UNREPORTED, order_remark: str = '',
+                 strategy_name: str = ''):
+        """初始化委托记录
+
+        Args:
+            order_id: 委托编号
+            stock_code: 股票代码
+            order_type: 委托类型（xtconstant.STOCK_BUY / STOCK_SELL）
+            order_volume: 委托数量
+            price: 委托价格
+            order_status: 委托状态
+            order_remark: 委托备注
+            strategy_name: 下单的策略名称
+        """
+        self.order_id = order_id
+        self.stock_code = stock_code
+        self.order_type = order_type
+        self.order_volume = order_volume
+        self.price = price
+        self.traded_volume = 0
+        self.traded_price = 0.0
+        self.order_status = order_status
+        self.status_msg = ''
+        self.order_sysid = ''
+        self.order_remark = order_remark
+        self.strategy_name = strategy_name
+        self.order_time = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.cancel_requested = False
+        self.trades: List[Dict[str, Any]] = []
+
+    @property
+    def is_final(self) -> bool:
+        """是否已进入终态"""
+        return self.order_status in FINAL_STATUSES
+
+    @property
+    def remaining_volume(self) -> int:
+        """未成交数量"""
+        return max(int(self.order_volume) - int(self.traded_volume), 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典，用于保存交易状态"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (f"OrderRecord({self.order_id}, {self.stock_code}, 类型={self.order_type}, "
+                f"状态={self.order_status}, 成交={self.traded_volume}/{self.order_volume})")
+
+
+class OrderBook:
+    """由推送驱动的委托簿
+
+    推送回调和策略线程可能同时访问，所有读写在同一把锁内完成；
+    状态变化时通知等待者（wait）和监听者（add_listener）。
+    """
+
+    def __init__(self, reconcile_interval: float = 60.0):
+        """初始化委托簿
+
+        Args:
+            reconcile_interval: 全量查询核对的间隔（秒），<=0 表示每次都核对
+        """
+        self.reconcile_interval = reconcile_interval
+        self._orders: Dict[int, OrderRecord] = {}
+        self._by_code: Dict[str, Set[int]] = {}
+        self._by_status: Dict[int, Set[int]] = {}
+        self._active: Set[int] = set()
+        self._listeners: List[Callable[[OrderRecord], None]] = []
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self.last_reconcile = 0.0
+
+    def _index(self, record: OrderRecord, old_status: Optional[int]) -> None:
+        """更新状态索引和活跃集合"""
+        if old_status is not None:
+            self._by_status.get(old_status, set()).discard(record.order_id)
+        self._by_status.setdefault(record.order_status, set()).add(record.order_id)
+        self._by_code.setdefault(record.stock_code, set()).add(record.order_id)
+        if record.is_final:
+            self._active.discard(record.order_id)
+        else:
+            self._active.add(record.order_id)
+
+    def _notify(self, record: OrderRecord) -> None:
+        """唤醒等待者并通知监听者（在锁内调用）"""
+        self._changed.notify_all()
+        for listener in self._listeners:
+            try:
+                listener(record)
+            except Exception as e:
+                logger.error(f"委托状态监听器执行失败: {str(e)}")
+
+    def add_listener(self, listener: Callable[[OrderRecord], None]) -> None:
+        """注册委托状态变化的监听器，在推送线程中调用，不应阻塞"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def on_submitted(self, order_id: int, stock_code: str, order_type: int, order_volume: int,
+                     price: float, order_remark: str = '', strategy_name: str = '') -> OrderRecord:
+        """登记本地刚提交的委托，推送到达前即可查询
+
+        Args:
+            order_id: 委托编号
+            stock_code: 股票代码
+            order_type: 委托类型
+            order_volume: 委托数量
+            price: 委托价格
+            order_remark: 委托备注
+            strategy_name: 下单的策略名称
+
+        Returns:
+            OrderRecord: 委托记录（推送已先到达时返回已有记录）
+        """
+        with self._lock:
+            record = self._orders.get(order_id)
+            if record is not None:
+                return record
+            record = OrderRecord(order_id, stock_code, order_type, order_volume, price,
+                                 order_remark=order_remark, strategy_name=strategy_name)
+            self._orders[order_id] = record
+            self._index(record, None)
+            self._notify(record)
+            return record
+
+    def on_order(self, order: Any) -> Optional[OrderRecord]:
+        """委托回报推送（XtOrder）或全量查询结果中的一条委托
+
+        Args:
+            order: XtOrder对象
+
+        Returns:
+            Optional[OrderRecord]: 更新后的委托记录，被忽略的乱序推送返回None
+        """
+        with self._lock:
+            record = self._orders.get(order.order_id)
+            old_status = None
+            if record is None:
+                record = OrderRecord(order.order_id)
+                self._orders[order.order_id] = record
+            else:
+                old_status = record.order_status
+                # 终态之后到达的中间状态是乱序推送
+                if record.is_final and order.order_status not in FINAL_STATUSES:
+                    return None
+            for name in ('stock_code', 'order_type', 'order_volume', 'price', 'order_status',
+                         'order_sysid', 'order_remark', 'strategy_name', 'order_time', 'status_msg'):
+                value = getattr(order, name, None)
+                if value is not None:
+                    setattr(record, name, value)
+            # 成交数量只增不减（成交回报可能先于委托回报到达）
+            record.traded_volume = max(record.traded_volume, getattr(order, 'traded_volume', 0) or 0)
+            if getattr(order, 'traded_price', 0):
+                record.traded_price = order.traded_price
+            record.updated_at = time.time()
+            self._index(record, old_status)
+            if old_status != record.order_status:
+                logger.debug(f"委托状态变化 - ID: {record.order_id}, {old_status} -> {record.order_status}")
+            self._notify(record)
+            return record
+
+    def on_trade(self, trade: Any) -> Optional[OrderRecord]:
+        """成交回报推送（XtTrade），累计成交数量和成交均价
+
+        Args:
+            trade: XtTrade对象
+
+        Returns:
+            Optional[OrderRecord]: 对应的委托记录
+        """
+        with self._lock:
+            record = self._orders.get(trade.order_id)
+            if record is None:
+                record = OrderRecord(trade.order_id, trade.stock_code, getattr(trade, 'order_type', 0))
+                self._orders[trade.order_id] = record
+                self._index(record, None)
+            traded_id = getattr(trade, 'traded_id', None)
+            if traded_id and any(t['traded_id'] == traded_id for t in record.trades):
+                return record
+            record.trades.append({'traded_id': traded_id, 'volume': trade.traded_volume,
+                                  'price': trade.traded_price, 'time': getattr(trade, 'traded_time', 0)})
+            volume = sum(t['volume'] for t in record.trades)
+            if volume >= record.traded_volume:
+                record.traded_volume = volume
+                record.traded_price = sum(t['volume'] * t['price'] for t in record.trades) / volume if volume else 0.0
+            record.updated_at = time.time()
+            self._notify(record)
+            return record
+
+    def on_order_error(self, order_error: Any) -> Optional[OrderRecord]:
+        """委托失败推送（XtOrderError），委托记为废单
+
+        Args:
+            order_error: XtOrderError对象
+
+        Returns:
+            Optional[OrderRecord]: 对应的委托记录
+        """
+        if order_error.order_id is None or order_error.order_id <= 0:
+            # 未生成委托编号的失败（如异步下单被拒）由 SubmissionTracker 处理
+            return None
+        with self._lock:
+            record = self._orders.get(order_error.order_id)
+            if record is None:
+                record = OrderRecord(order_error.order_id)
+                self._orders[order_error.order_id] = record
+                old_status = None
+            else:
+                old_status = record.order_status
+            record.order_status = xtconstant.ORDER_JUNK
+            record.status_msg = getattr(order_error, 'error_msg', '')
+            record.updated_at = time.time()
+            self._index(record, old_status)
+            self._notify(record)
+            return record
+
+    def needs_reconcile(self) -> bool:
+        """距上次全量核对是否已超过核对间隔"""
+        return time.time() - self.last_reconcile >= self.reconcile_interval
+
+    def reconcile(self, orders: Iterable[Any]) -> int:
+        """用全量查询结果核对委托簿
+
+        Args:
+            orders: query_stock_orders 返回的 XtOrder 列表（含已完成委托）
+
+        Returns:
+            int: 状态被修正的委托数
+        """
+        with self._lock:
+            changed = 0
+            for order in orders or []:
+                record = self._orders.get(order.order_id)
+                before = None if record is None else (record.order_status, record.traded_volume)
+                updated = self.on_order(order)
+                if updated is not None and before != (updated.order_status, updated.traded_volume):
+                    changed += 1
+            self.last_reconcile = time.time()
+        if changed:
+            logger.info(f"委托簿核对完成 - 修正委托数: {changed}")
+        return changed
+
+    def get(self, order_id: int) -> Optional[OrderRecord]:
+        """按委托编号获取委托记录"""
+        return self._orders.get(order_id)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def active_orders(self, stock_code: Optional[str] = None,
+                      order_type: Optional[int] = None) -> List[OrderRecord]:
+        """未进入终态的委托
+
+        Args:
+            stock_code: 只返回该股票的委托
+            order_type: 只返回该委托类型的委托
+
+        Returns:
+            List[OrderRecord]: 委托记录列表
+        """
+        with self._lock:
+            if stock_code is not None:
+                ids = self._by_code.get(stock_code, set()) & self._active
+            else:
+                ids = self._active
+            records = [self._orders[order_id] for order_id in ids]
+        if order_type is not None:
+            records = [record for record in records if record.order_type == order_type]
+        return records
+
+    def by_code(self, stock_code: str) -> List[OrderRecord]:
+        """某只股票当日的全部委托"""
+        with self._lock:
+            return [self._orders[order_id] for order_id in self._by_code.get(stock_code, ())]
+
+    def by_status(self, status: int) -> List[OrderRecord]:
+        """处于某个状态的委托"""
+        with self._lock:
+            return [self._orders[order_id] for order_id in self._by_status.get(status, ())]
+
+    def mark_cancel_requested(self, order_id: int) -> None:
+        """记录已发出撤单请求，避免重复撤单"""
+        with self._lock:
+            record = self._orders.get(order_id)
+            if record is not None:
+                record.cancel_requested = True
+
+    def wait(self, order_id: int, statuses: Optional[Iterable[int]] = None,
+             timeout: Optional[float] = None) -> Optional[OrderRecord]:
+        """等待委托进入指定状态（默认任一终态）
+
+        Args:
+            order_id: 委托编号
+            statuses: 目标状态集合，默认 FINAL_STATUSES
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            Optional[OrderRecord]: 到达目标状态的委托记录，超时返回None
+        """
+        statuses = FINAL_STATUSES if statuses is None else frozenset(statuses)
+        with self._changed:
+            reached = self._changed.wait_for(
+                lambda: order_id in self._orders and self._orders[order_id].order_status in statuses, timeout)
+            return self._orders[order_id] if reached else None
+
+    def snapshot(self) -> Dict[int, Dict[str, Any]]:
+        """所有委托记录的字典形式，用于保存交易状态"""
+        with self._lock:
+            return {order_id: record.to_dict() for order_id, record in self._orders.items()}
+
+    def clear(self) -> None:
+        """清空委托簿（新交易日开始时调用）"""
+        with self._lock:
+            self._orders.clear()
+            self._by_code.clear()
+            self._by_status.clear()
+            self._active.clear()
+            self.last_reconcile = 0.0
+
+
+class SubmissionTracker:
+    """异步下单的回报跟踪
+
+    order_stock_async 立即返回请求序号（seq），委托编号随后由 on_order_stock_async_response 推送。
+    每笔请求登记为一个 Future：回报成功时结果为委托编号，并把委托登记到委托簿；
+    委托失败推送或超时时抛出 OrderRejectedError。
+    回报和失败推送可能先于登记到达（推送线程比下单线程先拿到锁），先到的推送暂存，登记时立即完成。
+    """
+
+    def __init__(self, order_book: OrderBook):
+        """初始化跟踪器
+
+        Args:
+            order_book: 委托簿，回报成功的委托登记到其中
+        """
+        self.order_book = order_book
+        self._pending: Dict[int, Tuple[Future, Dict[str, Any], float]] = {}
+        self._by_remark: Dict[str, int] = {}
+        self._early: Dict[int, Tuple[Any, float]] = {}
+        self._early_errors: Dict[str, Tuple[Any, float]] = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_remark(self) -> str:
+        """生成本进程内唯一的委托备注，用于在只带备注的失败推送中找到对应请求"""
+        return f"q{next(self._counter)}"
+
+    def register(self, seq: int, details: Dict[str, Any]) -> Future:
+        """登记一笔已发出的异步委托
+
+        Args:
+            seq: order_stock_async 返回的请求序号
+            details: 委托内容，包含 stock_code、order_type、order_volume、price、order_remark、strategy_name
+
+        Returns:
+            Future: 结果为委托编号
+        """
+        future = Future()
+        with self._lock:
+            early = self._early.pop(seq, None)
+            response = early[0] if early is not None else None
+            early_error = self._early_errors.pop(details.get('order_remark') or '', None)
+            if response is None and early_error is None:
+                self._pending[seq] = (future, details, time.time())
+                if details.get('order_remark'):
+                    self._by_remark[details['order_remark']] = seq
+        if early_error is not None:
+            self._fail(future, details, early_error[0])
+        elif response is not None:
+            self._resolve(future, details, response)
+        return future
+
+    def _resolve(self, future: Future, details: Dict[str, Any], response: Any) -> None:
+        """用异步回报完成 Future"""
+        order_id = getattr(response, 'order_id', -1)
+        if order_id is None or order_id <= 0:
+            future.set_exception(OrderRejectedError(
+                f"委托被拒绝 - 代码: {details.get('stock_code')}, {getattr(response, 'error_msg', '')}"))
+            return
+        self.order_book.on_submitted(order_id, details.get('stock_code', ''), details.get('order_type', 0),
+                                     details.get('order_volume', 0), details.get('price', 0.0),
+                                     details.get('order_remark', ''), details.get('strategy_name', ''))
+        future.set_result(order_id)
+
+    def on_response(self, response: Any) -> None:
+        """异步下单回报推送（XtOrderResponse）
+
+        Args:
+            response: 含 seq、order_id、order_remark 的回报
+        """
+        with self._lock:
+            entry = self._pending.pop(response.seq, None)
+            if entry is None:
+                self._early[response.seq] = (response, time.time())
+                return
+            self._by_remark.pop(entry[1].get('order_remark', ''), None)
+        self._resolve(entry[0], entry[1], response)
+
+    def on_error(self, order_error: Any) -> None:
+        """委托失败推送（XtOrderError），按请求序号或委托备注找到对应请求
+
+        Args:
+            order_error: XtOrderError对象
+        """
+        with self._lock:
+            seq = getattr(order_error, 'seq', None)
+            if seq not in self._pending:
+                seq = self._by_remark.get(getattr(order_error, 'order_remark', None) or '')
+            entry = self._pending.pop(seq, None) if seq is not None else None
+            if entry is None:
+                remark = getattr(order_error, 'order_remark', None)
+                if remark:
+                    self._early_errors[remark] = (order_error, time.time())
+                return
+            self._by_remark.pop(entry[1].get('order_remark', ''), None)
+        self._fail(entry[0], entry[1], order_error)
+
+    @staticmethod
+    def _fail(future: Future, details: Dict[str, Any], order_error: Any) -> None:
+        """用委托失败推送完成 Future"""
+        future.set_exception(OrderRejectedError(
+            f"委托失败 - 代码: {details.get('stock_code')}, 错误码: {getattr(order_error, 'error_id', '')}, "
+            f"{getattr(order_error, 'error_msg', '')}"))
+
+    def expire(self, timeout: float) -> int:
+        """把超过 timeout 秒仍无回报的请求置为失败，回报仍可能稍后到达，由委托簿核对补齐
+
+        Args:
+            timeout: 等待回报的最长秒数
+
+        Returns:
+            int: 过期的请求数
+        """
+        deadline = time.time() - timeout
+        with self._lock:
+            expired = [seq for seq, (_, _, submitted) in self._pending.items() if submitted <= deadline]
+            entries = [self._pending.pop(seq) for seq in expired]
+            for _, details, _ in entries:
+                self._by_remark.pop(details.get('order_remark', ''), None)
+            # 长时间无人登记的暂存回报不属于本进程发出的请求
+            for seq in [seq for seq, (_, received) in self._early.items() if received <= deadline]:
+                del self._early[seq]
+            for remark in [remark for remark, (_, received) in self._early_errors.items() if received <= deadline]:
+                del self._early_errors[remark]
+        for future, details, _ in entries:
+            future.set_exception(OrderRejectedError(f"等待委托回报超时 - 代码: {details.get('stock_code')}"))
+        return len(entries)
+
+    def pending_count(self) -> int:
+        """尚未收到回报的请求数"""
+        return len(self._pending)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""委托超时调度模块
+
+此模块在委托到期的时刻执行超时策略，取代每轮扫描全部委托的做法，包括：
+1. 最小堆按到期时间排列委托，后台线程在条件变量上等待到最近的到期时间，没有到期委托时不占用CPU
+2. 到期时间以柜台委托时间（XtOrder.order_time）为起点，柜台时间缺失（为0）时以本地登记时间为起点；
+   对账重建的委托按原委托时间计时，不会重新获得完整的有效期
+3. 按策略配置超时策略：cancel 超时撤单；chase 超时撤单后按最新价加减若干价位重新委托剩余数量，
+   追价次数用完后只撤单
+4. 委托在到期前成交或撤销时不做任何操作（堆中的条目在到期时惰性丢弃）
+"""
+
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+from loguru import logger
+
+from trader.order_book import OrderBook, OrderRecord
+
+# 超时后的动作
+ACTION_CANCEL = 'cancel'
+ACTION_CHASE = 'chase'
+
+
+class TTLPolicy:
+    """委托超时策略"""
+
+    __slots__ = ('ttl', 'action', 'chase_ticks', 'max_chases', 'tick_size')
+
+    def __init__(self, ttl: float, action: str = ACTION_CANCEL, chase_ticks: int = 1,
+                 max_chases: int = 3, tick_size: float = 0.01):
+        """初始化策略
+
+        Args:
+            ttl: 委托有效秒数，<=0 表示不超时
+            action: 超时动作，cancel 或 chase
+            chase_ticks: 追价时相对最新价让出的价位数
+            max_chases: 最多追价次数
+            tick_size: 最小价位
+        """
+        if action not in (ACTION_CANCEL, ACTION_CHASE):
+            raise ValueError(f"不支持的超时动作: {action}")
+        self.ttl = float(ttl)
+        self.action = action
+        self.chase_ticks = int(chase_ticks)
+        self.max_chases = int(max_chases)
+        self.tick_size = float(tick_size)
+
+    @classmethod
+    def from_dict(cls, params: Dict[str, Any], default_ttl: float) -> 'TTLPolicy':
+        """从配置字典创建策略"""
+        return cls(params.get('ttl', default_ttl), params.get('action', ACTION_CANCEL),
+                   params.get('chase_ticks', 1), params.get('max_chases', 3), params.get('tick_size', 0.01))
+
+    def __repr__(self) -> str:
+        return f"TTLPolicy({self.ttl}s, {self.action})"
+
+
+class OrderScheduler:
+    """委托超时调度器
+
+    通过 OrderBook.add_listener 接收委托变化：新出现的活跃委托入堆；
+    追价委托撤单确认后放入重新委托队列。撤单和重新委托都在调度线程中执行，不阻塞推送线程。
+    """
+
+    def __init__(self, order_book: OrderBook, cancel: Callable[[OrderRecord], Any],
+                 chase: Optional[Callable[[OrderRecord, TTLPolicy, int], Any]] = None,
+                 default_policy: Optional[TTLPolicy] = None,
+                 policies: Optional[Dict[str, TTLPolicy]] = None):
+        """初始化调度器
+
+        Args:
+            order_book: 委托簿
+            cancel: 撤单函数，参数为委托记录
+            chase: 追价函数，参数为已撤销的委托记录、策略和第几次追价，返回新委托的 Future（结果为委托编号）
+            default_policy: 未单独配置的策略使用的超时策略
+            policies: 策略名称到超时策略的映射
+        """
+        self.order_book = order_book
+        self.cancel = cancel
+        self.chase = chase
+        self.default_policy = default_policy or TTLPolicy(60)
+        self.policies = policies or {}
+        self._heap: List[Tuple[float, int, int]] = []
+        self._counter = itertools.count()
+        self._scheduled: Dict[int, float] = {}
+        self._chasing: Dict[int, Tuple[TTLPolicy, int]] = {}
+        self._chase_counts: Dict[int, int] = {}
+        self._resubmits: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.stats = {'scheduled': 0, 'cancelled': 0, 'chased': 0, 'discarded': 0}
+        order_book.add_listener(self.on_order_update)
+
+    @classmethod
+    def from_config(cls, order_book: OrderBook, cancel: Callable[[OrderRecord], Any],
+                    chase: Optional[Callable[[OrderRecord, TTLPolicy, int], Any]],
+                    config: Dict[str, Any]) -> 'OrderScheduler':
+        """按 trading.order_timeout 和 trading.order_policies 配置创建调度器"""
+        trading_config = config.get('trading') or {}
+        default_ttl = trading_config.get('order_timeout', 60)
+        policies = {name: TTLPolicy.from_dict(params or {}, default_ttl)
+                    for name, params in (trading_config.get('order_policies') or {}).items()}
+        return cls(order_book, cancel, chase, TTLPolicy(default_ttl), policies)
+
+    def policy_for(self, record: OrderRecord) -> TTLPolicy:
+        """委托适用的超时策略"""
+        return self.policies.get(record.strategy_name, self.default_policy)
+
+    @staticmethod
+    def _start_time(record: OrderRecord) -> float:
+        """到期计时的起点：柜台委托时间（精确到秒），缺失时为本地登记时间"""
+        return float(record.order_time) if record.order_time else record.created_at
+
+    def schedule(self, record: OrderRecord, policy: Optional[TTLPolicy] = None) -> Optional[float]:
+        """把委托加入超时堆
+
+        Args:
+            record: 委托记录
+            policy: 超时策略，默认按策略名称选择
+
+        Returns:
+            Optional[float]: 到期时间（时间戳），不超时时返回None
+        """
+        policy = policy or self.policy_for(record)
+        if policy.ttl <= 0 or record.is_final:
+            return None
+        deadline = self._start_time(record) + policy.ttl
+        with self._cond:
+            self._scheduled[record.order_id] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._counter), record.order_id))
+            self.stats['scheduled'] += 1
+            # 新委托比当前等待的更早到期时唤醒调度线程
+            if self._heap[0][2] == record.order_id:
+                self._cond.notify()
+        return deadline
+
+    def on_order_update(self, record: OrderRecord) -> None:
+        """委托簿监听器：新委托入堆，追价委托撤单确认后排队重新委托（在推送线程中调用）"""
+        if record.is_final:
+            self._chase_counts.pop(record.order_id, None)
+            entry = self._chasing.pop(record.order_id, None)
+            if entry is not None and record.remaining_volume > 0:
+                with self._cond:
+                    self._resubmits.append((record, entry[0], entry[1]))
+                    self._cond.notify()
+            return
+        if record.order_id not in self._scheduled:
+            self.schedule(record)
+
+    def _next_task(self) -> Optional[Tuple[str, Any]]:
+        """等待下一个到期委托或重新委托任务，停止时返回None"""
+        with self._cond:
+            while self._running:
+                if self._resubmits:
+                    return 'chase', self._resubmits.popleft()
+                if self._heap:
+                    wait = self._heap[0][0] - time.time()
+                    if wait <= 0:
+                        _, _, order_id = heapq.heappop(self._heap)
+                        return 'expire', order_id
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _expire(self, order_id: int) -> None:
+        """委托到期：已结束的丢弃，推送带来更晚的柜台时间时顺延，否则执行超时动作"""
+        record = self.order_book.get(order_id)
+        if record is None or record.is_final or record.cancel_requested:
+            self._scheduled.pop(order_id, None)
+            self.stats['discarded'] += 1
+            return
+        policy = self.policy_for(record)
+        deadline = self._start_time(record) + policy.ttl
+        if deadline > time.time() + 1e-3:
+            with self._cond:
+                self._scheduled[order_id] = deadline
+                heapq.heappush(self._heap, (deadline, next(self._counter), order_id))
+            return
+        self._scheduled.pop(order_id, None)
+
+        attempt = self._chase_counts.pop(order_id, 0)
+        if policy.action == ACTION_CHASE and self.chase is not None and attempt < policy.max_chases:
+            self._chasing[order_id] = (policy, attempt + 1)
+        self.order_book.mark_cancel_requested(order_id)
+        self.cancel(record)
+        self.stats['cancelled'] += 1
+
+    def _resubmit(self, record: OrderRecord, policy: TTLPolicy, attempt: int) -> None:
+        """追价：按剩余数量重新委托，新委托继承追价次数"""
+        future = self.chase(record, policy, attempt)
+        self.stats['chased'] += 1
+        if future is None:
+            return
+
+        def remember(f):
+            if f.exception() is None:
+                self._chase_counts[f.result()] = attempt
+        future.add_done_callback(remember)
+
+    def _run(self) -> None:
+        """调度线程主循环"""
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            kind, payload = task
+            try:
+                if kind == 'expire':
+                    self._expire(payload)
+                else:
+                    self._resubmit(*payload)
+            except Exception as e:
+                logger.error(f"委托超时调度执行失败 - {kind}: {str(e)}")
+
+    def start(self) -> None:
+        """启动调度线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='order-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"委托超时调度已启动 - 默认策略: {self.default_policy}, 按策略配置: {self.policies}")
+
+    def stop(self) -> None:
+        """停止调度线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def pending_count(self) -> int:
+        """等待到期的委托数"""
+        return len(self._scheduled)
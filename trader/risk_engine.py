@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""事前风控模块
+
+此模块在委托发出前做风控检查，回测引擎和交易引擎共用，包括：
+1. 风控限额集中在 trading.risk 配置（RiskLimits）
+2. 持仓市值、挂单金额、可卖数量、持仓股票数按股票和合计增量维护，
+   成交、挂单变化和价格更新时只调整受影响的股票
+3. 每笔委托的整组检查只读取累加器，耗时与持仓和委托数量无关
+4. 每秒委托数用滑动窗口计数
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+from loguru import logger
+
+from trader.order_book import ORDER_TYPES
+
+
+class RiskLimits:
+    """风控限额，0 或 None 表示不限制"""
+
+    __slots__ = ('max_positions', 'single_position_limit', 'max_gross_exposure', 'max_open_order_value',
+                 'max_orders_per_second', 'cash_buffer', 'lot_size', 't_plus_one')
+
+    def __init__(self, max_positions: Optional[int] = None, single_position_limit: Optional[float] = 0.2,
+                 max_gross_exposure: Optional[float] = 1.0, max_open_order_value: Optional[float] = None,
+                 max_orders_per_second: Optional[int] = None, cash_buffer: float = 1.01,
+                 lot_size: int = 100, t_plus_one: bool = True):
+        """初始化限额
+
+        Args:
+            max_positions: 最大持仓股票数
+            single_position_limit: 单只股票持仓加买入挂单市值占总资产的比例上限
+            max_gross_exposure: 全部持仓加买入挂单市值占总资产的比例上限
+            max_open_order_value: 未完成委托金额上限
+            max_orders_per_second: 每秒委托数上限
+            cash_buffer: 买入所需资金的放大系数（预留手续费和滑点）
+            lot_size: 买入数量必须为其整数倍
+            t_plus_one: 当日买入的股票是否当日不可卖
+        """
+        self.max_positions = max_positions
+        self.single_position_limit = single_position_limit
+        self.max_gross_exposure = max_gross_exposure
+        self.max_open_order_value = max_open_order_value
+        self.max_orders_per_second = max_orders_per_second
+        self.cash_buffer = cash_buffer
+        self.lot_size = lot_size
+        self.t_plus_one = t_plus_one
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **overrides) -> 'RiskLimits':
+        """从 trading.risk 配置创建限额，max_positions 和 single_position_limit 兼容 trading 下的旧配置
+
+        Args:
+            config: 配置参数字典
+            **overrides: 覆盖配置的限额（回测引擎按手续费和滑点设置 cash_buffer 等）
+
+        Returns:
+            RiskLimits: 限额
+        """
+        trading_config = config.get('trading') or {}
+        risk_config = dict(trading_config.get('risk') or {})
+        for name in ('max_positions', 'single_position_limit'):
+            if name not in risk_config and name in trading_config:
+                risk_config[name] = trading_config[name]
+        risk_config.update(overrides)
+        return cls(**{name: value for name, value in risk_config.items() if name in cls.__slots__})
+
+    def __repr__(self) -> str:
+        return 'RiskLimits(' + ', '.join(f"{name}={getattr(self, name)}" for name in self.__slots__) + ')'
+
+
+class RiskEngine:
+    """事前风控引擎
+
+    资金、持仓由 sync 全量设置，之后由 on_fill 增量更新；未完成委托由 on_order_update
+    （可注册为 OrderBook 监听器）维护，通过检查但尚未登记的委托按备注计入在途委托；
+    市值由 mark_price 更新。check 只读取这些累加器。
+    """
+
+    def __init__(self, limits: Optional[RiskLimits] = None):
+        """初始化风控引擎
+
+        Args:
+            limits: 风控限额
+        """
+        self.limits = limits or RiskLimits()
+        self._lock = threading.RLock()
+        # 资金：cash 为不含挂单冻结的资金余额，可用资金 = cash - 买入挂单金额
+        self.cash = 0.0
+        self.total_asset = 0.0
+        # 持仓：数量、可卖数量、最新价、市值及其合计
+        self._volumes: Dict[str, int] = {}
+        self._sellable: Dict[str, int] = {}
+        self._prices: Dict[str, float] = {}
+        self._values: Dict[str, float] = {}
+        self.position_value = 0.0
+        # 未完成委托：委托编号（在途委托为委托备注）到 (代码, 方向, 剩余数量, 价格)，及按股票和合计的累加器
+        self._orders: Dict[Any, Tuple[str, str, int, float]] = {}
+        self._traded: Dict[int, int] = {}
+        self._open_buy_value: Dict[str, float] = {}
+        self._open_sell_volume: Dict[str, int] = {}
+        self._open_count: Dict[Tuple[str, str], int] = {}
+        self.open_buy_value = 0.0
+        self.open_sell_value = 0.0
+        # 有买入挂单但尚未持仓的股票数（计入持仓股票数限制）
+        self._pending_positions = 0
+        # 最近一秒通过检查的委托时间
+        self._recent: deque = deque()
+        self.stats: Dict[str, int] = {'checked': 0, 'passed': 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **overrides) -> 'RiskEngine':
+        """按 trading.risk 配置创建风控引擎"""
+        return cls(RiskLimits.from_config(config, **overrides))
+
+    # ------------------------------------------------------------------ 状态维护
+
+    def sync(self, cash: float, total_asset: Optional[float] = None,
+             positions: Optional[Dict[str, Any]] = None, frozen_cash: float = 0.0) -> None:
+        """用全量查询结果重置资金和持仓（只在定期核对时调用）
+
+        Args:
+            cash: 可用资金
+            total_asset: 总资产，None 表示按资金和持仓市值计算
+            positions: 股票代码到持仓数量或 (持仓数量, 可卖数量[, 价格]) 的映射，None 表示保留现有持仓
+            frozen_cash: 挂单冻结资金，与可用资金相加得到资金余额
+        """
+        with self._lock:
+            self.cash = cash + frozen_cash
+            if positions is not None:
+                self._volumes.clear()
+                self._sellable.clear()
+                self._values.clear()
+                self.position_value = 0.0
+                for code, position in positions.items():
+                    volume, sellable, price = (tuple(position) + (0.0,))[:3] if isinstance(position, tuple) \
+                        else (position, position, 0.0)
+                    if price and price > 0:
+                        self._prices[code] = price
+                    if volume:
+                        self._set_volume(code, int(volume))
+                        self._sellable[code] = int(sellable)
+                self._pending_positions = sum(1 for code in self._open_buy_value if code not in self._volumes)
+            self.total_asset = total_asset if total_asset is not None else self.cash + self.position_value
+
+    def _is_pending(self, code: str) -> bool:
+        """股票有买入挂单但尚未持仓"""
+        return code in self._open_buy_value and code not in self._volumes
+
+    def _set_volume(self, code: str, volume: int) -> None:
+        """设置持仓数量并调整市值合计"""
+        pending = self._is_pending(code)
+        value = volume * self._prices.get(code, 0.0)
+        self.position_value += value - self._values.get(code, 0.0)
+        if volume > 0:
+            self._volumes[code] = volume
+            self._values[code] = value
+        else:
+            self._volumes.pop(code, None)
+            self._values.pop(code, None)
+            self._sellable.pop(code, None)
+        self._pending_positions += self._is_pending(code) - pending
+
+    def mark_price(self, code: str, price: float) -> None:
+        """更新最新价及该股票持仓市值"""
+        if not price or price <= 0:
+            return
+        with self._lock:
+            self._prices[code] = price
+            if code in self._volumes:
+                self._set_volume(code, self._volumes[code])
+
+    def set_total_asset(self, total_asset: float) -> None:
+        """更新总资产（单票和总仓位比例的分母）"""
+        with self._lock:
+            self.total_asset = total_asset
+
+    def on_fill(self, code: str, side: str, volume: int, price: float) -> None:
+        """成交后更新资金、持仓和可卖数量
+
+        Args:
+            code: 股票代码
+            side: 'buy' 或 'sell'
+            volume: 成交数量
+            price: 成交价格
+        """
+        with self._lock:
+            if price > 0 and code not in self._prices:
+                self._prices[code] = price
+            if side == 'buy':
+                self.cash -= volume * price
+                self._set_volume(code, self._volumes.get(code, 0) + volume)
+                if not self.limits.t_plus_one:
+                    self._sellable[code] = self._sellable.get(code, 0) + volume
+            else:
+                self.cash += volume * price
+                self._sellable[code] = max(self._sellable.get(code, 0) - volume, 0)
+                self._set_volume(code, self._volumes.get(code, 0) - volume)
+
+    def on_order_update(self, record: Any) -> None:
+        """按委托记录更新未完成委托累加器和成交（OrderBook 监听器）
+
+        Args:
+            record: 委托记录，需有 order_id、stock_code、order_type、price、order_remark、
+                traded_volume、traded_price、remaining_volume、is_final
+        """
+        side = 'buy' if record.order_type == ORDER_TYPES['buy'] else 'sell'
+        remaining = 0 if record.is_final else int(record.remaining_volume)
+        traded = int(record.traded_volume or 0)
+        with self._lock:
+            # 委托登记到委托簿后，通过检查时按备注计入的在途委托转为挂单
+            if record.order_remark:
+                self.release(record.order_remark)
+            previous = self._orders.pop(record.order_id, None)
+            if previous is not None:
+                self._open(previous[0], previous[1], -previous[2], previous[3], -1)
+            # 首次出现的委托以当时的成交数量为基准，此前的成交已包含在 sync 的全量持仓中
+            traded_before = self._traded.get(record.order_id, traded)
+            if traded > traded_before:
+                self.on_fill(record.stock_code, side, traded - traded_before,
+                             record.traded_price or record.price)
+            self._traded[record.order_id] = max(traded, traded_before)
+            if remaining > 0:
+                self._orders[record.order_id] = (record.stock_code, side, remaining, record.price)
+                self._open(record.stock_code, side, remaining, record.price, 1)
+
+    def release(self, key: str) -> None:
+        """释放按备注计入的在途委托（下单失败或委托已登记）"""
+        if not key:
+            return
+        with self._lock:
+            pending = self._orders.pop(key, None)
+            if pending is not None:
+                self._open(pending[0], pending[1], -pending[2], pending[3], -1)
+
+    def _open(self, code: str, side: str, volume: int, price: float, count: int) -> None:
+        """调整未完成委托累加器，volume 和 count 为增量"""
+        key = (code, side)
+        self._open_count[key] = self._open_count.get(key, 0) + count
+        if self._open_count[key] <= 0:
+            del self._open_count[key]
+        if side == 'buy':
+            pending = self._is_pending(code)
+            self.open_buy_value += volume * price
+            value = self._open_buy_value.get(code, 0.0) + volume * price
+            if self._open_count.get(key):
+                self._open_buy_value[code] = value
+            else:
+                self._open_buy_value.pop(code, None)
+            self._pending_positions += self._is_pending(code) - pending
+        else:
+            self.open_sell_value += volume * price
+            sell_volume = self._open_sell_volume.get(code, 0) + volume
+            if sell_volume > 0:
+                self._open_sell_volume[code] = sell_volume
+            else:
+                self._open_sell_volume.pop(code, None)
+
+    # ------------------------------------------------------------------ 检查
+
+    def check(self, code: str, side: str, volume: float, price: float, key: Optional[str] = None,
+              now: Optional[float] = None) -> Optional[str]:
+        """检查一笔委托，通过时计入每秒委托数，并按 key 计入在途委托直到 on_order_update 或 release
+
+        Args:
+            code: 股票代码
+            side: 'buy' 或 'sell'
+            volume: 委托数量
+            price: 委托价格（市价委托传参考价）
+            key: 在途委托的标识（委托备注），None 表示不计入（回测中委托立即成交）
+            now: 当前时间戳，默认 time.time()
+
+        Returns:
+            Optional[str]: 未通过的原因，通过时返回None
+        """
+        limits = self.limits
+        with self._lock:
+            self.stats['checked'] += 1
+            reason, rule = None, ''
+            value = volume * price
+            if volume <= 0 or (side == 'buy' and volume % limits.lot_size != 0):
+                reason, rule = f"无效的交易数量: {volume}，买入必须为{limits.lot_size}的整数倍", 'volume'
+            elif side == 'buy':
+                available = self.cash - self.open_buy_value
+                exposure = self._values.get(code, 0.0) + self._open_buy_value.get(code, 0.0) + value
+                if available < value * limits.cash_buffer:
+                    reason, rule = (f"资金不足 - 所需: {value * limits.cash_buffer:.2f}, "
+                                    f"可用: {available:.2f}"), 'cash'
+                elif limits.max_positions and code not in self._volumes and \
+                        len(self._volumes) + self._pending_positions >= limits.max_positions:
+                    reason, rule = f"超过最大持仓限制: {limits.max_positions}", 'max_positions'
+                elif limits.single_position_limit and exposure > self.total_asset * limits.single_position_limit:
+                    reason, rule = (f"超过单只股票资金比例限制: {limits.single_position_limit * 100}% - "
+                                    f"持仓及挂单: {exposure:.2f}, 总资产: {self.total_asset:.2f}"), \
+                        'single_position_limit'
+                elif limits.max_gross_exposure and \
+                        self.position_value + self.open_buy_value + value > self.total_asset * limits.max_gross_exposure:
+                    reason, rule = f"超过总仓位比例限制: {limits.max_gross_exposure * 100}%", 'max_gross_exposure'
+            else:
+                sellable = self._sellable.get(code, 0) - self._open_sell_volume.get(code, 0)
+                if sellable < volume:
+                    reason, rule = f"可卖数量不足 - 代码: {code}, 所需: {volume}, 可卖: {sellable}", 'sellable'
+
+            if reason is None and limits.max_open_order_value and \
+                    self.open_buy_value + self.open_sell_value + value > limits.max_open_order_value:
+                reason, rule = f"超过未完成委托金额上限: {limits.max_open_order_value:.2f}", 'max_open_order_value'
+            if reason is None and limits.max_orders_per_second:
+                now = time.time() if now is None else now
+                while self._recent and self._recent[0] <= now - 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= limits.max_orders_per_second:
+                    reason, rule = f"超过每秒委托数上限: {limits.max_orders_per_second}", 'max_orders_per_second'
+                else:
+                    self._recent.append(now)
+
+            if reason is not None:
+                self.stats[rule] = self.stats.get(rule, 0) + 1
+                return reason
+            if self._open_count.get((code, side)):
+                logger.warning(f"存在未完成的同向委托 - 代码: {code}, 方向: {side}")
+            if key is not None:
+                self._orders[key] = (code, side, int(volume), price)
+                self._open(code, side, int(volume), price, 1)
+            self.stats['passed'] += 1
+            return None
+
+    # ------------------------------------------------------------------ 查询
+
+    def position(self, code: str) -> int:
+        """持仓数量"""
+        return self._volumes.get(code, 0)
+
+    def sellable(self, code: str) -> int:
+        """可卖数量（已扣除未完成的卖出委托）"""
+        with self._lock:
+            return self._sellable.get(code, 0) - self._open_sell_volume.get(code, 0)
+
+    def position_count(self) -> int:
+        """持仓股票数"""
+        return len(self._volumes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """风控状态快照，用于日志和监控"""
+        with self._lock:
+            return {
+                'cash': self.cash,
+                'available_cash': self.cash - self.open_buy_value,
+                'total_asset': self.total_asset,
+                'position_value': self.position_value,
+                'position_count': len(self._volumes),
+                'open_buy_value': self.open_buy_value,
+                'open_sell_value': self.open_sell_value,
+                'open_orders': len(self._orders),
+                'stats': dict(self.stats),
+            }
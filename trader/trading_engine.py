@@ -4,7 +4,7 @@
 """交易引擎模块
 
 此模块实现了实盘交易的核心功能，包括：
-1. 订单管理
+1. 订单管理（委托簿由交易推送驱动，只定期全量核对）
 2. 仓位管理
 3. 风险控制
 4. 交易执行
@@ -13,59 +13,55 @@
 import time
 import os
 import pickle
-from typing import Dict, Any, Optional, List, Tuple, Union
+from typing import Dict, Any, Optional, List, Tuple, Union, Mapping
 from datetime import datetime, timedelta
-from functools import wraps
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from loguru import logger
 
+from xtquant import xtconstant
 from xtquant.xttype import StockAccount
 from xtquant.xttrader import XtQuantTrader, XtQuantTraderCallback
 
 from strategies.base_strategy import BaseStrategy
+from trader.order_book import OrderBook, SubmissionTracker, OrderRejectedError, ORDER_TYPES
+from trader.basket import BasketDispatcher, BasketOrder, BasketReport, xt_price_type
+from trader.order_scheduler import OrderScheduler, TTLPolicy
+from trader.risk_engine import RiskEngine
+from trader.account_cache import AccountCache, AccountAsset
 from utils.logger import trade_log
+from utils.xt_session import get_session
 
 # 定义交易异常类
 class TradingError(Exception):
     """交易过程中的异常"""
     pass
 
-# 定义重试装饰器
-def retry_on_error(max_attempts: int = 3, delay: float = 1.0):
-    """函数执行失败时进行重试的装饰器
-    
-    Args:
-        max_attempts: 最大重试次数
-        delay: 重试间隔时间(秒)
-        
-    Returns:
-        装饰后的函数
-    """
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            attempts = 0
-            while attempts < max_attempts:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    if attempts == max_attempts:
-                        logger.error(f"函数 {func.__name__} 执行失败，已重试 {attempts} 次: {str(e)}")
-                        raise
-                    logger.warning(f"函数 {func.__name__} 执行失败，正在进行第 {attempts} 次重试: {str(e)}")
-                    time.sleep(delay)
-        return wrapper
-    return decorator
-
 class TradingCallback(XtQuantTraderCallback):
-    """交易回调类"""
+    """交易回调类，把委托、成交和委托失败推送写入委托簿，资金、持仓和成交推送写入账户缓存"""
+
+    def __init__(self, order_book: Optional[OrderBook] = None,
+                 submissions: Optional[SubmissionTracker] = None,
+                 account_cache: Optional[AccountCache] = None):
+        """初始化回调
 
-    def __init__(self):
+        Args:
+            order_book: 委托簿，为None时只记录日志
+            submissions: 异步下单的回报跟踪
+            account_cache: 账户缓存
+        """
         super().__init__()
+        self.order_book = order_book
+        self.submissions = submissions
+        self.account_cache = account_cache
 
     def on_disconnected(self):
         """连接断开回调"""
         logger.error("交易连接断开")
+        if self.order_book is not None:
+            # 断线期间的推送会丢失，下一次更新交易状态时全量核对
+            self.order_book.last_reconcile = 0.0
+        if self.account_cache is not None:
+            self.account_cache.last_reconcile = 0.0
 
     def on_stock_order(self, order):
         """委托回报推送
@@ -75,6 +71,8 @@ class TradingCallback(XtQuantTraderCallback):
         """
         trade_log(f"委托回报 - 代码: {order.stock_code}, 状态: {order.order_status}, "
                  f"委托编号: {order.order_sysid}")
+        if self.order_book is not None:
+            self.order_book.on_order(order)
 
     def on_stock_trade(self, trade):
         """成交回报推送
@@ -84,6 +82,30 @@ class TradingCallback(XtQuantTraderCallback):
         """
         trade_log(f"成交回报 - 账户: {trade.account_id}, 代码: {trade.stock_code}, "
                  f"委托编号: {trade.order_id}")
+        if self.order_book is not None:
+            self.order_book.on_trade(trade)
+        if self.account_cache is not None:
+            self.account_cache.on_trade(trade)
+
+    def on_stock_asset(self, asset):
+        """资金推送
+
+        Args:
+            asset: XtAsset对象
+        """
+        if self.account_cache is not None:
+            self.account_cache.on_asset(asset)
+
+    def on_stock_position(self, position):
+        """持仓推送
+
+        Args:
+            position: XtPosition对象
+        """
+        logger.debug(f"持仓推送 - 代码: {position.stock_code}, 数量: {position.volume}, "
+                     f"可用: {position.can_use_volume}")
+        if self.account_cache is not None:
+            self.account_cache.on_position(position)
 
     def on_order_error(self, order_error):
         """委托失败推送
@@ -93,6 +115,20 @@ class TradingCallback(XtQuantTraderCallback):
         """
         logger.error(f"委托失败 - 委托编号: {order_error.order_id}, "
                     f"错误码: {order_error.error_id}, 错误信息: {order_error.error_msg}")
+        if self.order_book is not None:
+            self.order_book.on_order_error(order_error)
+        if self.submissions is not None:
+            self.submissions.on_error(order_error)
+    
+    def on_order_stock_async_response(self, response):
+        """异步下单回报推送
+
+        Args:
+            response: XtOrderResponse对象
+        """
+        trade_log(f"异步下单回报 - 请求序号: {response.seq}, 委托编号: {response.order_id}")
+        if self.submissions is not None:
+            self.submissions.on_response(response)
 
     def on_cancel_error(self, cancel_error):
         """撤单失败推送
@@ -116,15 +152,31 @@ class TradingEngine:
         self.account_config = config['account']
         self.trading_config = config['trading']
         
+        # 委托簿：由推送更新，按 trading.reconcile_interval 秒全量查询核对一次
+        self.order_book = OrderBook(self.trading_config.get('reconcile_interval', 60))
+        # 异步下单：请求序号到回报的对应，place_order 最多等待 order_response_timeout 秒
+        self.submissions = SubmissionTracker(self.order_book)
+        self.order_response_timeout = self.trading_config.get('order_response_timeout', 5.0)
+        self.strategy_name = ''
+        # 篮子委托：批量校验、轧差，按 trading.basket 限速并发发出
+        self.basket = BasketDispatcher.from_config(self._submit_basket_order, self.order_book, config)
+        self.latest_prices: Dict[str, float] = {}
+        # 事前风控：限额见 trading.risk，挂单和成交由委托簿推送增量更新
+        self.risk = RiskEngine.from_config(config)
+        self.order_book.add_listener(self.risk.on_order_update)
+        # 委托超时调度：到期即按策略撤单或追价，按 trading.order_timeout 和 trading.order_policies 配置
+        self.scheduler = OrderScheduler.from_config(self.order_book, self._cancel_order, self._chase_order, config)
+        # 资金和持仓：由推送增量更新，按 trading.account_reconcile_interval 秒全量查询核对一次
+        self.account_cache = AccountCache(self.trading_config.get('account_reconcile_interval', 300),
+                                          snapshot_lag=self.trading_config.get('account_snapshot_lag', 1.0))
+        self.order_book.add_listener(self.account_cache.on_order_update)
+        
         # 初始化交易接口
-        self.callback = TradingCallback()
+        self.callback = TradingCallback(self.order_book, self.submissions, self.account_cache)
         self.trader = XtQuantTrader(self.callback)
         self.account = StockAccount(self.account_config['account_id'])
         
         # 交易状态
-        self.orders = {}
-        self.positions = {}
-        self.assets = None
         self.connected = False
         self.last_update_time = None
         
@@ -141,10 +193,13 @@ class TradingEngine:
             'reconnect_count': 0
         }
         
+        # xttrader 调用会话（限流、熔断、截止时间重试）
+        self.session = get_session('xttrader', config)
+        self.connect_deadline = self.trading_config.get('connect_deadline', 30.0)
+        
         # 初始化交易接口
-        self._init_trader()
+        self.session.call('init_trader', self._init_trader, deadline=self.connect_deadline)
     
-    @retry_on_error(max_attempts=3, delay=2.0)
     def _init_trader(self) -> None:
         """初始化交易接口"""
         try:
@@ -186,6 +241,10 @@ class TradingEngine:
         """
         try:
             logger.info(f"启动交易引擎 - 策略: {strategy.name}")
+            self.strategy_name = strategy.name
+            # 策略的交易信号作为一个篮子由本引擎下单
+            strategy.order_router = self
+            self.scheduler.start()
             
             # 检查交易连接状态
             if not self._check_connection():
@@ -193,7 +252,7 @@ class TradingEngine:
                 self._reconnect()
                 
             # 更新账户信息
-            self._update_account_info()
+            self._update_account_info(force=True)
             
             # 运行策略
             while True:
@@ -207,6 +266,7 @@ class TradingEngine:
                 if not data:
                     continue
                 data_time = time.time() - start_time
+                self._update_latest_prices(data)
                 
                 # 运行策略
                 start_time = time.time()
@@ -216,8 +276,9 @@ class TradingEngine:
                 # 记录性能统计
                 logger.debug(f"性能统计 - 数据获取: {data_time:.3f}秒, 策略执行: {strategy_time:.3f}秒")
                 
-                # 更新交易状态
+                # 更新交易状态，账户信息到核对间隔时才查询
                 self._update_trading_status()
+                self._update_account_info()
                 
                 # 保存交易状态
                 self._save_trading_state()
@@ -233,6 +294,8 @@ class TradingEngine:
             self._load_trading_state()
             raise
         finally:
+            self.scheduler.stop()
+            self.basket.shutdown()
             self.trader.stop()
             
     def _check_connection(self) -> bool:
@@ -259,7 +322,6 @@ class TradingEngine:
             self.connected = False
             return False
             
-    @retry_on_error(max_attempts=3, delay=5.0)
     def _reconnect(self) -> bool:
         """重新连接交易接口
         
@@ -271,8 +333,8 @@ class TradingEngine:
             self.trader.stop()
             time.sleep(2)
             
-            # 重新初始化
-            self._init_trader()
+            # 重新初始化（由会话负责有限次重试，不再叠加外层重试）
+            self.session.call('init_trader', self._init_trader, deadline=self.connect_deadline)
             
             # 更新统计信息
             self.stats['reconnect_count'] += 1
@@ -286,11 +348,14 @@ class TradingEngine:
         """保存交易状态到缓存"""
         try:
             state = {
-                'orders': self.orders,
-                'positions': self.positions,
-                'assets': self.assets,
+                'orders': self.order_book.snapshot(),
+                'account': self.account_cache.snapshot(),
                 'timestamp': datetime.now(),
-                'stats': self.stats
+                'stats': self.stats,
+                'sessions': {
+                    'xtdata': get_session('xtdata').get_stats(),
+                    'xttrader': self.session.get_stats()
+                }
             }
             
             cache_path = os.path.join(self.cache_dir, 'trading_state.pkl')
@@ -321,9 +386,9 @@ class TradingEngine:
                 logger.warning("交易状态缓存已过期，无法恢复")
                 return False
                 
-            self.orders = state['orders']
-            self.positions = state['positions']
-            self.assets = state['assets']
+            # 委托由推送和下一次全量核对重建，只恢复持仓、资产和统计
+            self.order_book.last_reconcile = 0.0
+            self.account_cache.restore(state.get('account') or {})
             self.stats = state['stats']
             
             logger.info("已从缓存恢复交易状态")
@@ -332,7 +397,6 @@ class TradingEngine:
             logger.error(f"加载交易状态失败: {str(e)}")
             return False
     
-    @retry_on_error(max_attempts=3, delay=1.0)
     def _get_market_data(self, strategy: BaseStrategy) -> Dict[str, Any]:
         """获取市场数据
 
@@ -343,9 +407,15 @@ class TradingEngine:
             Dict[str, Any]: 市场数据字典
         """
         try:
+            # 行情推送已写入环形缓冲区时直接读取，无需请求行情和落盘缓存；
+            # 推送线程（或行情进程）可能正在改写最后一条，按 seqlock 读取一致的副本
+            window_data = strategy.data_fetcher.get_window_data(strategy.universe)
+            if window_data:
+                return strategy.data_fetcher.clean_data(window_data)
+
             # 获取当前时间
             now = datetime.now()
-            
+
             # 尝试从缓存加载数据
             cache_key = f"{strategy.name}_{now.strftime('%Y%m%d_%H%M')}"
             cached_data = self._get_cached_data(cache_key)
@@ -360,7 +430,7 @@ class TradingEngine:
                 try:
                     market_data = strategy.data_fetcher.get_realtime_data(code)
                     if market_data:
-                        data[code] = market_data
+                        data[code] = market_data[code]
                     else:
                         logger.warning(f"获取实时数据失败: {code}")
                         data_errors += 1
@@ -374,6 +444,9 @@ class TradingEngine:
                 self.connected = False
                 raise TradingError("数据获取失败率过高")
             
+            # 整体数据质量检查
+            data = strategy.data_fetcher.clean_data(data)
+            
             # 缓存市场数据
             self._cache_market_data(cache_key, data)
             
@@ -428,98 +501,92 @@ class TradingEngine:
         except Exception as e:
             logger.error(f"缓存市场数据失败: {str(e)}")
     
-    @retry_on_error(max_attempts=3, delay=1.0)
-    def _update_account_info(self) -> bool:
-        """更新账户信息
-        
+    def _update_account_info(self, force: bool = False) -> bool:
+        """全量查询资金和持仓，核对账户缓存
+
+        资金和持仓由推送实时写入账户缓存，这里只按 trading.account_reconcile_interval 间隔查询。
+
+        Args:
+            force: 是否忽略核对间隔立即查询
+
         Returns:
             bool: 更新是否成功
         """
         try:
+            if not force and not self.account_cache.needs_reconcile():
+                return True
+            
             # 查询资金信息
-            assets = self.trader.query_stock_assets(self.account)
+            assets = self.session.call('query_stock_asset', self.trader.query_stock_asset, self.account)
             if not assets:
                 logger.error("获取资产信息失败")
                 return False
-                
-            self.assets = assets
-            self.last_update_time = datetime.now()
-                
-            trade_log(f"账户资金 - 总资产: {assets.total_asset:.2f}, "
-                     f"可用资金: {assets.cash:.2f}")
             
             # 查询持仓信息
-            positions = self.trader.query_stock_positions(self.account)
+            positions = self.session.call('query_stock_positions', self.trader.query_stock_positions, self.account)
             if not positions and self.positions:
                 logger.warning("获取持仓信息为空，但当前有记录的持仓，可能是接口问题")
                 # 不更新持仓信息，保留之前的记录
-            elif positions:
-                old_positions = self.positions.copy()
-                self.positions = {}
-                for pos in positions:
-                    self.positions[pos.stock_code] = pos.volume
-                    trade_log(f"账户持仓 - 代码: {pos.stock_code}, "
-                             f"数量: {pos.volume}, 可用: {pos.can_use_volume}")
-                    
-                # 检查持仓变化
-                for code, volume in self.positions.items():
-                    if code in old_positions:
-                        if volume != old_positions[code]:
-                            logger.info(f"持仓变化 - {code}: {old_positions[code]} -> {volume}")
-                    else:
-                        logger.info(f"新增持仓 - {code}: {volume}")
-                        
-                for code, volume in old_positions.items():
-                    if code not in self.positions:
-                        logger.info(f"清空持仓 - {code}")
+                positions = None
             
+            self.account_cache.reconcile(assets, positions, self.order_book.active_orders())
+            self.last_update_time = datetime.now()
+            trade_log(f"账户资金 - 总资产: {assets.total_asset:.2f}, "
+                     f"可用资金: {assets.cash:.2f}, 持仓数: {len(self.positions)}")
+            
+            # 风控累加器以核对后的账户为准
+            snapshot = self.account_cache.snapshot()
+            self.risk.sync(assets.cash, assets.total_asset, frozen_cash=getattr(assets, 'frozen_cash', 0.0),
+                           positions={code: (p['volume'], p['can_use_volume'],
+                                             p['market_value'] / p['volume'] if p['volume'] else 0.0)
+                                      for code, p in snapshot['positions'].items()})
             return True
             
         except Exception as e:
             logger.error(f"更新账户信息失败: {str(e)}")
             return False
     
-    @retry_on_error(max_attempts=3, delay=1.0)
+    @property
+    def positions(self) -> Mapping[str, int]:
+        """持仓数量（股票代码到数量的只读映射），从账户缓存读取"""
+        return self.account_cache.volumes
+    
+    @property
+    def assets(self) -> Optional[AccountAsset]:
+        """账户资金，从账户缓存读取，未查询到时为None"""
+        return self.account_cache.asset
+    
+    @property
+    def orders(self) -> Dict[int, Any]:
+        """活跃委托（委托编号到委托记录的映射），从委托簿读取"""
+        return {record.order_id: record for record in self.order_book.active_orders()}
+    
     def _update_trading_status(self) -> bool:
         """更新交易状态
-        
+
+        委托状态由推送实时写入委托簿，这里只按间隔全量核对；超时委托由 OrderScheduler 在到期时处理。
+
         Returns:
             bool: 更新是否成功
         """
         try:
-            # 查询未完成订单
-            orders = self.trader.query_stock_orders(self.account, False)
-            if orders is None:
-                logger.error("获取委托信息失败")
-                return False
-                
+            # 定期全量核对，补齐断线期间丢失的推送
+            if self.order_book.needs_reconcile():
+                orders = self.session.call('query_stock_orders', self.trader.query_stock_orders, self.account, False)
+                if orders is None:
+                    logger.error("获取委托信息失败")
+                    return False
+                self.order_book.reconcile(orders)
+            
             self.last_update_time = datetime.now()
             
-            # 更新委托状态
-            old_orders = self.orders.copy() if self.orders else {}
-            self.orders = {}
-            for order in orders:
-                if order.order_status not in ['已成交', '已撤单', '已拒绝']:
-                    self.orders[order.order_id] = order
-                    # 检查订单超时
-                    order_time = datetime.strptime(order.order_time, '%H:%M:%S')
-                    if (datetime.now() - order_time).seconds > self.config['trading']['order_timeout']:
-                        # 撤销超时订单
-                        self.trader.cancel_order_stock(self.account, order.order_id)
-                        trade_log(f"撤销超时订单 - 委托号: {order.order_id}")
-            
-            # 检查委托变化
-            for order_id, order in self.orders.items():
-                if order_id in old_orders:
-                    old_status = old_orders[order_id].order_status
-                    if order.order_status != old_status:
-                        logger.info(f"委托状态变化 - ID: {order_id}, {old_status} -> {order.order_status}")
-                else:
-                    logger.info(f"新增委托 - ID: {order_id}, 状态: {order.order_status}")
-            
-            if self.orders:
-                logger.info(f"当前活跃委托数量: {len(self.orders)}")
-                logger.debug(f"活跃委托详情: {[f'{o.stock_code}:{o.order_status}' for o in self.orders.values()]}")
+            # 长时间没有回报的异步委托置为失败，之后到达的委托由推送和核对补齐
+            self.submissions.expire(self.order_response_timeout * 2)
+            
+            active = self.order_book.active_orders()
+            if active:
+                logger.debug(f"当前活跃委托数量: {len(active)}, "
+                             f"详情: {[f'{o.stock_code}:{o.order_status}' for o in active]}")
             
             return True
             
@@ -527,72 +594,203 @@ class TradingEngine:
             logger.error(f"更新交易状态失败: {str(e)}")
             return False
     
-    @retry_on_error(max_attempts=2, delay=0.5)
-    def place_order(self, code: str, direction: str, volume: float, price: float) -> bool:
-        """下单
+    def submit_order(self, code: str, direction: str, volume: float, price: float,
+                     remark: str = '', price_type: int = xtconstant.FIX_PRICE) -> Optional[Future]:
+        """异步下单，不等待柜台回报
+
+        通过 order_stock_async 发出委托后立即返回，委托编号由 on_order_stock_async_response 推送，
+        回报到达时 Future 完成并把委托登记到委托簿。
 
         Args:
             code: 股票代码
             direction: 交易方向，'buy'或'sell'
             volume: 交易数量
-            price: 交易价格
+            price: 交易价格（限价单的委托价格，其他报价类型的参考价）
+            remark: 委托备注，默认生成唯一备注用于关联失败推送
+            price_type: xtconstant 报价类型，默认限价
 
         Returns:
-            bool: 下单是否成功
+            Optional[Future]: 结果为委托编号，被拒绝时抛出 OrderRejectedError；未通过检查时返回None
         """
         try:
             # 检查交易连接状态
             if not self._check_connection():
                 logger.error("交易连接已断开，无法下单")
-                return False
+                return None
                 
             # 检查是否可交易
-            if not self._check_tradable(code, direction, volume):
-                return False
+            remark = remark or self.submissions.next_remark()
+            if not self._check_tradable(code, direction, volume, price, remark):
+                return None
             
             # 更新统计信息
             self.stats['order_count'] += 1
-            start_time = time.time()
             
-            # 执行下单
-            if direction == 'buy':
-                order_id = self.trader.order_stock(self.account, code, price, volume, 'buy')
-            else:
-                order_id = self.trader.order_stock(self.account, code, price, volume, 'sell')
-            
-            # 记录下单耗时
-            order_time = time.time() - start_time
-            logger.debug(f"下单耗时: {order_time:.3f}秒")
-            
-            if order_id:
-                trade_log(f"下单成功 - 代码: {code}, 方向: {direction}, "
-                         f"数量: {volume}, 价格: {price:.3f}, 委托号: {order_id}")
-                self.stats['success_count'] += 1
-                
-                # 立即更新交易状态
-                self._update_trading_status()
-                return True
-            else:
+            # 执行下单（非幂等操作，只限流和熔断，不重试）
+            seq = self.session.call('order_stock_async', self.trader.order_stock_async,
+                                    self.account, code, ORDER_TYPES[direction], int(volume),
+                                    price_type, price, self.strategy_name, remark, retry=False)
+            if seq is None or seq < 0:
                 logger.error(f"下单失败 - 代码: {code}, 方向: {direction}")
                 self.stats['fail_count'] += 1
-                return False
+                self.risk.release(remark)
+                return None
+            
+            future = self.submissions.register(seq, {
+                'stock_code': code, 'order_type': ORDER_TYPES[direction], 'order_volume': int(volume),
+                'price': price, 'order_remark': remark, 'strategy_name': self.strategy_name})
+            future.add_done_callback(
+                lambda f: self._on_submission_done(f, code, direction, volume, price, remark))
+            return future
             
-        except TradingError as e:
-            logger.error(f"下单执行错误: {str(e)}")
-            self.stats['fail_count'] += 1
-            return False
         except Exception as e:
-            logger.error(f"下单执行未知错误: {str(e)}")
+            logger.error(f"下单执行错误 - 代码: {code}: {str(e)}")
+            self.stats['fail_count'] += 1
+            self.risk.release(remark)
+            return None
+    
+    def _cancel_order(self, record: Any) -> None:
+        """撤销超时委托（委托超时调度线程调用）"""
+        result = self.session.call('cancel_order_stock', self.trader.cancel_order_stock,
+                                   self.account, record.order_id)
+        if result is not None and result != 0:
+            logger.error(f"撤销超时订单失败 - 委托号: {record.order_id}, 返回: {result}")
+            return
+        trade_log(f"撤销超时订单 - 委托号: {record.order_id}")
+    
+    def _chase_order(self, record: Any, policy: TTLPolicy, attempt: int) -> Optional[Future]:
+        """超时委托撤销后按最新价让出若干价位重新委托剩余数量
+
+        Args:
+            record: 已撤销的委托记录
+            policy: 超时策略
+            attempt: 第几次追价
+
+        Returns:
+            Optional[Future]: 新委托的 Future，无法追价时返回None
+        """
+        direction = 'buy' if record.order_type == ORDER_TYPES['buy'] else 'sell'
+        volume = record.remaining_volume
+        if direction == 'buy':
+            volume = volume // 100 * 100
+        price = self.latest_prices.get(record.stock_code) or record.price
+        offset = policy.chase_ticks * policy.tick_size
+        price = round(price + offset if direction == 'buy' else price - offset, 2)
+        if volume <= 0 or price <= 0:
+            return None
+        trade_log(f"追价委托 - 代码: {record.stock_code}, 方向: {direction}, 数量: {volume}, "
+                  f"价格: {price:.3f}, 第{attempt}次, 原委托号: {record.order_id}")
+        return self.submit_order(record.stock_code, direction, volume, price)
+    
+    def _on_submission_done(self, future: Future, code: str, direction: str, volume: float, price: float,
+                            remark: str = '') -> None:
+        """异步委托回报到达后的统计和日志，失败时释放风控的在途委托"""
+        if future.exception() is not None:
+            logger.error(f"下单失败 - 代码: {code}, 方向: {direction}, {str(future.exception())}")
             self.stats['fail_count'] += 1
+            self.risk.release(remark)
+            return
+        trade_log(f"下单成功 - 代码: {code}, 方向: {direction}, "
+                 f"数量: {volume}, 价格: {price:.3f}, 委托号: {future.result()}")
+        self.stats['success_count'] += 1
+    
+    def _submit_basket_order(self, order: BasketOrder) -> Optional[Future]:
+        """篮子发出器使用的单笔异步下单"""
+        return self.submit_order(order.code, order.side, order.volume, order.price, order.remark,
+                                 xt_price_type(order.price_type, order.code))
+    
+    def submit_basket(self, orders: List[Any], wait: Optional[float] = None) -> BasketReport:
+        """批量下单：批量校验、与未完成委托轧差后，按 trading.basket 限速并发发出
+
+        Args:
+            orders: BasketOrder 或字典（code、side/direction、volume、price，可选 price_type、remark）
+            wait: 等待回报的秒数，None 表示发出后立即返回（结果在回报到达时更新）
+
+        Returns:
+            BasketReport: 逐笔结果（委托编号或失败原因）和整篮耗时
+        """
+        cash = self.assets.cash if self.assets else None
+        return self.basket.dispatch(orders, cash=cash, positions=self.account_cache.sellable_volumes,
+                                    max_positions=self.trading_config.get('max_positions'), wait=wait)
+    
+    def submit_targets(self, targets: Dict[str, float], wait: Optional[float] = None) -> BasketReport:
+        """按目标仓位（占总资产的比例）与账户实际持仓的差额下单
+
+        持仓数量从账户缓存读取，按最新价折算为比例；未完成委托由篮子发出器轧差，
+        同一信号重复出现时不会重复买入。
+
+        Args:
+            targets: 股票代码到目标仓位比例的映射
+            wait: 等待回报的秒数
+
+        Returns:
+            BasketReport: 逐笔结果和整篮耗时
+        """
+        total_asset = self.assets.total_asset if self.assets else 0.0
+        basket = []
+        for code, target in targets.items():
+            price = self.latest_prices.get(code)
+            if not price or not total_asset:
+                logger.warning(f"缺少价格或资产信息，跳过委托 - 代码: {code}")
+                continue
+            delta = max(target, 0.0) * total_asset / price - self.account_cache.volume(code)
+            if delta > 0:
+                volume = int(delta // 100 * 100)
+                side = 'buy'
+            else:
+                # 清仓时卖出全部可卖数量（含零股），减仓按整手卖出
+                volume = int(-delta) if target > 0 else self.account_cache.volume(code)
+                volume = min(volume // 100 * 100 if target > 0 else volume, self.account_cache.sellable(code))
+                side = 'sell'
+            if volume > 0:
+                basket.append(BasketOrder(code, side, volume, price))
+        return self.submit_basket(basket, wait)
+    
+    def _update_latest_prices(self, data: Dict[str, Any]) -> None:
+        """记录每只股票的最新价，用于把仓位比例换算为股数"""
+        for code, stock_data in data.items():
+            for field in ('lastPrice', 'close'):
+                if stock_data is not None and field in stock_data and len(stock_data[field]):
+                    self.latest_prices[code] = float(stock_data[field][-1])
+                    self.risk.mark_price(code, self.latest_prices[code])
+                    break
+    
+    def place_order(self, code: str, direction: str, volume: float, price: float) -> bool:
+        """下单并等待柜台回报
+
+        Args:
+            code: 股票代码
+            direction: 交易方向，'buy'或'sell'
+            volume: 交易数量
+            price: 交易价格
+
+        Returns:
+            bool: 下单是否成功
+        """
+        start_time = time.time()
+        future = self.submit_order(code, direction, volume, price)
+        if future is None:
+            return False
+        try:
+            future.result(timeout=self.order_response_timeout)
+            logger.debug(f"下单耗时: {time.time() - start_time:.3f}秒")
+            return True
+        except FutureTimeoutError:
+            logger.error(f"等待委托回报超时 - 代码: {code}, 方向: {direction}")
+            return False
+        except OrderRejectedError:
             return False
     
-    def _check_tradable(self, code: str, direction: str, volume: float) -> bool:
+    def _check_tradable(self, code: str, direction: str, volume: float, price: float,
+                        remark: str = '') -> bool:
         """检查是否可交易
 
         Args:
             code: 股票代码
             direction: 交易方向
             volume: 交易数量
+            price: 交易价格
+            remark: 委托备注，通过检查后按备注计入风控的在途委托，委托登记到委托簿时转为挂单
 
         Returns:
             bool: 是否可交易
@@ -613,51 +811,16 @@ class TradingEngine:
                 logger.warning(f"无效的交易方向: {direction}")
                 return False
                 
-            # 检查交易数量
-            if volume <= 0 or volume % 100 != 0:
-                logger.warning(f"无效的交易数量: {volume}，必须为100的整数倍")
-                return False
-            
             # 检查账户资产
             if not self.assets:
                 logger.warning("账户资产信息不可用")
                 return False
-                
-            # 检查持仓限制
-            if direction == 'buy':
-                # 检查资金是否充足（预估）
-                if self.assets.cash < volume * price * 1.01:  # 考虑手续费
-                    logger.warning(f"资金不足 - 所需: {volume * price * 1.01:.2f}, 可用: {self.assets.cash:.2f}")
-                    return False
-                    
-                # 检查持仓数量限制
-                if len(self.positions) >= self.trading_config['max_positions'] \
-                        and code not in self.positions:
-                    logger.warning(f"超过最大持仓限制: {self.trading_config['max_positions']}")
-                    return False
-                    
-                # 检查单只股票资金比例限制
-                position_limit = self.trading_config.get('single_position_limit', 0.2)
-                if volume * price > self.assets.total_asset * position_limit:
-                    logger.warning(f"超过单只股票资金比例限制: {position_limit * 100}%")
-                    return False
-            else:  # 卖出
-                # 检查持仓是否存在
-                if code not in self.positions:
-                    logger.warning(f"持仓不存在 - 代码: {code}")
-                    return False
-                    
-                # 检查持仓是否足够
-                if self.positions[code] < volume:
-                    logger.warning(f"持仓不足 - 代码: {code}, 所需: {volume}, "
-                                 f"现有: {self.positions.get(code, 0)}")
-                    return False
             
-            # 检查是否有重复委托
-            for order_id, order in self.orders.items():
-                if order.stock_code == code and order.order_direction == direction:
-                    logger.warning(f"存在未完成的同向委托 - 代码: {code}, 方向: {direction}")
-                    # 不阻止交易，只是警告
+            # 事前风控：数量、资金、持仓数、单票和总仓位、挂单金额、委托频率、可卖数量
+            reason = self.risk.check(code, direction, volume, price, remark or None)
+            if reason:
+                logger.warning(reason)
+                return False
             
             return True
             
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""横截面因子处理模块
+
+此模块在（时间 × 股票）面板上按日期做横截面运算，包括：
+1. 排名与百分位（并列取平均排名）
+2. 去极值（分位数截断或中位数绝对偏差）
+3. 标准化（z-score，可按市值加权）
+4. 行业中性化，可同时对市值等风格暴露做回归剔除
+5. 市值加权
+
+所有函数对整个面板一次向量化计算，每行是一个日期；传入一维数组时视为单个日期的截面。
+缺失值（NaN）不参与计算，结果中仍为 NaN。
+"""
+
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _as_2d(values: Any) -> Tuple[np.ndarray, bool]:
+    """把一维截面转换为单行面板
+
+    Returns:
+        Tuple[np.ndarray, bool]: float64 二维数组、输入是否为一维
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.ndim == 1:
+        return arr[None, :], True
+    return arr, False
+
+
+def _restore(values: np.ndarray, one_dim: bool) -> np.ndarray:
+    return values[0] if one_dim else values
+
+
+def group_ids(membership: Dict[str, str], codes: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """把股票到行业的映射转换为整数分组编号
+
+    Args:
+        membership: 股票代码到行业名称的映射
+        codes: 面板的股票代码（列顺序）
+
+    Returns:
+        Tuple[np.ndarray, List[str]]: 每只股票的分组编号（无行业为 -1）、分组名称列表
+    """
+    names = sorted(set(membership[code] for code in codes if code in membership))
+    index = {name: i for i, name in enumerate(names)}
+    ids = np.array([index.get(membership.get(code), -1) for code in codes], dtype=np.int64)
+    return ids, names
+
+
+def rank(values: Any, ascending: bool = True) -> np.ndarray:
+    """横截面排名，从 1 开始，并列取平均排名
+
+    Args:
+        values: 面板（时间 × 股票）或单个截面
+        ascending: 是否升序（最小值排名为 1）
+
+    Returns:
+        np.ndarray: 排名
+    """
+    x, one_dim = _as_2d(values)
+    if not ascending:
+        x = -x
+    n = x.shape[1]
+    if n == 0:
+        return _restore(x.copy(), one_dim)
+
+    # 排序后按相邻值是否相同划分并列组，组内取首尾位置的平均
+    order = np.argsort(x, axis=1, kind='stable')
+    ordered = np.take_along_axis(x, order, axis=1)
+    positions = np.arange(n)
+    new_group = np.ones(ordered.shape, dtype=bool)
+    new_group[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    last_in_group = np.ones(ordered.shape, dtype=bool)
+    last_in_group[:, :-1] = new_group[:, 1:]
+    start = np.maximum.accumulate(np.where(new_group, positions, 0), axis=1)
+    end = np.minimum.accumulate(np.where(last_in_group, positions, n - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    ranked = (start + end) / 2.0 + 1.0
+    ranked[np.isnan(ordered)] = np.nan
+    result = np.empty_like(x)
+    np.put_along_axis(result, order, ranked, axis=1)
+    return _restore(result, one_dim)
+
+
+def percentile(values: Any, ascending: bool = True) -> np.ndarray:
+    """横截面百分位排名，取值 (0, 1]
+
+    Args:
+        values: 面板（时间 × 股票）或单个截面
+        ascending: 是否升序
+
+    Returns:
+        np.ndarray: 百分位
+    """
+    x, one_dim = _as_2d(values)
+    counts = np.sum(~np.isnan(x), axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = _as_2d(rank(x, ascending))[0] / counts
+    return _restore(result, one_dim)
+
+
+def winsorize(values: Any, lower: float = 0.01, upper: float = 0.99, method: str = 'quantile',
+              n_mad: float = 5.0) -> np.ndarray:
+    """横截面去极值
+
+    Args:
+        values: 面板（时间 × 股票）或单个截面
+        lower: 下分位数（method='quantile'）
+        upper: 上分位数（method='quantile'）
+        method: 'quantile' 按分位数截断，'mad' 按中位数 ± n_mad 倍中位数绝对偏差截断
+        n_mad: 中位数绝对偏差的倍数
+
+    Returns:
+        np.ndarray: 去极值后的值
+    """
+    x, one_dim = _as_2d(values)
+    valid_rows = ~np.all(np.isnan(x), axis=1)
+    low = np.full((x.shape[0], 1), np.nan)
+    high = np.full((x.shape[0], 1), np.nan)
+    if valid_rows.any():
+        rows = x[valid_rows]
+        if method == 'mad':
+            median = np.nanmedian(rows, axis=1, keepdims=True)
+            # 1.4826 使正态分布下的中位数绝对偏差与标准差一致
+            mad = 1.4826 * np.nanmedian(np.abs(rows - median), axis=1, keepdims=True)
+            low[valid_rows] = median - n_mad * mad
+            high[valid_rows] = median + n_mad * mad
+        elif method == 'quantile':
+            bounds = np.nanquantile(rows, [lower, upper], axis=1)
+            low[valid_rows, 0] = bounds[0]
+            high[valid_rows, 0] = bounds[1]
+        else:
+            raise ValueError(f"不支持的去极值方法: {method}")
+    return _restore(np.clip(x, low, high), one_dim)
+
+
+def zscore(values: Any, weights: Optional[Any] = None) -> np.ndarray:
+    """横截面标准化
+
+    Args:
+        values: 面板（时间 × 股票）或单个截面
+        weights: 计算均值的权重（如市值），为空时等权；标准差始终等权
+
+    Returns:
+        np.ndarray: 标准化后的值，截面标准差为 0 时为 NaN
+    """
+    x, one_dim = _as_2d(values)
+    valid = ~np.isnan(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if weights is None:
+            w = valid.astype(np.float64)
+        else:
+            w = np.broadcast_to(_as_2d(weights)[0], x.shape)
+            w = np.where(valid & ~np.isnan(w), w, 0.0)
+        mean = np.sum(w * np.where(valid, x, 0.0), axis=1, keepdims=True) / np.sum(w, axis=1, keepdims=True)
+        centered = x - mean
+        std = np.sqrt(np.sum(np.where(valid, centered * centered, 0.0), axis=1, keepdims=True) /
+                      (valid.sum(axis=1, keepdims=True) - 1))
+        result = centered / np.where(std > 0, std, np.nan)
+    return _restore(result, one_dim)
+
+
+def _group_demean(x: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """每个日期内减去所在分组的均值（分组编号为 -1 或值缺失的位置为 NaN）
+
+    Args:
+        x: 面板（时间 × 股票 × ...），前两维与 ids 对应
+        ids: 二维分组编号（时间 × 股票）
+
+    Returns:
+        np.ndarray: 去均值后的值
+    """
+    n_times = x.shape[0]
+    n_groups = int(ids.max()) + 1 if ids.size and ids.max() >= 0 else 0
+    if n_groups == 0:
+        return np.full_like(x, np.nan)
+
+    # 日期和分组合成一维编号，一次 bincount 得到所有（日期, 分组）的和与个数
+    flat = np.arange(n_times)[:, None] * n_groups + ids
+    tail = x.shape[2:]
+    values = x.reshape(x.shape[0], x.shape[1], -1)
+    valid = (ids >= 0)[:, :, None] & ~np.isnan(values)
+    result = np.full(values.shape, np.nan)
+    for k in range(values.shape[2]):
+        mask = valid[:, :, k]
+        sums = np.bincount(flat[mask], values[:, :, k][mask], minlength=n_times * n_groups)
+        counts = np.bincount(flat[mask], minlength=n_times * n_groups)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+        result[:, :, k] = np.where(mask, values[:, :, k] - means[np.where(ids >= 0, flat, 0)], np.nan)
+    return result.reshape(x.shape[:2] + tail)
+
+
+def neutralize(values: Any, groups: Optional[Any] = None, exposures: Optional[Any] = None) -> np.ndarray:
+    """横截面中性化：剔除行业效应和风格暴露后的残差
+
+    只给分组时等价于行业内去均值；同时给出暴露（如对数市值）时，
+    先在行业内去均值，再对暴露做截面回归取残差（与行业哑变量加暴露的回归结果一致）。
+    每个日期的小规模正规方程一次批量求解。
+
+    Args:
+        values: 面板（时间 × 股票）或单个截面
+        groups: 每只股票的分组编号（一维，各日期相同）或面板形状的二维编号，-1 表示无行业
+        exposures: 风格暴露，形状为（时间 × 股票）或（时间 × 股票 × 暴露数），单个截面时去掉时间维
+
+    Returns:
+        np.ndarray: 残差，无行业或数据缺失的位置为 NaN
+    """
+    x, one_dim = _as_2d(values)
+    if groups is None:
+        ids = np.zeros(x.shape, dtype=np.int64)
+    else:
+        ids = np.broadcast_to(np.asarray(groups, dtype=np.int64), x.shape)
+    if exposures is None:
+        return _restore(_group_demean(x, ids), one_dim)
+
+    exposure = np.asarray(exposures, dtype=np.float64)
+    if one_dim:
+        exposure = exposure[None, ...]
+    if exposure.ndim == 2:
+        exposure = exposure[:, :, None]
+
+    # 因子值或任一暴露缺失的股票不参与去均值和回归，两者使用同一样本
+    sample = ~np.isnan(x) & ~np.isnan(exposure).any(axis=2)
+    residual = _group_demean(np.where(sample, x, np.nan), ids)
+    design = _group_demean(np.where(sample[:, :, None], exposure, np.nan), ids)
+    valid = ~np.isnan(residual)
+    design = np.where(valid[:, :, None], design, 0.0)
+    target = np.where(valid, residual, 0.0)
+    gram = np.einsum('tnk,tnl->tkl', design, design)
+    moment = np.einsum('tnk,tn->tk', design, target)
+    # 极小的岭项避免暴露共线或样本不足时矩阵奇异
+    ridge = 1e-12 * (np.trace(gram, axis1=1, axis2=2)[:, None, None] + 1.0) * np.eye(gram.shape[1])
+    beta = np.linalg.solve(gram + ridge, moment[:, :, None])[:, :, 0]
+    result = np.where(valid, target - np.einsum('tnk,tk->tn', design, beta), np.nan)
+    return _restore(result, one_dim)
+
+
+def cap_weight(caps: Any, mask: Optional[Any] = None, sqrt: bool = False) -> np.ndarray:
+    """按市值计算横截面权重，每个日期权重之和为 1
+
+    Args:
+        caps: 市值面板（时间 × 股票）或单个截面
+        mask: 参与加权的股票（如选中的股票），为空时全部参与
+        sqrt: 是否按市值平方根加权，降低大市值股票的集中度
+
+    Returns:
+        np.ndarray: 权重，不参与加权的位置为 0
+    """
+    c, one_dim = _as_2d(caps)
+    valid = ~np.isnan(c) & (c > 0)
+    if mask is not None:
+        valid &= _as_2d(mask)[0].astype(bool)
+    c = np.where(valid, np.sqrt(np.abs(c)) if sqrt else c, 0.0)
+    total = c.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(total > 0, c / total, 0.0)
+    return _restore(weights, one_dim)
@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""技术指标计算图模块
+
+此模块把技术指标组织为按需求值的有向无环图，包括：
+1. 指标规格解析，例如 'ma(20)'、'rsi(14)'、'boll(20,2).upper'、'ma(20,volume)'
+2. 只计算被请求的节点及其依赖，未被请求的指标不计算
+3. 每个节点的结果按规范化的规格缓存，公共中间结果只计算一次
+   （例如 MA20 同时被均线、布林带中轨和趋势强度使用）
+4. 通过 register_indicator 注册新指标
+5. 按依赖关系推断每个指标需要的历史K线数（指数平滑类按初始值影响衰减到容差以下计算）
+
+指标在（时间 × 股票）二维数组上计算，一维输入按单列处理，结果还原为一维。
+"""
+
+import re
+import math
+from typing import Dict, List, Any, Callable, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from utils.indicators import (
+    ma_2d, rolling_std_2d, ema_2d, rsi_2d, vwap_2d, rolling_vwap_2d, session_vwap_2d
+)
+
+# 行情源字段
+SOURCE_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+_SPEC_PATTERN = re.compile(r'^([a-z_][a-z0-9_]*)(?:\((.*)\))?(?:\.([a-z_][a-z0-9_]*))?$')
+
+
+class IndicatorDef:
+    """指标定义
+
+    Attributes:
+        name: 指标名称
+        compute: 计算函数，参数为计算图和指标参数，返回数组或输出名到数组的映射
+        defaults: 参数默认值，规格中省略的参数按此补齐
+        outputs: 多输出指标的输出名，第一个为默认输出；单输出指标为空
+        lookback: 预热K线数的计算函数，参数为 LookbackEstimator 和指标参数
+    """
+
+    def __init__(self, name: str, compute: Callable, defaults: Sequence[Any] = (),
+                 outputs: Sequence[str] = (), lookback: Optional[Callable] = None):
+        self.name = name
+        self.compute = compute
+        self.defaults = tuple(defaults)
+        self.outputs = tuple(outputs)
+        self.lookback = lookback
+
+
+_INDICATORS: Dict[str, IndicatorDef] = {}
+
+
+def register_indicator(name: str, defaults: Sequence[Any] = (), outputs: Sequence[str] = (),
+                       lookback: Optional[Callable] = None) -> Callable:
+    """注册指标的装饰器
+
+    计算函数通过 graph.node 获取依赖，依赖关系由此自动形成，且每个依赖只计算一次。
+    lookback(estimator, *args) 返回第一个可靠值之前需要的K线数，依赖的预热通过 estimator.of 累加；
+    未提供时视为不需要预热。
+
+    Args:
+        name: 指标名称（小写）
+        defaults: 参数默认值
+        outputs: 多输出指标的输出名
+        lookback: 预热K线数的计算函数
+
+    Returns:
+        Callable: 装饰器
+    """
+    def decorator(func):
+        _INDICATORS[name] = IndicatorDef(name, func, defaults, outputs, lookback)
+        return func
+    return decorator
+
+
+def ema_convergence(alpha: float, tolerance: float = 1e-3) -> int:
+    """指数平滑的初始值权重衰减到容差以下所需的K线数
+
+    Args:
+        alpha: 平滑系数
+        tolerance: 初始值权重的容差
+
+    Returns:
+        int: K线数
+    """
+    if alpha >= 1.0:
+        return 0
+    return int(math.ceil(math.log(tolerance) / math.log(1.0 - alpha)))
+
+
+class LookbackEstimator:
+    """按指标依赖关系推断预热K线数
+
+    预热K线数指第一个可靠值之前需要的K线数：滚动窗口为窗口长度减一，指数平滑为收敛所需的K线数，
+    指标叠加在其他指标上时两者相加。依赖全部历史的指标（如从第一根K线起累计的 VWAP）为无穷大。
+
+    Attributes:
+        tolerance: 指数平滑类指标初始值权重的容差
+        bars_per_session: 每个交易日的K线数，按交易日锚定的指标需要
+    """
+
+    def __init__(self, tolerance: float = 1e-3, bars_per_session: int = 1):
+        self.tolerance = tolerance
+        self.bars_per_session = bars_per_session
+        self._cache: Dict[str, float] = {}
+
+    def ema(self, period: float, alpha: Optional[float] = None) -> int:
+        """指数平滑的收敛K线数，平滑系数默认为 2 / (period + 1)"""
+        return ema_convergence(2.0 / (period + 1) if alpha is None else alpha, self.tolerance)
+
+    def of(self, spec: str) -> float:
+        """获取指标规格的预热K线数
+
+        Args:
+            spec: 指标规格或源字段
+
+        Returns:
+            float: 预热K线数，依赖全部历史时为 math.inf
+        """
+        name, args, _ = parse_spec(spec)
+        if name not in _INDICATORS:
+            return 0
+        key = normalize_spec(spec).rsplit('.', 1)[0] if _INDICATORS[name].outputs else normalize_spec(spec)
+        if key not in self._cache:
+            lookback = _INDICATORS[name].lookback
+            self._cache[key] = lookback(self, *args) if lookback else 0
+        return self._cache[key]
+
+
+def estimate_lookback(specs: Iterable[str], tolerance: float = 1e-3,
+                      bars_per_session: int = 1) -> Optional[int]:
+    """推断一组指标共同需要的预热K线数
+
+    Args:
+        specs: 指标规格
+        tolerance: 指数平滑类指标初始值权重的容差
+        bars_per_session: 每个交易日的K线数
+
+    Returns:
+        Optional[int]: 预热K线数，有指标依赖全部历史时返回None
+    """
+    estimator = LookbackEstimator(tolerance, bars_per_session)
+    lookback = max((estimator.of(spec) for spec in specs), default=0)
+    return None if math.isinf(lookback) else int(lookback)
+
+
+def _split_args(text: str) -> List[str]:
+    """按顶层逗号拆分参数，允许参数本身是带括号的规格"""
+    args, depth, current = [], 0, ''
+    for char in text:
+        if char == ',' and depth == 0:
+            args.append(current)
+            current = ''
+            continue
+        depth += (char == '(') - (char == ')')
+        current += char
+    if current:
+        args.append(current)
+    return args
+
+
+def _parse_arg(text: str) -> Any:
+    """把参数解析为整数、浮点数或（规范化的）规格字符串"""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return normalize_spec(text)
+
+
+def _format_arg(value: Any) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def parse_spec(spec: str) -> Tuple[str, Tuple[Any, ...], Optional[str]]:
+    """解析指标规格
+
+    Args:
+        spec: 指标规格，例如 'boll(20, 2).upper'
+
+    Returns:
+        Tuple[str, Tuple[Any, ...], Optional[str]]: 指标名、补齐默认值后的参数、输出名
+
+    Raises:
+        ValueError: 规格格式错误、指标未注册、参数过多或输出名不存在
+    """
+    text = spec.replace(' ', '').lower()
+    match = _SPEC_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"指标规格格式错误: {spec}")
+    name, arg_text, output = match.groups()
+
+    if name in SOURCE_FIELDS and not arg_text and not output:
+        return name, (), None
+    if name not in _INDICATORS:
+        raise ValueError(f"未知指标: {name}")
+
+    definition = _INDICATORS[name]
+    args = tuple(_parse_arg(arg) for arg in _split_args(arg_text or ''))
+    if len(args) > len(definition.defaults):
+        raise ValueError(f"指标参数过多: {spec}")
+    args = args + definition.defaults[len(args):]
+
+    if output is not None and output not in definition.outputs:
+        raise ValueError(f"指标 {name} 没有输出 {output}")
+    if output is None and definition.outputs:
+        output = definition.outputs[0]
+    return name, args, output
+
+
+def normalize_spec(spec: str) -> str:
+    """把指标规格规范化，等价的写法得到相同的字符串
+
+    例如 'MA(20)'、'ma(20, close)' 都规范化为 'ma(20,close)'，
+    'macd' 规范化为 'macd(12,26,9).macd'。
+
+    Args:
+        spec: 指标规格
+
+    Returns:
+        str: 规范化的规格
+    """
+    name, args, output = parse_spec(spec)
+    key = f"{name}({','.join(_format_arg(arg) for arg in args)})" if name in _INDICATORS else name
+    return f"{key}.{output}" if output else key
+
+
+class IndicatorGraph:
+    """按需求值的技术指标计算图
+
+    Attributes:
+        sources: 源字段到数组的映射
+        sessions: 每行所属交易日的编码，按交易日锚定的指标需要
+        stats: 计算统计，computed 为实际计算的节点数，hits 为命中缓存的次数
+    """
+
+    def __init__(self, sources: Dict[str, np.ndarray], sessions: Optional[np.ndarray] = None):
+        """初始化计算图
+
+        Args:
+            sources: 源字段（open/high/low/close/volume/amount 及其他已有字段）到数组的映射，
+                一维数组视为单列
+            sessions: 每行所属交易日的编码（如 YYYYMMDD）
+        """
+        self.sources = sources
+        self.sessions = sessions
+        self.one_dim = any(np.ndim(values) == 1 for values in sources.values())
+        self._values: Dict[str, np.ndarray] = {}
+        self._active = set()
+        self.stats = {'computed': 0, 'hits': 0}
+
+    @classmethod
+    def from_frame(cls, df: Any, sessions: Optional[np.ndarray] = None) -> 'IndicatorGraph':
+        """基于单只股票的数据框创建计算图
+
+        Args:
+            df: 数据框
+            sessions: 每行所属交易日的编码
+
+        Returns:
+            IndicatorGraph: 计算图
+        """
+        return cls({column: df[column].values for column in df.columns}, sessions)
+
+    def _source(self, name: str) -> np.ndarray:
+        """获取源字段的二维 float64 数组"""
+        if name not in self.sources:
+            raise KeyError(f"缺少源字段: {name}")
+        values = np.asarray(self.sources[name], dtype=np.float64)
+        self._values[name] = values.reshape(-1, 1) if values.ndim == 1 else values
+        return self._values[name]
+
+    def seed(self, spec: str, values: np.ndarray) -> None:
+        """写入已经计算好的节点结果，后续请求直接使用
+
+        Args:
+            spec: 指标规格
+            values: 指标值
+        """
+        values = np.asarray(values, dtype=np.float64)
+        self._values[normalize_spec(spec)] = values.reshape(-1, 1) if values.ndim == 1 else values
+
+    def node(self, spec: str) -> np.ndarray:
+        """获取节点的二维结果，未计算时先计算其依赖
+
+        Args:
+            spec: 指标规格
+
+        Returns:
+            np.ndarray: 二维数组（时间 × 股票）
+        """
+        key = normalize_spec(spec)
+        if key in self._values:
+            self.stats['hits'] += 1
+            return self._values[key]
+
+        name, args, output = parse_spec(key)
+        if name not in _INDICATORS:
+            return self._source(name)
+
+        base = key.rsplit('.', 1)[0] if output else key
+        if base in self._active:
+            raise ValueError(f"指标存在循环依赖: {base}")
+        self._active.add(base)
+        try:
+            result = _INDICATORS[name].compute(self, *args)
+        finally:
+            self._active.discard(base)
+        self.stats['computed'] += 1
+
+        if isinstance(result, dict):
+            for out, values in result.items():
+                self._values[f"{base}.{out}"] = values
+        else:
+            self._values[key] = result
+        return self._values[key]
+
+    def get(self, spec: str) -> np.ndarray:
+        """获取指标值，形状与源字段一致（一维输入返回一维）
+
+        Args:
+            spec: 指标规格
+
+        Returns:
+            np.ndarray: 指标值
+        """
+        values = self.node(spec)
+        return values[:, 0] if self.one_dim else values
+
+    def evaluate(self, specs: Union[Sequence[str], Dict[str, str]]) -> Dict[str, np.ndarray]:
+        """计算一组指标
+
+        Args:
+            specs: 指标规格列表（结果以规格为键），或结果名到规格的映射
+
+        Returns:
+            Dict[str, np.ndarray]: 结果名到指标值的映射
+        """
+        if not isinstance(specs, dict):
+            specs = {spec: spec for spec in specs}
+        results = {}
+        for column, spec in specs.items():
+            try:
+                results[column] = self.get(spec)
+            except Exception as e:
+                logger.error(f"指标计算失败 - {spec}: {str(e)}")
+        return results
+
+
+
+def evaluate_indicators(sources: Dict[str, np.ndarray], sessions: Optional[np.ndarray],
+                        specs: Union[Sequence[str], Dict[str, str]],
+                        seeds: Optional[Dict[str, str]] = None) -> Dict[str, np.ndarray]:
+    """在新的计算图上计算一组指标，供按股票分片的并行计算调用
+
+    Args:
+        sources: 源字段到数组的映射
+        sessions: 每行所属交易日的编码
+        specs: 指标规格列表，或结果名到规格的映射
+        seeds: 源字段到指标规格的映射，这些指标直接取源字段的值（如行情推送中增量计算的 VWAP）
+
+    Returns:
+        Dict[str, np.ndarray]: 结果名到指标值的映射
+    """
+    graph = IndicatorGraph(sources, sessions)
+    for field, spec in (seeds or {}).items():
+        if field in sources:
+            graph.seed(spec, sources[field])
+    return graph.evaluate(specs)
+
+@register_indicator('returns', defaults=('close',),
+                    lookback=lambda lb, source: lb.of(source) + 1)
+def _returns(graph: IndicatorGraph, source: str) -> np.ndarray:
+    values = graph.node(source)
+    result = np.full_like(values, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[1:] = values[1:] / values[:-1] - 1
+    return result
+
+
+@register_indicator('ma', defaults=(20, 'close'),
+                    lookback=lambda lb, period, source: lb.of(source) + int(period) - 1)
+def _ma(graph: IndicatorGraph, period: int, source: str) -> np.ndarray:
+    return ma_2d(graph.node(source), int(period))
+
+
+@register_indicator('std', defaults=(20, 'close'),
+                    lookback=lambda lb, period, source: lb.of(source) + int(period) - 1)
+def _std(graph: IndicatorGraph, period: int, source: str) -> np.ndarray:
+    return rolling_std_2d(graph.node(source), int(period))
+
+
+@register_indicator('ema', defaults=(12, 'close'),
+                    lookback=lambda lb, period, source: lb.of(source) + lb.ema(period))
+def _ema(graph: IndicatorGraph, period: int, source: str) -> np.ndarray:
+    return ema_2d(graph.node(source), period)
+
+
+@register_indicator('macd', defaults=(12, 26, 9), outputs=('macd', 'signal', 'hist'),
+                    lookback=lambda lb, fast, slow, signal: max(lb.of(f"ema({fast})"), lb.of(f"ema({slow})"))
+                    + lb.ema(signal))
+def _macd(graph: IndicatorGraph, fast: int, slow: int, signal: int) -> Dict[str, np.ndarray]:
+    macd = graph.node(f"ema({fast})") - graph.node(f"ema({slow})")
+    signal_line = ema_2d(macd, signal)
+    return {'macd': macd, 'signal': signal_line, 'hist': macd - signal_line}
+
+
+@register_indicator('rsi', defaults=(14, 'close'),
+                    lookback=lambda lb, period, source: lb.of(source) + 1 + lb.ema(period, alpha=1.0 / period))
+def _rsi(graph: IndicatorGraph, period: int, source: str) -> np.ndarray:
+    return rsi_2d(graph.node(source), period)
+
+
+@register_indicator('boll', defaults=(20, 2), outputs=('middle', 'upper', 'lower'),
+                    lookback=lambda lb, period, num_std: max(lb.of(f"ma({period})"), lb.of(f"std({period})")))
+def _boll(graph: IndicatorGraph, period: int, num_std: float) -> Dict[str, np.ndarray]:
+    middle = graph.node(f"ma({period})")
+    width = graph.node(f"std({period})") * num_std
+    return {'middle': middle, 'upper': middle + width, 'lower': middle - width}
+
+
+@register_indicator('vwap', defaults=(0,),
+                    lookback=lambda lb, period: int(period) - 1 if period else math.inf)
+def _vwap(graph: IndicatorGraph, period: int) -> np.ndarray:
+    # period 为 0 时从第一根K线起累计
+    if period:
+        return rolling_vwap_2d(graph.node('close'), graph.node('volume'), int(period))
+    return vwap_2d(graph.node('close'), graph.node('volume'))
+
+
+@register_indicator('session_vwap', lookback=lambda lb: lb.bars_per_session - 1)
+def _session_vwap(graph: IndicatorGraph) -> np.ndarray:
+    if graph.sessions is None:
+        raise ValueError("session_vwap 需要交易日编码")
+    return session_vwap_2d(graph.node('close'), graph.node('volume'), graph.sessions)
+
+
+@register_indicator('volatility', defaults=(20,),
+                    lookback=lambda lb, period: lb.of(f"std({period},returns(close))"))
+def _volatility(graph: IndicatorGraph, period: int) -> np.ndarray:
+    return graph.node(f"std({period},returns(close))")
+
+
+@register_indicator('volume_ratio', defaults=(20,),
+                    lookback=lambda lb, period: lb.of(f"ma({period},volume)"))
+def _volume_ratio(graph: IndicatorGraph, period: int) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return graph.node('volume') / graph.node(f"ma({period},volume)")
+
+
+@register_indicator('trend_strength', defaults=(20,),
+                    lookback=lambda lb, period: lb.of(f"ma({period})"))
+def _trend_strength(graph: IndicatorGraph, period: int) -> np.ndarray:
+    ma = graph.node(f"ma({period})")
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.abs(graph.node('close') - ma) / ma
@@ -8,12 +8,14 @@
 2. 相对强弱指数（RSI）
 3. 移动平均收敛散度（MACD）
 4. 布林带（Bollinger Bands）
-5. 成交量加权平均价格（VWAP）
+5. 成交量加权平均价格（VWAP），含滚动窗口、按交易日锚定和逐K线增量计算
+
+以 _2d 结尾的函数按列处理（时间 × 股票）二维数组，一次计算整个标的池。
 """
 
 import numpy as np
 import pandas as pd
-from typing import Union, Tuple
+from typing import Union, Tuple, Optional
 
 def calculate_ma(prices: Union[pd.Series, np.ndarray], period: int) -> np.ndarray:
     """计算移动平均线
@@ -133,13 +135,17 @@ def calculate_bollinger_bands(
 
 def calculate_vwap(
     prices: Union[pd.Series, np.ndarray],
-    volumes: Union[pd.Series, np.ndarray]
+    volumes: Union[pd.Series, np.ndarray],
+    period: Optional[int] = None,
+    sessions: Optional[np.ndarray] = None
 ) -> np.ndarray:
     """计算成交量加权平均价格
 
     Args:
         prices: 价格序列
         volumes: 成交量序列
+        period: 滚动窗口长度（K线数），为空时累计计算
+        sessions: 每根K线所属交易日的编码，累计计算时每个交易日开盘重新累计；为空时从第一根K线起累计
 
     Returns:
         np.ndarray: VWAP值
@@ -148,5 +154,440 @@ def calculate_vwap(
         prices = prices.values
     if isinstance(volumes, pd.Series):
         volumes = volumes.values
-        
-    return np.cumsum(prices * volumes) / np.cumsum(volumes)
\ No newline at end of file
+
+    prices = np.asarray(prices, dtype=np.float64).reshape(-1, 1)
+    volumes = np.asarray(volumes, dtype=np.float64).reshape(-1, 1)
+    if period:
+        return rolling_vwap_2d(prices, volumes, period)[:, 0]
+    if sessions is not None:
+        return session_vwap_2d(prices, volumes, sessions)[:, 0]
+    return vwap_2d(prices, volumes)[:, 0]
+
+def _first_valid_2d(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """每列首个有效值，整列无效时为 0"""
+    return np.nan_to_num(values[valid.argmax(axis=0), np.arange(values.shape[1])])
+
+def _window_diff_2d(cumulative: np.ndarray, period: int) -> np.ndarray:
+    """把累计和原地差分为窗口和（numpy 会处理重叠切片的原地运算）"""
+    cumulative[period:] -= cumulative[:-period]
+    return cumulative
+
+def _rolling_sums_2d(values: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """用累计和差分计算每个窗口的和、平方和与有效值个数
+
+    各列先减去首个有效值，降低平方和相减时的精度损失。
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        period: 窗口长度
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: 窗口和、窗口平方和、窗口有效值个数、各列的平移量
+    """
+    valid = ~np.isnan(values)
+    first = _first_valid_2d(values, valid)
+    shifted = np.where(valid, values - first, 0.0)
+
+    squares = _window_diff_2d(np.cumsum(shifted * shifted, axis=0), period)
+    sums = _window_diff_2d(np.cumsum(shifted, axis=0, out=shifted), period)
+    counts = _window_diff_2d(np.cumsum(valid, axis=0), period)
+    return sums, squares, counts, first
+
+def ma_2d(values: np.ndarray, period: int) -> np.ndarray:
+    """按列计算简单移动平均，窗口内有缺失值时为 NaN
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        period: 窗口长度
+
+    Returns:
+        np.ndarray: 移动平均
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    first = _first_valid_2d(values, valid)
+
+    # 输出数组只分配一次：平移、累计和、差分、还原都在同一块内存上完成
+    result = np.where(valid, values - first, 0.0)
+    np.cumsum(result, axis=0, out=result)
+    _window_diff_2d(result, period)
+    result /= period
+    result += first
+    result[_window_diff_2d(np.cumsum(valid, axis=0), period) < period] = np.nan
+    return result
+
+def rolling_mean_std_2d(values: np.ndarray, period: int, ddof: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """按列计算滚动均值和标准差，窗口内有缺失值时为 NaN
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        period: 窗口长度
+        ddof: 自由度修正，默认 1 为样本标准差
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 滚动均值、滚动标准差
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sums, squares, counts, first = _rolling_sums_2d(values, period)
+    incomplete = counts < period
+
+    # 方差在平方和数组上原地计算
+    squares -= sums * sums / period
+    squares /= max(period - ddof, 1)
+    np.maximum(squares, 0.0, out=squares)
+    std = np.sqrt(squares, out=squares)
+    std[incomplete] = np.nan
+
+    mean = sums
+    mean /= period
+    mean += first
+    mean[incomplete] = np.nan
+    return mean, std
+
+def rolling_std_2d(values: np.ndarray, period: int, ddof: int = 1) -> np.ndarray:
+    """按列计算滚动标准差，窗口内有缺失值时为 NaN
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        period: 窗口长度
+        ddof: 自由度修正，默认 1 为样本标准差
+
+    Returns:
+        np.ndarray: 滚动标准差
+    """
+    return rolling_mean_std_2d(values, period, ddof)[1]
+
+def ema_2d(values: np.ndarray, period: int, alpha: Optional[float] = None) -> np.ndarray:
+    """按列计算指数移动平均（adjust=False），从每列首个有效值开始
+
+    沿时间方向循环，每一步对所有股票做一次原地向量运算，无缺失值时循环内不分配内存。
+    缺失值沿用上一个平滑值。
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        period: 周期，平滑系数为 2 / (period + 1)
+        alpha: 直接指定平滑系数，指定时忽略 period
+
+    Returns:
+        np.ndarray: 指数移动平均
+    """
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2.0 / (period + 1) if alpha is None else alpha
+    result = np.empty_like(values)
+    if len(values) == 0:
+        return result
+
+    decay = 1.0 - alpha
+    missing = np.isnan(values)
+    if not missing.any():
+        # result[t] = alpha * x[t] + (1 - alpha) * result[t-1]
+        np.multiply(values, alpha, out=result)
+        result[0] = values[0]
+        carry = np.empty(values.shape[1:])
+        for t in range(1, len(values)):
+            np.multiply(result[t - 1], decay, out=carry)
+            result[t] += carry
+        return result
+
+    prev = values[0].copy()
+    result[0] = prev
+    smoothed = np.empty_like(prev)
+    for t in range(1, len(values)):
+        current = values[t]
+        np.subtract(current, prev, out=smoothed)
+        smoothed *= alpha
+        smoothed += prev
+        # 尚未出现有效值的列取当前值，当前缺失的列保持上一个值
+        np.copyto(prev, current, where=np.isnan(prev))
+        np.copyto(prev, smoothed, where=~np.isnan(smoothed))
+        result[t] = prev
+    return result
+
+def macd_2d(
+    values: np.ndarray,
+    fast_period: int = 12,
+    slow_period: int = 26,
+    signal_period: int = 9
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按列计算MACD
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        fast_period: 快线周期，默认12
+        slow_period: 慢线周期，默认26
+        signal_period: 信号线周期，默认9
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (MACD线, 信号线, 柱状图)
+    """
+    macd_line = ema_2d(values, fast_period)
+    macd_line -= ema_2d(values, slow_period)
+    signal_line = ema_2d(macd_line, signal_period)
+    return macd_line, signal_line, macd_line - signal_line
+
+def bollinger_2d(
+    values: np.ndarray,
+    period: int = 20,
+    num_std: float = 2.0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按列计算布林带
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        period: 计算周期，默认20
+        num_std: 标准差倍数，默认2.0
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (上轨, 中轨, 下轨)
+    """
+    middle, width = rolling_mean_std_2d(values, period)
+    width *= num_std
+    return middle + width, middle, np.subtract(middle, width, out=width)
+
+def rsi_2d(values: np.ndarray, period: int = 14) -> np.ndarray:
+    """按列计算RSI（Wilder 平滑）
+
+    Args:
+        values: 二维数组（时间 × 股票）
+        period: 计算周期，默认14
+
+    Returns:
+        np.ndarray: RSI值，第一行为 NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    delta = np.full_like(values, np.nan)
+    np.subtract(values[1:], values[:-1], out=delta[1:])
+    gain = ema_2d(np.maximum(delta, 0.0), period, alpha=1.0 / period)
+    np.negative(delta, out=delta)
+    loss = ema_2d(np.maximum(delta, 0.0), period, alpha=1.0 / period)
+
+    # 结果写回 gain：100 - 100 / (1 + gain / loss)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain /= loss
+    gain += 1.0
+    np.divide(100.0, gain, out=gain)
+    np.subtract(100.0, gain, out=gain)
+    return gain
+
+def vwap_2d(prices: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+    """按列计算累计成交量加权平均价格，缺失值按零成交处理
+
+    Args:
+        prices: 价格二维数组（时间 × 股票）
+        volumes: 成交量二维数组（时间 × 股票）
+
+    Returns:
+        np.ndarray: VWAP值，累计成交量为零时为 NaN
+    """
+    volumes = np.nan_to_num(np.asarray(volumes, dtype=np.float64))
+    result = np.nan_to_num(np.asarray(prices, dtype=np.float64)) * volumes
+    np.cumsum(result, axis=0, out=result)
+    np.cumsum(volumes, axis=0, out=volumes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result /= volumes
+    return result
+
+def rolling_vwap_2d(prices: np.ndarray, volumes: np.ndarray, period: int) -> np.ndarray:
+    """按列计算最近 period 根K线的滚动 VWAP，缺失值按零成交处理
+
+    成交额和成交量各做一次累计和差分，耗时与窗口长度无关。
+
+    Args:
+        prices: 价格二维数组（时间 × 股票）
+        volumes: 成交量二维数组（时间 × 股票）
+        period: 窗口长度
+
+    Returns:
+        np.ndarray: VWAP值，前 period-1 行或窗口内无成交时为 NaN
+    """
+    volumes = np.nan_to_num(np.asarray(volumes, dtype=np.float64))
+    result = np.nan_to_num(np.asarray(prices, dtype=np.float64)) * volumes
+    _window_diff_2d(np.cumsum(result, axis=0, out=result), period)
+    _window_diff_2d(np.cumsum(volumes, axis=0, out=volumes), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result /= volumes
+    result[:period - 1] = np.nan
+    return result
+
+def session_vwap_2d(prices: np.ndarray, volumes: np.ndarray, sessions: np.ndarray) -> np.ndarray:
+    """按列计算交易日锚定的 VWAP，每个交易日开盘重新累计，缺失值按零成交处理
+
+    先对全部K线做累计和，再减去每个交易日开盘前的累计值，不需要按交易日循环。
+
+    Args:
+        prices: 价格二维数组（时间 × 股票）
+        volumes: 成交量二维数组（时间 × 股票）
+        sessions: 交易日编码，一维（各股票共用时间轴）或与价格同形状的二维数组
+
+    Returns:
+        np.ndarray: VWAP值，当日尚无成交时为 NaN
+    """
+    volumes = np.nan_to_num(np.asarray(volumes, dtype=np.float64))
+    result = np.nan_to_num(np.asarray(prices, dtype=np.float64)) * volumes
+    np.cumsum(result, axis=0, out=result)
+    np.cumsum(volumes, axis=0, out=volumes)
+    if len(result) == 0:
+        return result
+
+    sessions = np.asarray(sessions)
+    if sessions.ndim == 1:
+        sessions = sessions[:, None]
+    starts = np.ones(np.broadcast_shapes(sessions.shape, (1, result.shape[1])), dtype=bool)
+    starts[1:] = sessions[1:] != sessions[:-1]
+
+    # 每个位置所在交易日第一根K线的行号，开盘前的累计值位于其上一行
+    start_rows = np.where(starts, np.arange(len(result))[:, None], 0)
+    np.maximum.accumulate(start_rows, axis=0, out=start_rows)
+    cols = np.arange(result.shape[1])[None, :]
+    before = start_rows - 1
+    opened = before >= 0
+    result -= np.where(opened, result[before, cols], 0.0)
+    volumes -= np.where(opened, volumes[before, cols], 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result /= volumes
+    return result
+
+class IncrementalVWAP:
+    """逐K线增量计算多只股票的 VWAP，用于实盘推送路径
+
+    period 为空时按交易日锚定（交易日变化时重新累计），否则为最近 period 根K线的滚动 VWAP。
+    每只股票各自记录窗口位置，可以一次更新全部股票，也可以只更新推送到达的股票（rows），
+    耗时与历史长度无关。形成中的K线被多次推送时，用 replace=True 替换最后一根K线的贡献。
+    """
+
+    def __init__(self, n_symbols: int, period: Optional[int] = None):
+        """初始化
+
+        Args:
+            n_symbols: 股票数量
+            period: 滚动窗口长度，为空时按交易日锚定
+        """
+        self.n_symbols = n_symbols
+        self.period = period
+        self._size = period or 1
+        self.reset()
+
+    def reset(self) -> None:
+        """清空状态"""
+        # 最近 period 根K线的成交额、成交量（按交易日锚定时只保留最后一根，用于替换）
+        self._pv = np.zeros((self._size, self.n_symbols))
+        self._v = np.zeros((self._size, self.n_symbols))
+        self._sum_pv = np.zeros(self.n_symbols)
+        self._sum_v = np.zeros(self.n_symbols)
+        self._sessions = np.full(self.n_symbols, -1, dtype=np.int64)
+        self._head = np.zeros(self.n_symbols, dtype=np.int64)
+        self._count = np.zeros(self.n_symbols, dtype=np.int64)
+
+    def update(
+        self,
+        prices: np.ndarray,
+        volumes: np.ndarray,
+        session: Optional[Union[int, np.ndarray]] = None,
+        replace: bool = False,
+        rows: Optional[Union[int, np.ndarray]] = None
+    ) -> np.ndarray:
+        """加入一根K线（或替换最后一根）并返回最新的 VWAP
+
+        Args:
+            prices: 每只股票的价格
+            volumes: 每只股票的成交量
+            session: 交易日编码，标量或每只股票一个；按交易日锚定时用于判断是否重新累计
+            replace: 是否替换最后一根K线（同一根K线的再次推送），尚无K线的股票按新K线处理
+            rows: 更新的股票行号，默认全部股票，prices 等与之一一对应
+
+        Returns:
+            np.ndarray: 更新的股票的 VWAP，滚动窗口未满或无成交时为 NaN
+        """
+        cols = np.arange(self.n_symbols) if rows is None else np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        volumes = np.broadcast_to(np.nan_to_num(np.asarray(volumes, dtype=np.float64)), cols.shape)
+        pv = np.nan_to_num(np.asarray(prices, dtype=np.float64)) * volumes
+
+        counts = self._count[cols]
+        heads = self._head[cols]
+        replacing = (counts > 0) & bool(replace)
+        slots = np.where(replacing, (heads - 1) % self._size, heads)
+        # 替换时去掉最后一根的贡献，滚动窗口已满时去掉最早一根的贡献
+        evict = replacing | (counts >= self._size) if self.period is not None else replacing
+        self._sum_pv[cols] -= np.where(evict, self._pv[slots, cols], 0.0)
+        self._sum_v[cols] -= np.where(evict, self._v[slots, cols], 0.0)
+
+        added = ~replacing
+        if self.period is None and session is not None:
+            session = np.broadcast_to(np.asarray(session, dtype=np.int64), cols.shape)
+            changed = added & (session != self._sessions[cols])
+            self._sum_pv[cols[changed]] = 0.0
+            self._sum_v[cols[changed]] = 0.0
+            self._sessions[cols[changed]] = session[changed]
+        self._head[cols[added]] = (heads[added] + 1) % self._size
+        self._count[cols[added]] += 1
+
+        self._pv[slots, cols] = pv
+        self._v[slots, cols] = volumes
+        self._sum_pv[cols] += pv
+        self._sum_v[cols] += volumes
+
+        if self.period is not None:
+            # 滚动求和定期按窗口重算，避免加减累积的舍入误差
+            resum = cols[added & (self._count[cols] % (self._size * 64) == 0)]
+            if len(resum):
+                self._sum_pv[resum] = self._pv[:, resum].sum(axis=0)
+                self._sum_v[resum] = self._v[:, resum].sum(axis=0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = self._sum_pv[cols] / self._sum_v[cols]
+        if self.period is not None:
+            vwap[self._count[cols] < self.period] = np.nan
+        return vwap
+
+    def load(
+        self,
+        row: int,
+        prices: np.ndarray,
+        volumes: np.ndarray,
+        sessions: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """用一只股票的历史K线重建该股票的状态（启动时预热），结果与逐根 update 一致
+
+        Args:
+            row: 股票行号
+            prices: 价格序列（按时间升序）
+            volumes: 成交量序列
+            sessions: 每根K线的交易日编码，按交易日锚定时使用
+
+        Returns:
+            np.ndarray: 每根K线的 VWAP
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        m = len(prices)
+        if self.period is not None:
+            vwap = rolling_vwap_2d(prices[:, None], volumes[:, None], self.period)[:, 0]
+        elif sessions is not None:
+            vwap = session_vwap_2d(prices[:, None], volumes[:, None], np.asarray(sessions))[:, 0]
+        else:
+            vwap = vwap_2d(prices[:, None], volumes[:, None])[:, 0]
+
+        v = np.nan_to_num(volumes)
+        pv = np.nan_to_num(prices) * v
+        self._pv[:, row] = 0.0
+        self._v[:, row] = 0.0
+        self._count[row] = m
+        if self.period is not None:
+            k = min(m, self._size)
+            self._pv[:k, row] = pv[m - k:]
+            self._v[:k, row] = v[m - k:]
+            self._head[row] = k % self._size
+            start = m - k
+        else:
+            self._head[row] = 0
+            start = 0
+            if sessions is not None and m:
+                sessions = np.asarray(sessions, dtype=np.int64)
+                self._sessions[row] = sessions[-1]
+                start = int(np.flatnonzero(np.append(True, sessions[1:] != sessions[:-1]))[-1])
+            if m:
+                self._pv[0, row] = pv[-1]
+                self._v[0, row] = v[-1]
+        self._sum_pv[row] = pv[start:].sum()
+        self._sum_v[row] = v[start:].sum()
+        return vwap
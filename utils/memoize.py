@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""基于数据指纹的结果缓存模块
+
+此模块为数据处理函数提供有界的结果缓存，包括：
+1. 廉价的数据指纹：股票集合、长度、最后时间戳和尾部内容哈希
+2. 按条目数和字节数限制的LRU淘汰
+3. 返回缓存对象本身或浅拷贝，不做深拷贝
+4. 命中/未命中统计
+
+指纹只对尾部内容做哈希，适用于只在末尾追加新数据的行情序列。
+"""
+
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# 参与哈希的尾部行数
+TAIL_ROWS = 4
+
+
+def _update_array(digest: Any, values: Any) -> None:
+    """把序列的长度、类型和尾部内容写入哈希
+
+    Args:
+        digest: hashlib 哈希对象
+        values: 序列
+    """
+    arr = np.asarray(values)
+    digest.update(f"{arr.dtype.str}{arr.shape}".encode())
+    if arr.size == 0:
+        return
+    tail = np.ascontiguousarray(arr[-TAIL_ROWS:])
+    if tail.dtype.kind == 'O':
+        digest.update(repr(tail.tolist()).encode())
+    else:
+        digest.update(tail.tobytes())
+
+
+def _update(digest: Any, value: Any) -> None:
+    """把任意参数写入哈希
+
+    Args:
+        digest: hashlib 哈希对象
+        value: 参数
+    """
+    if isinstance(value, pd.DataFrame):
+        digest.update(b'F')
+        digest.update(repr(list(value.columns)).encode())
+        _update_array(digest, value.index.values)
+        for column in value.columns:
+            _update_array(digest, value[column].values)
+    elif isinstance(value, pd.Series):
+        digest.update(b'S')
+        _update_array(digest, value.index.values)
+        _update_array(digest, value.values)
+    elif isinstance(value, np.ndarray):
+        digest.update(b'A')
+        _update_array(digest, value)
+    elif isinstance(value, dict):
+        digest.update(f"D{len(value)}".encode())
+        for key, item in value.items():
+            digest.update(repr(key).encode())
+            _update(digest, item)
+    elif isinstance(value, (list, tuple)) and value and not isinstance(value[0], (str, int, float, bool)):
+        digest.update(f"L{len(value)}".encode())
+        for item in value:
+            _update(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+
+def fingerprint(*args: Any, **kwargs: Any) -> str:
+    """计算参数的数据指纹
+
+    多股票数据字典的指纹由股票代码、每个字段的长度和数据类型、以及最后几行的内容组成，
+    计算量与股票数成正比，与历史长度无关。
+
+    Args:
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        str: 指纹
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for arg in args:
+        _update(digest, arg)
+    for key in sorted(kwargs):
+        digest.update(key.encode())
+        _update(digest, kwargs[key])
+    return digest.hexdigest()
+
+
+def estimate_bytes(value: Any) -> int:
+    """估算缓存结果占用的字节数
+
+    Args:
+        value: 缓存结果
+
+    Returns:
+        int: 字节数
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (pd.Series, np.ndarray)):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_bytes(item) for item in value.values())
+    fields = getattr(value, 'fields', None)
+    if isinstance(fields, dict):
+        return sum(estimate_bytes(item) for item in fields.values())
+    views = getattr(value, 'views', None)
+    if isinstance(views, dict):
+        return sum(estimate_bytes(item) for item in views.values())
+    return 0
+
+
+class MemoCache:
+    """按条目数和字节数限制的LRU缓存"""
+
+    def __init__(self, name: str, max_entries: int = 128, max_bytes: int = 256 * 1024 * 1024):
+        """初始化缓存
+
+        Args:
+            name: 缓存名称，用于统计
+            max_entries: 最大条目数
+            max_bytes: 最大字节数
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'oversize': 0}
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """查找缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Tuple[bool, Any]: 是否命中、缓存结果
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return True, entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        """写入缓存，超出限制时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存结果
+        """
+        size = estimate_bytes(value)
+        with self._lock:
+            if size > self.max_bytes:
+                self.stats['oversize'] += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计
+
+        Returns:
+            Dict[str, Any]: 命中率、条目数和字节数等
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_caches = {}
+
+
+def memoize(max_entries: int = 128, max_bytes: int = 256 * 1024 * 1024,
+            copy: str = 'none') -> Callable:
+    """基于数据指纹的结果缓存装饰器
+
+    用于方法时，缓存键包含实例标识，不同实例互不共享结果。
+
+    Args:
+        max_entries: 最大条目数
+        max_bytes: 最大字节数
+        copy: 命中时的返回方式，'none' 返回缓存对象本身（调用方不得修改），
+            'shallow' 返回浅拷贝（DataFrame 共享数据，调用方增加列不影响缓存）
+
+    Returns:
+        Callable: 装饰器
+    """
+    def decorator(func):
+        cache = _caches[func.__qualname__] = MemoCache(func.__qualname__, max_entries, max_bytes)
+
+        def _copy(value):
+            if copy == 'shallow' and isinstance(value, (pd.DataFrame, pd.Series)):
+                return value.copy(deep=False)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = fingerprint(*args, **kwargs)
+            hit, value = cache.get(key)
+            if hit:
+                logger.debug(f"使用缓存数据: {func.__name__}")
+                return _copy(value)
+
+            value = func(*args, **kwargs)
+            # 空结果通常意味着处理失败，不缓存
+            if value is not None and not (isinstance(value, pd.DataFrame) and value.empty):
+                cache.put(key, value)
+            return _copy(value)
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def get_memo_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有缓存的统计
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 函数名到统计的映射
+    """
+    return {name: cache.get_stats() for name, cache in _caches.items()}
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""并行处理模块
+
+此模块把按股票划分的计算分片到多个工作线程或进程，包括：
+1. 线程池：NumPy/pandas 的滚动、累计等内核会释放 GIL，适合按股票分片的向量计算和 I/O
+2. 进程池：纯 Python 逻辑不受 GIL 限制，面板输入放在共享内存中，各进程只映射不复制
+3. 工作数和分片大小可配置（data.parallel）
+4. 输入很少或只有一个工作者时直接串行执行
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+PARALLEL_MODES = ('serial', 'thread', 'process')
+
+
+def chunked(items: Sequence[Any], chunk_size: int) -> List[Sequence[Any]]:
+    """把序列切分为若干分片
+
+    Args:
+        items: 序列
+        chunk_size: 每个分片的大小
+
+    Returns:
+        List[Sequence[Any]]: 分片列表
+    """
+    chunk_size = max(int(chunk_size), 1)
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def _run_chunk(func: Callable, chunk: Sequence[Any]) -> List[Any]:
+    """在工作者中依次处理一个分片，单个元素失败不影响其他元素"""
+    results = []
+    for item in chunk:
+        try:
+            results.append(func(item))
+        except Exception as e:
+            logger.error(f"并行任务失败 - {item}: {str(e)}")
+            results.append(None)
+    return results
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    """在工作进程中映射共享内存
+
+    工作进程与主进程共用同一个 resource_tracker，重复登记不会产生多余记录，
+    共享内存由主进程在计算结束后删除。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数
+        return shared_memory.SharedMemory(name=name)
+
+
+def _run_shared_columns(func: Callable, layout: Dict[str, Tuple[str, tuple, str]],
+                        start: int, stop: int, args: tuple) -> Dict[str, np.ndarray]:
+    """在工作进程中映射共享内存面板的列分片并计算"""
+    segments = []
+    arrays = {}
+    try:
+        for field, (name, shape, dtype) in layout.items():
+            segment = _attach_segment(name)
+            segments.append(segment)
+            arrays[field] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)[:, start:stop]
+        # 结果复制出共享内存后再返回
+        return {key: np.array(values) for key, values in func(arrays, *args).items()}
+    finally:
+        arrays = None
+        for segment in segments:
+            try:
+                segment.close()
+            except BufferError:
+                pass
+
+
+class ParallelExecutor:
+    """按股票分片的并行执行器"""
+
+    def __init__(self, mode: str = 'thread', workers: int = 0, chunk_size: int = 0):
+        """初始化执行器
+
+        Args:
+            mode: 'serial' 串行，'thread' 线程池，'process' 进程池
+            workers: 工作者数量，0 表示 CPU 核数
+            chunk_size: 每个分片的股票数，0 表示平均分给所有工作者
+        """
+        if mode not in PARALLEL_MODES:
+            raise ValueError(f"不支持的并行模式: {mode}")
+        self.mode = mode
+        self.workers = int(workers) or os.cpu_count() or 1
+        self.chunk_size = int(chunk_size)
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'ParallelExecutor':
+        """根据配置创建执行器
+
+        Args:
+            config: 配置参数字典，读取 data.parallel
+
+        Returns:
+            ParallelExecutor: 执行器
+        """
+        options = (config.get('data') or {}).get('parallel') or {}
+        return cls(options.get('mode', 'thread'), options.get('workers', 0), options.get('chunk_size', 0))
+
+    @property
+    def enabled(self) -> bool:
+        """是否并行执行"""
+        return self.mode != 'serial' and self.workers > 1
+
+    def _get_pool(self, threads: bool = False):
+        """获取（首次使用时创建）工作池
+
+        Args:
+            threads: 是否强制使用线程池
+        """
+        mode = 'thread' if threads else self.mode
+        with self._lock:
+            if mode not in self._pools:
+                pool_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+                self._pools[mode] = pool_class(max_workers=self.workers)
+                logger.debug(f"并行工作池已创建 - 模式: {mode}, 工作者: {self.workers}")
+            return self._pools[mode]
+
+    def _chunk_size(self, n: int) -> int:
+        """分片大小：未配置时平均分给所有工作者"""
+        return self.chunk_size or -(-n // self.workers)
+
+    def map(self, func: Callable, items: Sequence[Any], threads: bool = False) -> List[Any]:
+        """对每个元素调用 func，结果顺序与输入一致
+
+        进程模式下 func 和元素必须可以 pickle（模块级函数）。
+
+        Args:
+            func: 处理单个元素的函数
+            items: 元素序列（如股票代码）
+            threads: 进程模式下也使用线程，用于依赖存储、连接等不能跨进程传递的对象的函数
+
+        Returns:
+            List[Any]: 结果列表，失败的元素为 None
+        """
+        items = list(items)
+        if not self.enabled or len(items) <= 1:
+            return _run_chunk(func, items)
+
+        pool = self._get_pool(threads)
+        futures = [pool.submit(_run_chunk, func, chunk)
+                   for chunk in chunked(items, self._chunk_size(len(items)))]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def map_columns(self, func: Callable, arrays: Dict[str, np.ndarray], *args: Any) -> Dict[str, np.ndarray]:
+        """按列（股票）分片计算（时间 × 股票）面板，再按列拼接结果
+
+        func(arrays, *args) 接收各字段的列分片，返回结果名到（时间 × 分片股票数）数组的映射。
+        线程模式下分片是视图；进程模式下面板先复制到共享内存，各进程只映射需要的列。
+
+        Args:
+            func: 分片计算函数，进程模式下必须是模块级函数
+            arrays: 字段名到二维数组的映射
+            *args: 传给 func 的其他参数
+
+        Returns:
+            Dict[str, np.ndarray]: 结果名到二维数组的映射
+        """
+        n_columns = next(iter(arrays.values())).shape[1] if arrays else 0
+        if not self.enabled or n_columns <= 1:
+            return func(arrays, *args)
+
+        bounds = [(start, min(start + self._chunk_size(n_columns), n_columns))
+                  for start in range(0, n_columns, self._chunk_size(n_columns))]
+        pool = self._get_pool()
+        segments = []
+        try:
+            if self.mode == 'process':
+                layout = {}
+                for field, values in arrays.items():
+                    values = np.ascontiguousarray(values)
+                    segment = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                    segments.append(segment)
+                    np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)[...] = values
+                    layout[field] = (segment.name, values.shape, values.dtype.str)
+                futures = [pool.submit(_run_shared_columns, func, layout, start, stop, args)
+                           for start, stop in bounds]
+            else:
+                futures = [pool.submit(func, {field: values[:, start:stop] for field, values in arrays.items()}, *args)
+                           for start, stop in bounds]
+            parts = [future.result() for future in futures]
+        finally:
+            for segment in segments:
+                try:
+                    segment.close()
+                    segment.unlink()
+                except Exception as e:
+                    logger.warning(f"释放共享内存失败: {str(e)}")
+
+        keys = [key for key in parts[0] if all(key in part for part in parts)]
+        return {key: np.concatenate([part[key] for part in parts], axis=1) for key in keys}
+
+    def close(self) -> None:
+        """关闭工作池"""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.shutdown(wait=True)
+
+    def __enter__(self) -> 'ParallelExecutor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
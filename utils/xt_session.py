@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""xtquant 调用会话模块
+
+此模块为 xtdata/xttrader 调用提供统一的会话层，包括：
+1. 令牌桶限流
+2. 熔断器：终端不可用时快速失败
+3. 基于截止时间的重试（指数退避 + 随机抖动）
+4. 按接口统计调用次数、错误次数和耗时
+
+嵌套调用（会话调用内部再次发起会话调用）只执行一次，不会叠加重试次数。
+"""
+
+import time
+import random
+import functools
+import threading
+from typing import Dict, Any, Optional, Callable
+from loguru import logger
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用被快速拒绝"""
+    pass
+
+
+class DeadlineExceededError(Exception):
+    """在截止时间内未能完成调用"""
+    pass
+
+
+class TokenBucket:
+    """令牌桶限流器"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数，<=0 表示不限流
+            capacity: 桶容量（允许的突发量），默认等于 rate
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """按经过的时间补充令牌"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """尝试获取令牌
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            float: 0 表示获取成功，否则为需要等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """获取令牌，必要时等待
+
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 是否在超时前获取到令牌
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到阈值后打开，打开期间所有调用快速失败；经过恢复时间后进入半开状态，
+    放行一次试探调用，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """初始化熔断器
+
+        Args:
+            failure_threshold: 打开熔断器所需的连续失败次数
+            recovery_timeout: 打开后进入半开状态的等待时间（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """判断是否放行调用
+
+        Returns:
+            bool: 是否放行
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            # 半开状态只放行一次试探调用
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        """记录调用成功"""
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != self.CLOSED:
+                logger.info("熔断器关闭，调用恢复正常")
+            self.state = self.CLOSED
+
+    def cancel_trial(self) -> None:
+        """放弃已放行但未执行的调用（如限流等待超时），半开状态下释放试探名额"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """记录调用失败"""
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"熔断器打开 - 连续失败 {self.failures} 次，{self.recovery_timeout} 秒内快速失败")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class XtSession:
+    """xtquant 调用会话"""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 50.0,
+        burst: Optional[float] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        deadline: float = 10.0,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0
+    ):
+        """初始化会话
+
+        Args:
+            name: 会话名称
+            rate: 每秒允许的调用次数
+            burst: 允许的突发调用次数
+            failure_threshold: 熔断阈值（连续失败次数）
+            recovery_timeout: 熔断恢复时间（秒）
+            deadline: 单次调用（含重试）的默认截止时间（秒）
+            max_attempts: 最大尝试次数
+            base_delay: 重试基础延迟（秒）
+            max_delay: 重试最大延迟（秒）
+        """
+        self.name = name
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+    def configure(self, **params: Any) -> None:
+        """更新会话参数
+
+        Args:
+            **params: 与构造函数同名的参数
+        """
+        if 'rate' in params or 'burst' in params:
+            self.limiter = TokenBucket(params.get('rate', self.limiter.rate),
+                                       params.get('burst', self.limiter.capacity))
+        if 'failure_threshold' in params:
+            self.breaker.failure_threshold = params['failure_threshold']
+        if 'recovery_timeout' in params:
+            self.breaker.recovery_timeout = params['recovery_timeout']
+        for key in ('deadline', 'max_attempts', 'base_delay', 'max_delay'):
+            if key in params:
+                setattr(self, key, params[key])
+
+    def _record(self, endpoint: str, latency: float, error: bool = False,
+                retried: bool = False, rejected: bool = False) -> None:
+        """记录接口统计
+
+        Args:
+            endpoint: 接口名称
+            latency: 耗时（秒）
+            error: 是否失败
+            retried: 是否为重试
+            rejected: 是否被熔断或限流拒绝
+        """
+        with self._stats_lock:
+            stats = self.stats.get(endpoint)
+            if stats is None:
+                stats = self.stats[endpoint] = {
+                    'calls': 0, 'errors': 0, 'retries': 0, 'rejected': 0,
+                    'total_latency': 0.0, 'max_latency': 0.0
+                }
+            if rejected:
+                stats['rejected'] += 1
+                return
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['retries'] += int(retried)
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+
+    def call(self, endpoint: str, func: Callable, *args: Any,
+             deadline: Optional[float] = None, retry: bool = True, **kwargs: Any) -> Any:
+        """通过会话执行调用
+
+        Args:
+            endpoint: 接口名称，用于统计
+            func: 被调用的函数
+            *args: 位置参数
+            deadline: 截止时间（秒），默认使用会话配置
+            retry: 是否允许重试，下单等非幂等操作应设为False
+            **kwargs: 关键字参数
+
+        Returns:
+            Any: 调用结果
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            DeadlineExceededError: 截止时间内未能获取限流令牌
+            Exception: 最后一次调用的异常
+        """
+        # 嵌套调用：外层已经负责限流、熔断和重试，这里只执行一次
+        if getattr(self._local, 'depth', 0) > 0:
+            return func(*args, **kwargs)
+
+        deadline_at = time.monotonic() + (deadline if deadline is not None else self.deadline)
+        attempt = 0
+        self._local.depth = 1
+        try:
+            while True:
+                if not self.breaker.allow():
+                    self._record(endpoint, 0.0, rejected=True)
+                    raise CircuitOpenError(f"{self.name} 熔断中，拒绝调用: {endpoint}")
+
+                if not self.limiter.acquire(timeout=max(deadline_at - time.monotonic(), 0)):
+                    self.breaker.cancel_trial()
+                    self._record(endpoint, 0.0, rejected=True)
+                    raise DeadlineExceededError(f"{self.name} 限流等待超过截止时间: {endpoint}")
+
+                start = time.monotonic()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    latency = time.monotonic() - start
+                    self._record(endpoint, latency, error=True, retried=attempt > 0)
+                    self.breaker.record_failure()
+                    attempt += 1
+
+                    delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1))) * random.uniform(0.5, 1.5)
+                    if not retry or attempt >= self.max_attempts or \
+                            time.monotonic() + delay >= deadline_at or self.breaker.state == CircuitBreaker.OPEN:
+                        logger.error(f"{self.name}.{endpoint} 调用失败，已尝试 {attempt} 次: {str(e)}")
+                        raise
+                    logger.warning(f"{self.name}.{endpoint} 调用失败，{delay:.2f}秒后重试 "
+                                   f"({attempt}/{self.max_attempts}): {str(e)}")
+                    time.sleep(delay)
+                    continue
+
+                self._record(endpoint, time.monotonic() - start, retried=attempt > 0)
+                self.breaker.record_success()
+                return result
+        finally:
+            self._local.depth = 0
+
+    def wrap(self, endpoint: Optional[str] = None, deadline: Optional[float] = None,
+             retry: bool = True) -> Callable:
+        """装饰器形式的会话调用
+
+        Args:
+            endpoint: 接口名称，默认使用函数名
+            deadline: 截止时间（秒）
+            retry: 是否允许重试
+
+        Returns:
+            Callable: 装饰器
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.call(endpoint or func.__name__, func, *args,
+                                 deadline=deadline, retry=retry, **kwargs)
+            return wrapper
+        return decorator
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话统计信息
+
+        Returns:
+            Dict[str, Any]: 熔断器状态和按接口的统计
+        """
+        with self._stats_lock:
+            endpoints = {}
+            for endpoint, stats in self.stats.items():
+                stats = dict(stats)
+                stats['avg_latency'] = stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0
+                endpoints[endpoint] = stats
+        return {'circuit': self.breaker.state, 'endpoints': endpoints}
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name: str, config: Optional[Dict[str, Any]] = None) -> XtSession:
+    """获取（必要时创建）进程内共享的会话
+
+    Args:
+        name: 会话名称，如 'xtdata'、'xttrader'
+        config: 配置参数字典，读取 session.{name} 段
+
+    Returns:
+        XtSession: 会话
+    """
+    params = ((config or {}).get('session') or {}).get(name) or {}
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = _sessions[name] = XtSession(name, **params)
+        elif params:
+            session.configure(**params)
+    return session